@@ -1,47 +1,136 @@
 #!/usr/bin/env python
 # -*- coding: UTF-8 -*-
 import os
+import sys
+import time
 
 import cgi
-import cgitb
 
 import swlib.basetranslate
-import swlib.dbinteraction
+import swlib.metrics
 import swlib.printer
 import swlib.config
 
+# Every request starts a new process, so modules only needed by some requests
+# (database drivers, cgitb, the click log) are imported where they are used.
+
 
 def main():
-    config = swlib.config.ConfigItems()
-    dbconn = swlib.dbinteraction.ShortDBConn(**config.dbargs)
+    # A request lasts milliseconds, so the system clock is good enough, and
+    # the monotonic one would cost loading ctypes.
+    timer = swlib.metrics.RequestTimer(clock=time.time)
+    config = None
+    try:
+        with timer:
+            with timer.phase('config'):
+                config = swlib.config.ConfigItems()
+            response = route(config, timer)
+        response.write_cgi()
+    except Exception:
+        import cgitb
+        cgitb.handler()
+    finally:
+        if (config is not None and
+                swlib.config.boolean(config.metricsargs.get('log', False))):
+            print >>sys.stderr, timer.log_line()
+
+
+def connect(config):
+    """Return swlib.dbinteraction.ShortDBConn of the configuration."""
+    from swlib import dbinteraction
+    dbargs = dict(config.dbargs)
+    if int(dbargs.get('id_block_size', 0)):
+        # One process per request adds at most one URL, so lease no more.
+        dbargs['id_block_size'] = 1
+    return dbinteraction.ShortDBConn(**dbargs)
+
+
+def route(config, timer):
+    """Handle the request, setting the outcome of the request timer, and
+    return a swlib.printer.Response."""
     htmlprinter = swlib.printer.HtmlPrinter(**config.webargs)
 
-    cgitb.enable()
     form = cgi.FieldStorage()
     request_method = os.environ['REQUEST_METHOD']
 
     if request_method == 'POST' and 'new_url' in form:
-        new_url = form.getfirst('new_url')
-        item = swlib.basetranslate.BaseItem(dbconn.base_chars,
-                                            dbconn.add(new_url))
-        htmlprinter.reload(item.base_id)
+        from swlib import ratelimit
+        if config.limitsargs.get('path'):
+            limiter = ratelimit.RateLimiter(**config.limitsargs)
+        else:
+            limiter = None
+        try:
+            # Admitted or refused before connecting to the database.
+            with ratelimit.admit(limiter, os.environ.get('REMOTE_ADDR', '')):
+                dbconn = connect(config)
+                int_id = dbconn.add(form.getfirst('new_url'))
+        except ratelimit.Limited as limited:
+            timer.outcome = 'limited'
+            return htmlprinter.too_many_requests(limited.retry_after)
+        item = swlib.basetranslate.BaseItem(dbconn.base_chars, int_id)
+        timer.outcome = 'create'
+        return htmlprinter.reload(item.base_id)
+    elif request_method in ('GET', 'POST') and 'lookup' in form:
+        # Many short IDs or URLs, separated by whitespace, in one or more
+        # lookup fields.
+        short_urls = [short_url for value in form.getlist('lookup')
+                      for short_url in value.split()]
+        max_lookups = int(config.webargs.get('max_lookups', 1000))
+        if len(short_urls) > max_lookups:
+            timer.outcome = 'invalid'
+            return htmlprinter.too_many_lookups(max_lookups)
+        from swlib import lookup
+        results = lookup.lookup_many(
+                connect(config), short_urls, base_url=htmlprinter.base_url,
+                click_rollups=bool(config.clicksargs.get('directory')))
+        timer.outcome = 'lookup'
+        return htmlprinter.lookup_results(results)
     elif request_method == 'GET' and 'short' in form:
+        # Already imported by connect().
+        from swlib import dbinteraction
+        dbconn = connect(config)
+        if config.clicksargs.get('directory'):
+            from swlib import clicklog
+            click_log = clicklog.ClickLog(**config.clicksargs)
+        else:
+            click_log = None
         short_url = cgi.escape(form.getfirst('short'))
-        try:
-            shortdbentry = swlib.dbinteraction.ShortDBEntry(dbconn, short_url)
-        except IndexError:
-            htmlprinter.short_id_not_found(dbconn, short_url)
-        except ValueError:
-            htmlprinter.invalid_short_id(dbconn, short_url)
         # Enable URL info to be shown by adding a trailing '+' to the URL;
         # after URL mangling, a trailing '+' becomes a trailing space.
-        if short_url[-1] == ' ':
-            htmlprinter.short_id_info(shortdbentry)
+        show_info = short_url[-1] == ' '
+        try:
+            if show_info:
+                shortdbentry = dbinteraction.ShortDBEntry(
+                        dbconn, short_url,
+                        click_rollups=click_log is not None)
+            elif click_log is not None:
+                # Only read the row; the click goes to the log.
+                long_url = dbconn.resolve(short_url, count=False)
+            else:
+                # Look up and count the access in one round trip.
+                long_url = dbconn.resolve(short_url)
+        except dbinteraction.NotFound as not_found:
+            timer.outcome = 'not_found'
+            return htmlprinter.short_id_not_found(not_found.base_id,
+                                                  not_found.int_id)
+        except ValueError:
+            timer.outcome = 'invalid'
+            return htmlprinter.invalid_short_id(short_url.strip(),
+                                                dbconn.base_chars)
+        if show_info:
+            timer.outcome = 'info'
+            return htmlprinter.short_id_info(shortdbentry)
         else:
-            shortdbentry.increment()
-            htmlprinter.redirect(shortdbentry.long_url)
+            if click_log is not None:
+                click_log.record(dbconn.int_id(short_url),
+                                 os.environ.get('HTTP_REFERER'),
+                                 os.environ.get('HTTP_USER_AGENT'))
+                click_log.close()
+            timer.outcome = 'redirect'
+            return htmlprinter.redirect(long_url)
     else:
-        htmlprinter.new_url_form()
+        timer.outcome = 'form'
+        return htmlprinter.new_url_form()
 
 
 if __name__ == '__main__':
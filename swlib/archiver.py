@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import datetime
+import time
+
+
+def archive_idle(dbconn, idle_days=365, batch_size=1000, pause=0.0,
+                 now=None, progress=None, clicks=False):
+    """Move entries not accessed for idle_days days from the data table to
+    the archive table (see ShortDBConn.archive_idle()), batch_size IDs at a
+    time in one short transaction each, so that redirects and new links are
+    not blocked for long.
+
+    The entry with the highest ID is never archived, so that MySQL versions
+    which reset AUTO_INCREMENT to the highest ID on restart cannot hand out
+    an archived ID again.
+
+    Args:
+        dbconn: ShortDBConn object.
+        idle_days: days without access after which entries are archived
+            (default: 365)
+        batch_size: IDs per transaction (default: 1000)
+        pause: seconds to sleep between transactions, e.g. to let replicas
+            keep up (default: 0)
+        now: optional datetime.datetime to use as the current time.
+        progress: optional function called after every transaction with the
+            last ID examined and the total number of entries moved.
+        clicks: if true, entries clicked since according to the click
+            rollups are kept too; set it when clicks are logged to files
+            (see clicklog.ClickLog), which leave last_accessed unchanged.
+
+    Returns:
+        number of entries moved.
+    """
+    now = datetime.datetime.now() if now is None else now
+    before = now - datetime.timedelta(days=float(idle_days))
+    batch_size = int(batch_size)
+    # Of the data table only, whatever the archive setting.
+    last_id = dbconn.backend.max_id() - 1
+    moved = 0
+    for after_id in xrange(0, max(last_id, 0), batch_size):
+        end_id = min(after_id + batch_size, last_id)
+        moved += dbconn.archive_idle(before, after_id, end_id,
+                                     clicks=clicks)
+        if progress is not None:
+            progress(end_id, moved)
+        if pause and end_id < last_id:
+            time.sleep(pause)
+    return moved
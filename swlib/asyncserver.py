@@ -0,0 +1,393 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import Queue
+import StringIO
+import asynchat
+import asyncore
+import collections
+import errno
+import fcntl
+import os
+import socket
+import sys
+import threading
+import time
+import traceback
+import urllib
+
+
+# Limits protecting the server against oversized requests.
+MAX_HEADER_SIZE = 16 * 1024
+MAX_BODY_SIZE = 64 * 1024
+# Requests received but not yet answered on one connection (pipelining).
+MAX_PIPELINED = 16
+
+
+class _Trigger(asyncore.file_dispatcher):
+    """Wake up the event loop from other threads to run callbacks in it."""
+    def __init__(self, map):
+        (reader, self._writer) = os.pipe()
+        flags = fcntl.fcntl(self._writer, fcntl.F_GETFL)
+        fcntl.fcntl(self._writer, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+        self._callbacks = collections.deque()
+        asyncore.file_dispatcher.__init__(self, reader, map=map)
+
+    def writable(self):
+        return False
+
+    def handle_read(self):
+        try:
+            self.recv(8192)
+        except (OSError, socket.error):
+            pass
+        while self._callbacks:
+            self._callbacks.popleft()()
+
+    def call_soon(self, callback):
+        """Run callback in the event loop thread. Thread safe."""
+        self._callbacks.append(callback)
+        try:
+            os.write(self._writer, 'x')
+        except OSError as e:
+            # A full pipe means that a wakeup is pending anyway.
+            if e.errno != errno.EAGAIN:
+                raise
+
+    def close(self):
+        asyncore.file_dispatcher.close(self)
+        os.close(self._writer)
+
+
+class WorkerPool(object):
+    """Fixed number of threads running blocking calls for the event loop.
+
+    Args:
+        size: number of threads.
+        max_queued: maximum number of calls waiting for a thread.
+    """
+    def __init__(self, size=10, max_queued=1000):
+        self._queue = Queue.Queue(int(max_queued))
+        self._threads = []
+        for i in range(int(size)):
+            t = threading.Thread(target=self._run, name='Worker-{}'.format(i))
+            t.daemon = True
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, func, callback):
+        """Queue func to be run by a worker thread, whose result is passed to
+        callback (in the worker thread).
+
+        Raises:
+            Queue.Full if max_queued calls are already waiting.
+        """
+        self._queue.put_nowait((func, callback))
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            (func, callback) = job
+            callback(func())
+
+    def close(self):
+        for _ in self._threads:
+            self._queue.put(None)
+        for t in self._threads:
+            t.join()
+
+
+def call_application(application, environ):
+    """Call a WSGI application and return (status, headers, body), with the
+    whole body collected. Exceptions give a 500 response."""
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response['status'] = status
+        response['headers'] = headers
+        return lambda data: response.setdefault('body', []).append(data)
+
+    try:
+        result = application(environ, start_response)
+        try:
+            body = response.get('body', []) + list(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return (response['status'], response['headers'], ''.join(body))
+    except Exception:
+        traceback.print_exc()
+        return ('500 Internal Server Error',
+                [('Content-Type', 'text/plain')], 'Internal Server Error\n')
+
+
+class HTTPChannel(asynchat.async_chat):
+    """One client connection, speaking HTTP/1.0 and 1.1 with keep-alive.
+
+    Requests are parsed in the event loop, handed to the worker pool of the
+    server, and answered in order.
+    """
+    def __init__(self, server, sock, addr):
+        asynchat.async_chat.__init__(self, sock, map=server.map)
+        self._server = server
+        self._addr = addr
+        self._incoming = []
+        self._incoming_size = 0
+        # Request waiting for its body, as (environ, keep_alive).
+        self._request = None
+        # Complete requests not yet answered.
+        self._pending = collections.deque()
+        self._busy = False
+        self.last_activity = time.time()
+        self.set_terminator('\r\n\r\n')
+
+    @property
+    def idle(self):
+        return not self._busy and not self._pending
+
+    def readable(self):
+        return (len(self._pending) < MAX_PIPELINED and
+                asynchat.async_chat.readable(self))
+
+    def collect_incoming_data(self, data):
+        self.last_activity = time.time()
+        self._incoming.append(data)
+        self._incoming_size += len(data)
+        if self._request is None and self._incoming_size > MAX_HEADER_SIZE:
+            self._error('431 Request Header Fields Too Large')
+
+    def found_terminator(self):
+        data = ''.join(self._incoming)
+        self._incoming = []
+        self._incoming_size = 0
+
+        if self._request is None:
+            # Clients may send empty lines between requests.
+            data = data.lstrip('\r\n')
+            if not data:
+                return
+            try:
+                (environ, keep_alive) = self._parse_head(data)
+            except ValueError:
+                self._error('400 Bad Request')
+                return
+
+            # Chunked bodies are not supported. Reading one by its
+            # Content-Length, or as the next request, would let requests be
+            # smuggled past a proxy which frames them otherwise.
+            if 'HTTP_TRANSFER_ENCODING' in environ:
+                if 'CONTENT_LENGTH' in environ:
+                    self._error('400 Bad Request')
+                else:
+                    self._error('501 Not Implemented')
+                return
+            try:
+                length = int(environ.get('CONTENT_LENGTH') or 0)
+            except ValueError:
+                self._error('400 Bad Request')
+                return
+            if length > MAX_BODY_SIZE:
+                self._error('413 Request Entity Too Large')
+                return
+            if length > 0:
+                self._request = (environ, keep_alive)
+                self.set_terminator(length)
+                return
+            body = ''
+        else:
+            ((environ, keep_alive), self._request) = (self._request, None)
+            body = data
+            self.set_terminator('\r\n\r\n')
+
+        environ['wsgi.input'] = StringIO.StringIO(body)
+        self._pending.append((environ, keep_alive))
+        self._next()
+
+    def _parse_head(self, data):
+        """Return (WSGI environ, keep-alive flag) of request line and
+        headers."""
+        lines = data.split('\r\n')
+        (method, target, version) = lines[0].split(' ', 2)
+        if not version.startswith('HTTP/'):
+            raise ValueError('not an HTTP request: {}'.format(lines[0]))
+        (path, _, query) = target.partition('?')
+
+        environ = dict(self._server.base_environ)
+        environ.update({
+            'REQUEST_METHOD': method,
+            'PATH_INFO': urllib.unquote(path),
+            'QUERY_STRING': query,
+            'SERVER_PROTOCOL': version,
+            'REMOTE_ADDR': self._addr[0] if self._addr else '',
+            })
+        for line in lines[1:]:
+            (name, colon, value) = line.partition(':')
+            if not colon:
+                raise ValueError('invalid header: {}'.format(line))
+            key = name.strip().upper().replace('-', '_')
+            value = value.strip()
+            if key in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                if key in environ:
+                    raise ValueError('repeated header: {}'.format(name))
+                environ[key] = value
+            else:
+                key = 'HTTP_' + key
+                if key in environ:
+                    value = environ[key] + ',' + value
+                environ[key] = value
+
+        connection = environ.get('HTTP_CONNECTION', '').lower()
+        if version == 'HTTP/1.1':
+            keep_alive = connection != 'close'
+        else:
+            keep_alive = connection == 'keep-alive'
+        return (environ, keep_alive)
+
+    def _next(self):
+        """Hand the next pending request to the worker pool."""
+        if self._busy or not self._pending:
+            return
+        (environ, keep_alive) = self._pending.popleft()
+        self._busy = True
+
+        def done(response):
+            self._server.call_soon(
+                    lambda: self._respond(environ, keep_alive, *response))
+
+        try:
+            self._server.workers.submit(
+                    lambda: call_application(self._server.application,
+                                             environ),
+                    done)
+        except Queue.Full:
+            self._busy = False
+            self._error('503 Service Unavailable')
+
+    def _respond(self, environ, keep_alive, status, headers, body):
+        if not self.connected:
+            return
+        head = ['{} {}'.format(environ['SERVER_PROTOCOL'], status)]
+        names = set()
+        for (name, value) in headers:
+            if name.lower() != 'connection':
+                head.append('{}: {}'.format(name, value))
+                names.add(name.lower())
+        if 'content-length' not in names:
+            head.append('Content-Length: {}'.format(len(body)))
+        head.append('Connection: {}'.format(
+                'keep-alive' if keep_alive else 'close'))
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            body = ''
+        self.push('\r\n'.join(head) + '\r\n\r\n' + body)
+        self.last_activity = time.time()
+
+        self._busy = False
+        if keep_alive:
+            self._next()
+        else:
+            self._pending.clear()
+            self.close_when_done()
+
+    def _error(self, status):
+        """Answer with an error status and close the connection."""
+        self._pending.clear()
+        self.push('HTTP/1.0 {}\r\nContent-Length: 0\r\n'
+                  'Connection: close\r\n\r\n'.format(status))
+        self.close_when_done()
+        # Ignore anything else sent on this connection.
+        self.set_terminator(None)
+        self.collect_incoming_data = lambda data: None
+
+    def handle_error(self):
+        traceback.print_exc()
+        self.close()
+
+
+class AsyncServer(asyncore.dispatcher):
+    """Event loop HTTP server for a WSGI application, e.g.
+    wsgiapp.ShortWebApp.
+
+    Connections are multiplexed by one thread with poll(), so slow and idle
+    keep-alive clients cost no threads. The application, which may block on
+    database calls, is run by a bounded pool of worker threads.
+
+    Args:
+        application: WSGI application.
+        host: interface to listen on (default: localhost)
+        port: port to listen on; 0 picks a free one (default: 8000)
+        workers: number of threads running the application (default: 10)
+        max_queued: requests waiting for a worker before new ones are
+            answered with 503 (default: 1000)
+        keepalive_timeout: seconds before idle connections are closed
+            (default: 15)
+        backlog: listen() backlog (default: 1024)
+
+    Usage:
+        AsyncServer(application, port=8000).serve_forever()
+    """
+    def __init__(self, application, host='localhost', port=8000, workers=10,
+                 max_queued=1000, keepalive_timeout=15, backlog=1024):
+        self.map = {}
+        asyncore.dispatcher.__init__(self, map=self.map)
+        self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.set_reuse_addr()
+        self.bind((host, int(port)))
+        self.listen(int(backlog))
+
+        self.application = application
+        self.workers = WorkerPool(size=workers, max_queued=max_queued)
+        self._trigger = _Trigger(self.map)
+        self._keepalive_timeout = float(keepalive_timeout)
+        self._running = False
+
+        (server_name, server_port) = self.socket.getsockname()[:2]
+        self.base_environ = {
+            'SCRIPT_NAME': '',
+            'SERVER_NAME': server_name,
+            'SERVER_PORT': str(server_port),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+            }
+
+    @property
+    def port(self):
+        return self.socket.getsockname()[1]
+
+    def call_soon(self, callback):
+        """Run callback in the event loop thread. Thread safe."""
+        self._trigger.call_soon(callback)
+
+    def handle_accept(self):
+        pair = self.accept()
+        if pair is not None:
+            (sock, addr) = pair
+            HTTPChannel(self, sock, addr)
+
+    def serve_forever(self, poll_interval=1):
+        """Run the event loop until shutdown() is called."""
+        self._running = True
+        while self._running:
+            asyncore.loop(timeout=poll_interval, use_poll=True, map=self.map,
+                          count=1)
+            self._close_idle()
+        for channel in self.map.values():
+            channel.close()
+        self.workers.close()
+
+    def shutdown(self):
+        """Stop serve_forever(). Thread safe."""
+        def stop():
+            self._running = False
+        self.call_soon(stop)
+
+    def _close_idle(self):
+        deadline = time.time() - self._keepalive_timeout
+        for channel in self.map.values():
+            if (isinstance(channel, HTTPChannel) and channel.idle and
+                    channel.last_activity < deadline):
+                channel.close()
@@ -0,0 +1,766 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import contextlib
+import datetime
+import itertools
+import time
+
+import config
+import metrics
+import pool
+
+
+class SQLBackend(object):
+    """Storage of ID mappings in an SQL database, through a DB-API module.
+
+    This is the storage interface used by ShortDBConn: add(), add_many(),
+    lookup(), lookup_many(), increment(), increment_many(), base_chars(),
+    lease_ids(), add_click_rollups(), click_stats(), click_stats_many(),
+    archive_idle(), lookup_archived(), promote(), mappings() and rows().
+    Subclasses provide the connection function and the parameter placeholder
+    of their DB-API module. Timestamps are given by the application rather
+    than by SQL functions, so the queries stay portable between databases.
+
+    Reads of given entries (lookup(), lookup_many(), lookup_archived(),
+    click_stats(), click_stats_many() and base_chars()) are spread round
+    robin over the replicas given, if any. A replica which fails is skipped
+    for replica_retry seconds, and the primary is used when no replica
+    works. All writes, and the reads of exports, go to the primary.
+
+    Args:
+        connect: function returning a new DB-API connection, whose cursors
+            return rows as dicts.
+        data_table_name: name of table with ID mappings.
+        info_table_name: name of table with the base representation.
+        sequence_table_name: name of table with the next unleased ID of each
+            data table (see lease_ids()).
+        click_table_name: name of table with clicks per ID and day (see
+            add_click_rollups()).
+        archive_table_name: name of table with idle ID mappings moved out of
+            the data table (see archive_idle()).
+        replica_connects: functions returning new connections to read
+            replicas (default: none)
+        replica_retry: seconds to skip a failed replica (default: 30)
+        read_your_writes: if true, lookup() reads entries missing on a
+            replica from the primary, so that entries just added are found
+            despite replication lag (default: True)
+        pool_min_size: connections opened up front           (default: 1)
+        pool_max_size: maximum number of connections         (default: 5)
+        pool_timeout:  seconds to wait for a free connection (default: 10)
+        ping, errors: passed to pool.ConnectionPool.
+    """
+    # Parameter placeholder of the DB-API module (its "paramstyle").
+    placeholder = '%s'
+    # Exceptions of the DB-API module raised on unique key violations.
+    integrity_errors = ()
+    # Base exception of the DB-API module, counted as database errors.
+    database_errors = ()
+    # Attempts of add_click_rollups() on unique key violations.
+    rollup_attempts = 3
+    # Suffix of SELECT statements locking the rows read until commit.
+    for_update = ' FOR UPDATE'
+    # Most parameters given in an IN list of one statement.
+    max_parameters = 500
+
+    def __init__(self, connect, data_table_name='translation_table',
+                 info_table_name='base_info',
+                 sequence_table_name='id_sequence',
+                 click_table_name='click_rollup',
+                 archive_table_name='translation_archive', replica_connects=(),
+                 replica_retry=30, read_your_writes=True, pool_min_size=1,
+                 pool_max_size=5, pool_timeout=10, ping=None, errors=()):
+        self._data_table_name = data_table_name
+        self._info_table_name = info_table_name
+        self._sequence_table_name = sequence_table_name
+        self._click_table_name = click_table_name
+        self._archive_table_name = archive_table_name
+
+        def timed(connect):
+            def timed_connect():
+                with metrics.phase('connect'):
+                    return connect()
+            return timed_connect
+
+        self._pool = pool.ConnectionPool(
+                timed(connect), min_size=pool_min_size,
+                max_size=pool_max_size, timeout=pool_timeout, ping=ping,
+                errors=errors)
+        # Replicas connect on demand, so that one being down does not stop
+        # the application from starting.
+        self._replica_pools = [
+                pool.ConnectionPool(
+                        timed(replica_connect), min_size=0,
+                        max_size=pool_max_size, timeout=pool_timeout,
+                        ping=ping, errors=errors)
+                for replica_connect in replica_connects]
+        self._replica_retry = float(replica_retry)
+        self._read_your_writes = config.boolean(read_your_writes)
+        # Replica pool -> time until which it is skipped.
+        self._replica_down = {}
+        self._replica_turn = itertools.count()
+        self._queries = {}
+
+    @property
+    def data_table_name(self):
+        return self._data_table_name
+
+    @property
+    def info_table_name(self):
+        return self._info_table_name
+
+    @property
+    def sequence_table_name(self):
+        return self._sequence_table_name
+
+    @property
+    def click_table_name(self):
+        return self._click_table_name
+
+    @property
+    def archive_table_name(self):
+        return self._archive_table_name
+
+    @property
+    def replicas(self):
+        """Number of read replicas."""
+        return len(self._replica_pools)
+
+    def close(self):
+        """Close all pooled connections."""
+        for replica_pool in self._replica_pools:
+            replica_pool.close()
+        self._pool.close()
+
+    @contextlib.contextmanager
+    def cursor(self, phase='query', connection_pool=None, streaming=False):
+        """Check out a pooled connection and yield a new cursor on it. The
+        connection is available as cursor.connection, e.g. for commits, and is
+        rolled back when returned to the pool.
+
+        The with block is timed as the given phase of the current request
+        (see metrics.RequestTimer), where database errors are also counted.
+
+        Args:
+            phase: name of the phase.
+            connection_pool: pool to check out from (default: the primary)
+            streaming: if true, the cursor fetches rows from the database as
+                they are read, rather than the whole result on execute().
+                Nothing else may be run on the connection until all rows are
+                read.
+        """
+        if connection_pool is None:
+            connection_pool = self._pool
+        with metrics.phase(phase):
+            try:
+                with connection_pool.connection() as conn:
+                    cursor = self._new_cursor(conn, streaming)
+                    try:
+                        yield cursor
+                    finally:
+                        cursor.close()
+            except self.integrity_errors:
+                raise
+            except self.database_errors + (pool.PoolTimeout,):
+                metrics.db_error()
+                raise
+
+    def _new_cursor(self, conn, streaming=False):
+        """Return a new cursor on conn; see cursor(). Subclasses override
+        this where the default cursor of the DB-API module buffers whole
+        results."""
+        return conn.cursor()
+
+    def _read(self, read, retry_missing=False):
+        """Return read(cursor) run with a cursor on a replica, trying the
+        replicas round robin and finally the primary on database errors.
+
+        A replica which fails is skipped for replica_retry seconds. If
+        retry_missing is true and read_your_writes is set, a None result
+        from a replica is read again from the primary.
+        """
+        if self._replica_pools:
+            now = time.time()
+            start = next(self._replica_turn)
+            n = len(self._replica_pools)
+            for i in xrange(n):
+                replica_pool = self._replica_pools[(start + i) % n]
+                if self._replica_down.get(replica_pool, 0) > now:
+                    continue
+                try:
+                    with self.cursor('select', replica_pool) as cursor:
+                        result = read(cursor)
+                except self.database_errors + (pool.PoolTimeout,):
+                    self._replica_down[replica_pool] = (time.time() +
+                                                        self._replica_retry)
+                    continue
+                if (result is not None or not retry_missing or
+                        not self._read_your_writes):
+                    return result
+                break
+        with self.cursor('select') as cursor:
+            return read(cursor)
+
+    def _format(self, query, **kwargs):
+        """Fill in table names ({data}, {info}, {seq}, {clicks}, {archive})
+        and the parameter placeholder ({p}).
+
+        Queries without further keyword arguments are formatted once and
+        cached, so that the DB-API module gets the very same string each
+        time; sqlite3 then reuses its prepared statement.
+        """
+        if kwargs:
+            return query.format(data=self._data_table_name,
+                                info=self._info_table_name,
+                                seq=self._sequence_table_name,
+                                clicks=self._click_table_name,
+                                archive=self._archive_table_name,
+                                p=self.placeholder, **kwargs)
+        try:
+            return self._queries[query]
+        except KeyError:
+            formatted = query.format(data=self._data_table_name,
+                                     info=self._info_table_name,
+                                     seq=self._sequence_table_name,
+                                     clicks=self._click_table_name,
+                                     archive=self._archive_table_name,
+                                     p=self.placeholder)
+            self._queries[query] = formatted
+            return formatted
+
+    def base_chars(self):
+        """Return the base representation characters."""
+        query = self._format('SELECT base_chars FROM {info} LIMIT 1')
+
+        def read(cursor):
+            cursor.execute(query)
+            return cursor.fetchone()['base_chars']
+
+        return self._read(read)
+
+    def add(self, long_url, url_hash=None, int_id=None):
+        """Store a long URL and return its new integer ID.
+
+        If url_hash is given, it is stored in the uniquely indexed url_hash
+        column, and the ID of an existing row with the same hash is returned
+        instead of adding a new row. Concurrent adds of the same URL are
+        resolved by the unique index: the loser reads the winner's row.
+
+        If int_id is given (e.g. leased with lease_ids()), the row gets that
+        ID instead of the next AUTO_INCREMENT value.
+        """
+        query = self._insert_query(url_hash is not None, int_id is not None)
+        args = (long_url, datetime.datetime.now())
+        if url_hash is not None:
+            args += (url_hash,)
+        if int_id is not None:
+            args = (int_id,) + args
+
+        with self.cursor('insert') as cursor:
+            if url_hash is not None:
+                existing = self._id_by_hash(cursor, url_hash)
+                if existing is not None:
+                    return existing
+            try:
+                cursor.execute(query, args)
+                cursor.connection.commit()
+            except self.integrity_errors:
+                if url_hash is None:
+                    raise
+                # Someone else inserted the same URL since the check above.
+                cursor.connection.rollback()
+                return self._id_by_hash(cursor, url_hash)
+            return cursor.lastrowid if int_id is None else int_id
+
+    def _insert_query(self, url_hash=False, int_id=False):
+        """Return INSERT statement of one row, with the url_hash and id
+        columns if requested. The statement is a constant string per
+        combination, so _format() caches it."""
+        columns = ['long_url', 'created']
+        if url_hash:
+            columns.append('url_hash')
+        if int_id:
+            columns.insert(0, 'id')
+        return self._format('INSERT INTO {data} (' + ', '.join(columns) +
+                            ') VALUES(' + ', '.join(['{p}'] * len(columns)) +
+                            ')')
+
+    def _id_by_hash(self, cursor, url_hash):
+        """Return ID of the row with the given URL hash, or None."""
+        query = self._format('SELECT id FROM {data} WHERE url_hash={p}')
+        cursor.execute(query, (url_hash,))
+        row = cursor.fetchone()
+        return None if row is None else row['id']
+
+    def add_many(self, long_urls, url_hashes=None, int_ids=None):
+        """Store several long URLs with one executemany() and one commit, and
+        return their new integer IDs in input order.
+
+        If url_hashes are given (one per URL), URLs with hashes already in the
+        table, or repeated in long_urls, are not added again; their existing
+        IDs are returned instead, as for add().
+
+        If int_ids are given (one per URL), the rows get those IDs; the IDs
+        of URLs which are not added are then left unused.
+        """
+        if not long_urls:
+            return []
+        if url_hashes is not None:
+            return self._add_many_deduplicated(long_urls, url_hashes, int_ids)
+
+        created = datetime.datetime.now()
+        rows = [(long_url, created) for long_url in long_urls]
+        if int_ids is not None:
+            rows = [(int_id,) + row for (int_id, row) in zip(int_ids, rows)]
+        with self.cursor('insert') as cursor:
+            cursor.executemany(self._insert_query(int_id=int_ids is not None),
+                               rows)
+            if int_ids is None:
+                first_id = self._first_insert_id(cursor, len(long_urls))
+            cursor.connection.commit()
+        if int_ids is not None:
+            return list(int_ids)
+        return range(first_id, first_id + len(long_urls))
+
+    def _add_many_deduplicated(self, long_urls, url_hashes, int_ids=None):
+        unique_hashes = list(set(url_hashes))
+        query = self._format(
+                'SELECT id, url_hash FROM {data} WHERE url_hash IN ({hashes})',
+                hashes=', '.join([self.placeholder] * len(unique_hashes)))
+        insert = self._insert_query(True, int_ids is not None)
+        created = datetime.datetime.now()
+        if int_ids is None:
+            int_ids = [None] * len(long_urls)
+            leased = False
+        else:
+            leased = True
+
+        with self.cursor('insert') as cursor:
+            cursor.execute(query, unique_hashes)
+            ids = dict((row['url_hash'], row['id'])
+                       for row in cursor.fetchall())
+
+            # New URLs, first occurrence only, as (int_id, url_hash, row).
+            new_rows = []
+            for (long_url, url_hash, int_id) in zip(long_urls, url_hashes,
+                                                    int_ids):
+                if url_hash not in ids:
+                    ids[url_hash] = None
+                    row = (long_url, created, url_hash)
+                    if leased:
+                        row = (int_id,) + row
+                    new_rows.append((int_id, url_hash, row))
+
+            if new_rows:
+                try:
+                    cursor.executemany(insert, [row for (_, _, row)
+                                                in new_rows])
+                    if not leased:
+                        first_id = self._first_insert_id(cursor,
+                                                         len(new_rows))
+                    cursor.connection.commit()
+                except self.integrity_errors:
+                    # Raced with a concurrent add; take the slow path.
+                    cursor.connection.rollback()
+                    ids = None
+                else:
+                    for (i, (int_id, url_hash, _)) in enumerate(new_rows):
+                        ids[url_hash] = int_id if leased else first_id + i
+
+        if ids is None:
+            return [self.add(long_url, url_hash, int_id)
+                    for (long_url, url_hash, int_id)
+                    in zip(long_urls, url_hashes, int_ids)]
+        return [ids[url_hash] for url_hash in url_hashes]
+
+    def _first_insert_id(self, cursor, n):
+        """Return the ID of the first of n rows just inserted by executemany()
+        on cursor.
+
+        This is the last insert ID of MySQL, which executemany() turns into a
+        multi-row INSERT. The IDs of such a statement are consecutive unless
+        innodb_autoinc_lock_mode = 2 ("interleaved"), which must then not be
+        used.
+        """
+        return cursor.lastrowid
+
+    def lease_ids(self, n):
+        """Reserve n consecutive integer IDs for this process and return the
+        first one.
+
+        The next unleased ID of the data table is kept in a row of the
+        sequence table, which is advanced by n in one short transaction; the
+        row lock serializes concurrent leases. A missing row is created
+        starting above the highest ID in the data table.
+
+        Leased IDs are never handed out again, so IDs of leases which are
+        not used up (e.g. after a crash) are simply skipped, unless given
+        back by release_ids().
+        """
+        update = self._format('UPDATE {seq} SET next_id=(next_id+{p}) '
+                              'WHERE name={p}')
+        insert = self._format('INSERT INTO {seq} (name, next_id) '
+                              'SELECT {p}, COALESCE(MAX(id), 0) + 1 + {p} '
+                              'FROM {data}')
+        select = self._format('SELECT next_id FROM {seq} WHERE name={p}')
+        name = self._data_table_name
+        with self.cursor('update') as cursor:
+            cursor.execute(update, (n, name))
+            if not cursor.rowcount:
+                try:
+                    cursor.execute(insert, (name, n))
+                except self.integrity_errors:
+                    # Created concurrently; advance it instead.
+                    cursor.connection.rollback()
+                    cursor.execute(update, (n, name))
+            cursor.execute(select, (name,))
+            next_id = cursor.fetchone()['next_id']
+            cursor.connection.commit()
+        return next_id - n
+
+    def release_ids(self, first_id, end_id):
+        """Give back the unused IDs first_id to end_id - 1 of a lease, which
+        is only possible if no later lease has been made. Return true if the
+        IDs were given back."""
+        query = self._format('UPDATE {seq} SET next_id={p} '
+                             'WHERE name={p} AND next_id={p}')
+        with self.cursor('update') as cursor:
+            cursor.execute(query, (first_id, self._data_table_name, end_id))
+            cursor.connection.commit()
+            return cursor.rowcount == 1
+
+    def lookup(self, int_id):
+        """Return dict with long_url, last_accessed, created and
+        access_counter of the given integer ID, or None if it does not
+        exist."""
+        query = self._format(
+                'SELECT long_url, last_accessed, created, access_counter '
+                'FROM {data} WHERE id={p}')
+
+        def read(cursor):
+            cursor.execute(query, (int_id,))
+            return cursor.fetchone()
+
+        return self._read(read, retry_missing=True)
+
+    def lookup_many(self, int_ids, archived=False):
+        """Return dict mapping those of the given integer IDs which exist to
+        dicts as lookup() returns, read with one query, of the archive table
+        if archived is true. With read_your_writes, IDs missing on a replica
+        are read again from the primary."""
+        table = self._archive_table_name if archived else self._data_table_name
+
+        def read(cursor, int_ids):
+            query = self._format(
+                    'SELECT id, long_url, last_accessed, created, '
+                    'access_counter FROM {table} WHERE id IN (' +
+                    ', '.join(['{p}'] * len(int_ids)) + ')', table=table)
+            cursor.execute(query, int_ids)
+            return dict((row.pop('id'), row) for row in cursor.fetchall())
+
+        int_ids = list(int_ids)
+        if not int_ids:
+            return {}
+        found = self._read(lambda cursor: read(cursor, int_ids))
+        missing = [int_id for int_id in int_ids if int_id not in found]
+        if missing and self._replica_pools and self._read_your_writes:
+            with self.cursor('select') as cursor:
+                found.update(read(cursor, missing))
+        return found
+
+    def _columns(self, url_hash=False):
+        """Return comma-separated columns of a row, with url_hash if
+        requested."""
+        columns = 'id, long_url, last_accessed, created, access_counter'
+        return columns + ', url_hash' if url_hash else columns
+
+    def lookup_archived(self, int_id):
+        """Return dict as lookup() does of the given integer ID in the archive
+        table, or None if it is not archived."""
+        query = self._format(
+                'SELECT long_url, last_accessed, created, access_counter '
+                'FROM {archive} WHERE id={p}')
+
+        def read(cursor):
+            cursor.execute(query, (int_id,))
+            return cursor.fetchone()
+
+        return self._read(read)
+
+    def archive_idle(self, before, after_id, end_id, url_hash=False,
+                     clicks=False):
+        """Move rows with IDs above after_id and up to end_id, created and
+        last accessed before the given datetime.datetime, from the data table
+        to the archive table in one transaction. The rows are found by
+        primary key range, so the work per call is bounded by the range.
+
+        The IDs of the idle rows are selected once, with the rows locked
+        until commit (see _begin_write() and for_update), and then inserted
+        and deleted by that ID list, so that a row accessed meanwhile ends up
+        in exactly one of the tables.
+
+        Args:
+            before: datetime.datetime; rows accessed since are kept.
+            after_id, end_id: ID range.
+            url_hash: if true, move the url_hash column too.
+            clicks: if true, rows with clicks in the click rollups since
+                before are kept too, as clicks logged to files do not update
+                last_accessed.
+
+        Returns:
+            number of rows moved.
+        """
+        columns = self._columns(url_hash)
+        idle = ('id > {p} AND id <= {p} AND created < {p} AND '
+                '(last_accessed IS NULL OR last_accessed < {p})')
+        parameters = (after_id, end_id, before, before)
+        if clicks:
+            idle += (' AND NOT EXISTS (SELECT 1 FROM {clicks} WHERE '
+                     '{clicks}.int_id={data}.id AND '
+                     '{clicks}.last_click >= {p})')
+            parameters += (before,)
+        select = self._format('SELECT id FROM {data} WHERE ' + idle +
+                              ' ORDER BY id' + self.for_update)
+        with self.cursor('update') as cursor:
+            self._begin_write(cursor)
+            cursor.execute(select, parameters)
+            int_ids = [row['id'] for row in cursor.fetchall()]
+            for i in xrange(0, len(int_ids), self.max_parameters):
+                chunk = int_ids[i:i + self.max_parameters]
+                ids = ', '.join([self.placeholder] * len(chunk))
+                cursor.execute(self._format(
+                        'INSERT INTO {archive} (' + columns + ') SELECT ' +
+                        columns + ' FROM {data} WHERE id IN ({ids})',
+                        ids=ids), chunk)
+                cursor.execute(self._format(
+                        'DELETE FROM {data} WHERE id IN ({ids})', ids=ids),
+                        chunk)
+            cursor.connection.commit()
+            return len(int_ids)
+
+    def _begin_write(self, cursor):
+        """Start a transaction on cursor in which rows read with for_update
+        stay locked until commit. DB-API modules start transactions
+        implicitly, so there is nothing to do by default."""
+
+    def promote(self, int_id, url_hash=False):
+        """Move the row of the given integer ID from the archive table back to
+        the data table in one transaction.
+
+        Returns:
+            True if the row was moved, and False if it was not archived, e.g.
+            since another process promoted it first.
+        """
+        columns = self._columns(url_hash)
+        insert = self._format('INSERT INTO {data} (' + columns + ') '
+                              'SELECT ' + columns + ' FROM {archive} '
+                              'WHERE id={p}')
+        delete = self._format('DELETE FROM {archive} WHERE id={p}')
+        try:
+            with self.cursor('update') as cursor:
+                cursor.execute(insert, (int_id,))
+                if not cursor.rowcount:
+                    return False
+                cursor.execute(delete, (int_id,))
+                cursor.connection.commit()
+                return True
+        except self.integrity_errors:
+            return False
+
+    def max_id(self, archived=False):
+        """Return the highest integer ID in use, or 0 if there is none, of
+        the archive table if archived is true."""
+        query = self._format('SELECT MAX(id) AS max_id FROM {table}',
+                             table=self._archive_table_name if archived
+                             else self._data_table_name)
+        with self.cursor('select') as cursor:
+            cursor.execute(query)
+            return cursor.fetchone()['max_id'] or 0
+
+    def mappings(self, after_id=0, batch_size=1000, archived=False):
+        """Yield (id, long_url) tuples of all IDs above after_id in ID order,
+        of the archive table if archived is true.
+
+        Rows are read batch_size at a time by ID range, with the connection
+        returned to the pool between batches, so that memory use is bounded
+        and long exports do not hold a connection or a transaction.
+        """
+        batch_size = int(batch_size)
+        query = self._format('SELECT id, long_url FROM {table} WHERE '
+                             'id > {p} ORDER BY id LIMIT {p}',
+                             table=self._archive_table_name if archived
+                             else self._data_table_name)
+        while True:
+            with self.cursor('select') as cursor:
+                cursor.execute(query, (after_id, batch_size))
+                rows = cursor.fetchall()
+            for row in rows:
+                yield (row['id'], row['long_url'])
+            if len(rows) < batch_size:
+                return
+            after_id = rows[-1]['id']
+
+    def rows(self, after_id=0, chunk_size=1000, archived=False):
+        """Yield lists of up to chunk_size rows of all IDs above after_id, in
+        ID order, of the archive table if archived is true. Rows are dicts of
+        id, long_url, created, last_accessed and access_counter.
+
+        Unlike mappings(), all rows are read by one query on a streaming
+        cursor, so that memory use is bounded by chunk_size however large the
+        table, without a query per batch. The connection is checked out, and
+        the query open, until the generator is exhausted or closed.
+        """
+        query = self._format('SELECT id, long_url, created, last_accessed, '
+                             'access_counter FROM {table} WHERE id > {p} '
+                             'ORDER BY id',
+                             table=self._archive_table_name if archived
+                             else self._data_table_name)
+        with self.cursor('select', streaming=True) as cursor:
+            cursor.execute(query, (after_id,))
+            while True:
+                chunk = cursor.fetchmany(int(chunk_size))
+                if not chunk:
+                    return
+                yield chunk
+
+    def increment(self, int_id):
+        """Increment access counter of the given integer ID by 1 and set its
+        last accessed time."""
+        query = self._format(
+                'UPDATE {data} SET access_counter=(access_counter+1), '
+                'last_accessed={p} WHERE id={p}')
+        with self.cursor('update') as cursor:
+            cursor.execute(query, (datetime.datetime.now(), int_id))
+            cursor.connection.commit()
+
+    def resolve_and_count(self, int_id):
+        """Return the long URL of the given integer ID and count the access
+        as increment() does, or return None if the ID does not exist.
+
+        This is the redirect path: only long_url is read, with the row locked
+        (see for_update) and then updated in the same transaction, on one
+        pooled connection with one commit. Missing IDs cost only the SELECT.
+        Subclasses do it in a single statement where the database allows.
+        """
+        select = self._format('SELECT long_url FROM {data} WHERE id={p}' +
+                              self.for_update)
+        update = self._format(
+                'UPDATE {data} SET access_counter=(access_counter+1), '
+                'last_accessed={p} WHERE id={p}')
+        with self.cursor('update') as cursor:
+            cursor.execute(select, (int_id,))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            cursor.execute(update, (datetime.datetime.now(), int_id))
+            cursor.connection.commit()
+            return row['long_url']
+
+    def add_click_rollups(self, rollups):
+        """Add clicks to the per-ID, per-day rollups in one transaction.
+
+        Rows are updated, or inserted if missing. If another aggregator
+        inserts the same row concurrently, the transaction is retried, up to
+        rollup_attempts times in all, after which the error is raised: a
+        violation persisting that long is no race. Subclasses do it in one
+        statement where the database allows.
+
+        Args:
+            rollups: iterable of (int_id, day, clicks, last_click) tuples,
+                where day is a datetime.date and last_click the
+                datetime.datetime of the last of the clicks.
+        """
+        rollups = list(rollups)
+        update = self._format(
+                'UPDATE {clicks} SET clicks=(clicks+{p}), '
+                'last_click=(CASE WHEN last_click < {p} THEN {p} '
+                'ELSE last_click END) WHERE int_id={p} AND day={p}')
+        insert = self._format(
+                'INSERT INTO {clicks} (int_id, day, clicks, last_click) '
+                'VALUES({p}, {p}, {p}, {p})')
+        with self.cursor('update') as cursor:
+            for attempt in xrange(1, self.rollup_attempts + 1):
+                try:
+                    for (int_id, day, clicks, last_click) in rollups:
+                        cursor.execute(update, (clicks, last_click,
+                                                last_click, int_id, day))
+                        if not cursor.rowcount:
+                            cursor.execute(insert, (int_id, day, clicks,
+                                                    last_click))
+                    cursor.connection.commit()
+                    return
+                except self.integrity_errors:
+                    cursor.connection.rollback()
+                    if attempt == self.rollup_attempts:
+                        raise
+
+    def click_stats(self, int_id):
+        """Return (clicks, last_click) tuple of the given integer ID from the
+        rollups, where last_click is None if there are no clicks."""
+        total = self._format('SELECT SUM(clicks) AS clicks FROM {clicks} '
+                             'WHERE int_id={p}')
+        last = self._format('SELECT last_click FROM {clicks} WHERE int_id={p} '
+                            'ORDER BY day DESC LIMIT 1')
+
+        def read(cursor):
+            cursor.execute(total, (int_id,))
+            clicks = int(cursor.fetchone()['clicks'] or 0)
+            cursor.execute(last, (int_id,))
+            row = cursor.fetchone()
+            return (clicks, None if row is None else row['last_click'])
+
+        return self._read(read)
+
+    def click_stats_many(self, int_ids):
+        """Return dict mapping those of the given integer IDs which have
+        clicks in the rollups to (clicks, last_click) tuples, read with one
+        query."""
+        int_ids = list(int_ids)
+        if not int_ids:
+            return {}
+        query = self._format(
+                'SELECT int_id, SUM(clicks) AS clicks, MAX(last_click) AS '
+                'last_click FROM {clicks} WHERE int_id IN (' +
+                ', '.join(['{p}'] * len(int_ids)) + ') GROUP BY int_id')
+
+        def read(cursor):
+            cursor.execute(query, int_ids)
+            return dict((row['int_id'], (int(row['clicks']),
+                                         self._timestamp(row['last_click'])))
+                        for row in cursor.fetchall())
+
+        return self._read(read)
+
+    @staticmethod
+    def _timestamp(value):
+        """Return value of an aggregated timestamp column as a
+        datetime.datetime. Subclasses convert where the DB-API module only
+        converts plain columns."""
+        return value
+
+    def increment_many(self, counts):
+        """Increment access counters of several IDs in one statement.
+
+        Args:
+            counts: dict mapping integer IDs to (hits, last_accessed) tuples,
+                where hits is the number to add to the access counter and
+                last_accessed a datetime.datetime object.
+        """
+        if not counts:
+            return
+        int_ids = sorted(counts)
+        cases = ' '.join(['WHEN {p} THEN {p}'] * len(int_ids))
+        query = self._format(
+                'UPDATE {data} SET '
+                'access_counter=(access_counter + CASE id ' + cases + ' END), '
+                'last_accessed=(CASE id ' + cases + ' END) '
+                'WHERE id IN ({ids})',
+                ids=', '.join([self.placeholder] * len(int_ids)))
+        args = []
+        for i in int_ids:
+            args.extend((i, counts[i][0]))
+        for i in int_ids:
+            args.extend((i, counts[i][1]))
+        args.extend(int_ids)
+        with self.cursor('update') as cursor:
+            cursor.execute(query, args)
+            cursor.connection.commit()
@@ -1,6 +1,17 @@
 #!/usr/bin/env python
 # -*- coding: UTF-8 -*-
-import unittest
+# Bulk translations of at least this many items use NumPy if it is installed.
+NUMPY_THRESHOLD = 1000
+
+
+def _import_numpy():
+    """Return the numpy module, or None if it is not installed. Imported on
+    demand to keep it off the path of single translations."""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
 
 
 class Translation(object):
@@ -26,14 +37,19 @@ class Translation(object):
                     'characters.')
 
         self._base = base
+        self._radix = len(base)
+        # Character -> digit value, to avoid linear searches in base.
+        self._digits = dict((c, i) for (i, c) in enumerate(base))
 
     def int_to_base(self, int_id):
         """Translate an integer to its base representation."""
         if self.is_valid_int_id_form(int_id):
+            base = self._base
+            radix = self._radix
             out = []
             while int_id:
-                (int_id, i) = divmod(int_id, len(self.base))
-                out.append(self.base[i])
+                (int_id, i) = divmod(int_id, radix)
+                out.append(base[i])
             # A bit faster than return(''.join(out[::-1])); avoids creating new
             # list.
             out.reverse()
@@ -44,14 +60,143 @@ class Translation(object):
 
     def base_to_int(self, base_id):
         """Translate a base representation to an integer."""
-        if self.is_valid_base_id_form(base_id):
-            base_id = base_id.strip()
-            r = lambda i: self.base.index(base_id[len(base_id)-i-1]) * \
-                    len(self.base)**i
-            return sum([r(j) for j in range(len(base_id))])
-        else:
+        try:
+            stripped = base_id.strip()
+        except AttributeError:
+            raise TypeError('representation must be a string.')
+
+        # Validate and decode in a single pass, using Horner's method instead
+        # of computing a power of the radix per position.
+        digits = self._digits
+        radix = self._radix
+        int_id = 0
+        try:
+            for c in stripped:
+                int_id = int_id * radix + digits[c]
+        except KeyError:
             raise ValueError('"{}" is not a valid ID in the given base.'
                     .format(base_id))
+        return int_id
+
+    def int_to_base_many(self, int_ids, use_numpy=None):
+        """Translate a sequence of integers to a list of base representations.
+
+        Args:
+            int_ids: iterable of integers.
+            use_numpy: True to require the vectorized NumPy implementation,
+                False to never use it, or None to use it for sequences of at
+                least NUMPY_THRESHOLD items if NumPy is installed.
+
+        Raises:
+            ValueError/TypeError as int_to_base().
+            ImportError if use_numpy is True and NumPy is not installed.
+        """
+        int_ids = list(int_ids)
+        numpy = self._numpy_for(len(int_ids), use_numpy)
+        if numpy is not None:
+            out = self._int_to_base_numpy(numpy, int_ids)
+            if out is not None:
+                return out
+        return [self.int_to_base(i) for i in int_ids]
+
+    def base_to_int_many(self, base_ids, use_numpy=None):
+        """Translate a sequence of base representations to a list of integers.
+
+        Args:
+            base_ids: iterable of strings.
+            use_numpy: as for int_to_base_many().
+
+        Raises:
+            ValueError/TypeError as base_to_int().
+            ImportError if use_numpy is True and NumPy is not installed.
+        """
+        base_ids = list(base_ids)
+        numpy = self._numpy_for(len(base_ids), use_numpy)
+        if numpy is not None:
+            out = self._base_to_int_numpy(numpy, base_ids)
+            if out is not None:
+                return out
+        return [self.base_to_int(i) for i in base_ids]
+
+    @staticmethod
+    def _numpy_for(n, use_numpy):
+        """Return numpy module if it should be used for n items, else None."""
+        if use_numpy is None:
+            return _import_numpy() if n >= NUMPY_THRESHOLD else None
+        elif use_numpy:
+            numpy = _import_numpy()
+            if numpy is None:
+                raise ImportError('NumPy is not installed.')
+            return numpy
+        return None
+
+    def _int_to_base_numpy(self, numpy, int_ids):
+        """Vectorized int_to_base_many(). Returns None for input it does not
+        handle (invalid or too large IDs), which is then left to the pure
+        Python implementation."""
+        if not int_ids:
+            return []
+        try:
+            ids = numpy.array(int_ids)
+        except (OverflowError, ValueError):
+            return None
+        if ids.dtype.kind not in 'iu' or ids.ndim != 1 or (ids <= 0).any():
+            return None
+
+        radix = self._radix
+        width = 1
+        largest = int(ids.max())
+        while largest >= radix:
+            largest //= radix
+            width += 1
+
+        # Digits of each ID, most significant first, padded with leading
+        # zeros to the same width.
+        digits = numpy.empty((len(ids), width), dtype=numpy.int64)
+        rest = ids.astype(numpy.int64)
+        for col in range(width - 1, -1, -1):
+            digits[:, col] = rest % radix
+            rest //= radix
+
+        table = numpy.array(list(self._base), dtype='S1')
+        rows = numpy.ascontiguousarray(table[digits]).view(
+                'S{}'.format(width)).ravel()
+        firsts = (digits != 0).argmax(axis=1)
+        return [row[first:] for (row, first)
+                in zip(rows.tolist(), firsts.tolist())]
+
+    def _base_to_int_numpy(self, numpy, base_ids):
+        """Vectorized base_to_int_many(). Returns None for input it does not
+        handle (invalid or too long representations), which is then left to
+        the pure Python implementation."""
+        if not base_ids:
+            return []
+        try:
+            stripped = numpy.array([i.strip() for i in base_ids], dtype='S')
+        except (AttributeError, UnicodeError):
+            return None
+
+        radix = self._radix
+        width = stripped.dtype.itemsize
+        # Leave representations which might overflow int64 to Python.
+        if width == 0 or radix ** width > 2**63 - 1:
+            return None
+
+        table = numpy.full(256, -1, dtype=numpy.int64)
+        for (c, i) in self._digits.iteritems():
+            table[ord(c)] = i
+        codes = table[stripped.view(numpy.uint8).reshape(len(stripped),
+                                                          width)]
+        lengths = numpy.char.str_len(stripped)
+        in_string = numpy.arange(width) < lengths[:, numpy.newaxis]
+        if (codes[in_string] < 0).any():
+            return None
+
+        out = numpy.zeros(len(stripped), dtype=numpy.int64)
+        for col in range(width):
+            out = numpy.where(in_string[:, col], out * radix + codes[:, col],
+                              out)
+        return out.tolist()
 
     def is_valid_base_id_form(self, base_id):
         """Return true/false if string is a valid representation in the given
@@ -97,91 +242,3 @@ class BaseItem(Translation):
     @property
     def int_id(self):
         return self._int_id
-
-
-class TestSequence(unittest.TestCase):
-    def setUp(self):
-        self.representation = '''
-            abcdefghijk mnopqrstuvwxyz
-            A CDEFGH JKLMN PQR TUVWXYZ
-              234 67 9
-          	'''
-        # Precalculated values.
-        self.base_id = 'An'
-        self.int_id = 1337
-
-        self.translation = Translation(self.representation)
-        self.base_item = BaseItem(self.representation, self.base_id)
-
-    def test_translation_init(self):
-        """Check intialization of invalid bases in Translation."""
-        with self.assertRaises(ValueError):
-            Translation('aaa')
-        with self.assertRaises(TypeError):
-            Translation(123)
-        with self.assertRaises(TypeError):
-            Translation(('a', 'b', 'c'))
-        with self.assertRaises(ValueError):
-            Translation(' ')
-        with self.assertRaises(ValueError):
-            Translation('\t')
-        with self.assertRaises(ValueError):
-            Translation('\n')
-
-    def test_translation_functions(self):
-        """Check function calls with invalid arguments and that item
-        translation is bidirectionally consistent in Translation."""
-        with self.assertRaises(TypeError):
-            self.translation.int_to_base('Five')
-        with self.assertRaises(ValueError):
-            self.translation.int_to_base(-1)
-        with self.assertRaises(ValueError):
-            self.translation.int_to_base(2.7)
-        with self.assertRaises(ValueError):
-            self.translation.base_to_int('lBIOS1580')
-
-        self.assertEqual(
-                self.translation.int_to_base(self.int_id), self.base_id)
-        self.assertEqual(
-                self.translation.base_to_int(self.base_id), self.int_id)
-
-        # Check that whitespace is correctly stripped.
-        self.assertEqual(
-                self.translation.base_to_int(' \t\n' + self.base_id + ' \t\n'),
-                self.int_id)
-
-    def test_base_item_init(self):
-        """Test initialization with invalid arguments and that whitespace is
-        handled correctly in BaseItem."""
-        with self.assertRaises(TypeError):
-            BaseItem(self.representation, self.int_id)
-        with self.assertRaises(ValueError):
-            BaseItem(self.representation, 'lBIOS1580')
-        with self.assertRaises(AttributeError):
-            self.base_item.base_id = 'cat'
-        with self.assertRaises(AttributeError):
-            self.base_item.int_id = self.int_id + 1
-
-        # Check that whitespace is correctly stripped.
-        with_space = BaseItem(self.representation,
-                              ' \t\n' + self.base_id + ' \t\n')
-        self.assertEqual(with_space.int_id, self.base_item.int_id)
-
-    def test_base_item_calc(self):
-        """Check concistency in bidirectional translation in BaseItem."""
-        self.assertEqual(self.base_item.base_id, self.base_id)
-        self.assertEqual(self.base_item.int_id, self.int_id)
-
-        # Check that whitespace is correctly stripped.
-        with_space = BaseItem(self.representation,
-                              ' \t\n' + self.base_id + ' \t\n')
-        self.assertEqual(with_space.base_id, self.base_id)
-        self.assertEqual(with_space.int_id, self.int_id)
-
-
-def main():
-    unittest.main()
-
-
-if __name__ == '__main__':
-    main()
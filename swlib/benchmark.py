@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import StringIO
+import datetime
+import math
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import timeit
+import urllib
+import wsgiref.util
+
+import basetranslate
+import config
+import dbinteraction
+import sqlitebackend
+import wsgiapp
+
+
+BASE_CHARS = 'abcdefghijkmnopqrstuvwxyzACDEFGHJKLMNPQRTUVWXYZ234679'
+
+# Default iterations per benchmark of each level.
+ITERATIONS = {'micro': 10000, 'storage': 1000, 'end_to_end': 1000}
+
+# Configuration of the end-to-end benchmarks, on a SQLite stand-in database.
+CONFIG = '''[DB]
+backend = sqlite
+database = {database}
+
+[Web]
+base_url = http://localhost/short/
+title = ShortWeb benchmark
+'''
+
+
+def percentile(sorted_values, fraction):
+    """Return the nearest-rank percentile (fraction between 0 and 1) of a
+    sorted, non-empty list."""
+    index = int(math.ceil(fraction * len(sorted_values))) - 1
+    return sorted_values[max(index, 0)]
+
+
+def run(name, func, iterations, warmup=10):
+    """Time iterations calls of func, which is given the iteration number.
+
+    Returns:
+        dict with the benchmark name, the number of iterations, throughput in
+        calls per second, and latency percentiles, mean, minimum and maximum
+        in microseconds.
+    """
+    timer = timeit.default_timer
+    for i in xrange(min(warmup, iterations)):
+        func(i)
+
+    latencies = []
+    start = timer()
+    for i in xrange(iterations):
+        before = timer()
+        func(i)
+        latencies.append(timer() - before)
+    elapsed = timer() - start
+
+    latencies.sort()
+    microseconds = lambda seconds: round(seconds * 1e6, 3)
+    return {
+        'name': name,
+        'iterations': iterations,
+        'throughput': round(iterations / elapsed, 3) if elapsed else None,
+        'latency_us': {
+            'p50': microseconds(percentile(latencies, 0.50)),
+            'p95': microseconds(percentile(latencies, 0.95)),
+            'p99': microseconds(percentile(latencies, 0.99)),
+            'mean': microseconds(sum(latencies) / iterations),
+            'min': microseconds(latencies[0]),
+            'max': microseconds(latencies[-1]),
+            },
+        }
+
+
+def micro_benchmarks(iterations):
+    """Benchmark Translation.int_to_base() and base_to_int() across ID
+    magnitudes."""
+    translation = basetranslate.Translation(BASE_CHARS)
+    results = []
+    for exponent in (1, 3, 6, 9, 12, 18):
+        int_id = 10 ** exponent
+        base_id = translation.int_to_base(int_id)
+        results.append(run(
+                'int_to_base/1e{}'.format(exponent),
+                lambda i, int_id=int_id: translation.int_to_base(int_id),
+                iterations))
+        results.append(run(
+                'base_to_int/1e{}'.format(exponent),
+                lambda i, base_id=base_id: translation.base_to_int(base_id),
+                iterations))
+    return results
+
+
+def storage_benchmarks(directory, iterations):
+    """Benchmark ShortDBConn and ShortDBEntry on a SQLite database in
+    directory, standing in for the production database."""
+    results = []
+    with dbinteraction.ShortDBConn(
+            backend='sqlite',
+            database=os.path.join(directory, 'storage.sqlite')) as dbconn:
+        dbconn.backend.create_tables(BASE_CHARS)
+
+        base_ids = []
+        results.append(run(
+                'add',
+                lambda i: base_ids.append(
+                        dbconn.add('example.com/{}'.format(i))),
+                iterations))
+        results.append(run(
+                'lookup',
+                lambda i: dbinteraction.ShortDBEntry(
+                        dbconn, base_ids[i % len(base_ids)]),
+                iterations))
+
+        entries = [dbinteraction.ShortDBEntry(dbconn, base_id)
+                   for base_id in base_ids[:100]]
+        results.append(run(
+                'increment',
+                lambda i: entries[i % len(entries)].increment(),
+                iterations))
+        results.append(run(
+                'resolve',
+                lambda i: dbconn.resolve(base_ids[i % len(base_ids)]),
+                iterations))
+    return results
+
+
+def _wsgi_requester(application):
+    """Return function making a request to a WSGI application and returning
+    its status code."""
+    def request(method, query='', body=''):
+        environ = {}
+        wsgiref.util.setup_testing_defaults(environ)
+        environ.update({
+            'REQUEST_METHOD': method,
+            'QUERY_STRING': query,
+            'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': StringIO.StringIO(body),
+            })
+        status = []
+        ''.join(application(environ,
+                            lambda s, headers, exc_info=None: status.append(s)))
+        return int(status[0].split()[0])
+    return request
+
+
+def _cgi_requester(script, directory):
+    """Return function running a CGI script in a process of its own, as a
+    web server would, and returning its status code."""
+    pythonpath = os.path.dirname(os.path.abspath(script))
+    if os.environ.get('PYTHONPATH'):
+        pythonpath += os.pathsep + os.environ['PYTHONPATH']
+
+    def request(method, query='', body=''):
+        environ = dict(os.environ, REQUEST_METHOD=method, QUERY_STRING=query,
+                       CONTENT_TYPE='application/x-www-form-urlencoded',
+                       CONTENT_LENGTH=str(len(body)), PYTHONPATH=pythonpath)
+        process = subprocess.Popen([sys.executable, os.path.abspath(script)],
+                                   cwd=directory, env=environ,
+                                   stdin=subprocess.PIPE,
+                                   stdout=subprocess.PIPE)
+        output = process.communicate(body)[0]
+        if process.returncode:
+            raise RuntimeError('{} exited with status {}.'.format(
+                    script, process.returncode))
+        (head, _, _) = output.partition('\n\n')
+        for line in head.splitlines():
+            (name, _, value) = line.partition(':')
+            if name.lower() == 'status':
+                return int(value.split()[0])
+            if name.lower() == 'location':
+                return 302
+        return 200
+    return request
+
+
+def end_to_end_benchmarks(directory, iterations, cgi_script=None):
+    """Benchmark the redirect, info and create request flows of shortweb.cgi
+    on a SQLite database in directory.
+
+    By default, requests are made in-process to wsgiapp.ShortWebApp, which
+    serves the same routes with its cache and buffered counters. If
+    cgi_script is given, every request runs that script in a new process.
+    """
+    database = os.path.join(directory, 'end_to_end.sqlite')
+    sqlite_backend = sqlitebackend.SQLiteBackend(database=database)
+    sqlite_backend.create_tables(BASE_CHARS)
+    sqlite_backend.close()
+    config_text = CONFIG.format(database=database)
+
+    with dbinteraction.ShortDBConn(backend='sqlite',
+                                   database=database) as dbconn:
+        base_ids = dbconn.add_many(['example.com/{}'.format(i)
+                                    for i in range(1000)])
+
+    if cgi_script is None:
+        request = _wsgi_requester(wsgiapp.ShortWebApp(config.ConfigItems(
+                config_file_descriptor=StringIO.StringIO(config_text))))
+    else:
+        with open(os.path.join(directory, 'shortweb.config'), 'w') as f:
+            f.write(config_text)
+        request = _cgi_requester(cgi_script, directory)
+
+    flows = [
+        ('redirect', 301,
+         lambda i: request('GET', 'short=' + base_ids[i % len(base_ids)])),
+        ('info', 200,
+         lambda i: request('GET', 'short={}+'.format(
+                 base_ids[i % len(base_ids)]))),
+        ('create', 302,
+         lambda i: request('POST', body=urllib.urlencode(
+                 {'new_url': 'example.org/{}'.format(i)}))),
+        ]
+    results = []
+    for (name, expected_status, flow) in flows:
+        # Make sure that the intended path is measured, not an error page.
+        status = flow(0)
+        if status != expected_status:
+            raise RuntimeError('{} request gave status {}, not {}.'.format(
+                    name, status, expected_status))
+        results.append(run(name, flow, iterations))
+    return results
+
+
+def run_benchmarks(levels=('micro', 'storage', 'end_to_end'),
+                   iterations=None, cgi_script=None):
+    """Run the benchmarks of the given levels.
+
+    Args:
+        levels: any of "micro", "storage" and "end_to_end".
+        iterations: iterations per benchmark (default: ITERATIONS of the
+            level)
+        cgi_script: path of shortweb.cgi to run for every end-to-end request
+            (default: serve them in-process with wsgiapp.ShortWebApp)
+
+    Returns:
+        dict, serializable as JSON, with run information and a list of
+        results (see run()) per level.
+    """
+    for level in levels:
+        if level not in ITERATIONS:
+            raise ValueError('unknown benchmark level "{}".'.format(level))
+
+    report = {
+        'started': datetime.datetime.utcnow().isoformat() + 'Z',
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'storage': 'sqlite',
+        'end_to_end_mode': 'wsgi' if cgi_script is None else 'cgi',
+        'results': {},
+        }
+    directory = tempfile.mkdtemp()
+    try:
+        for level in levels:
+            n = int(iterations or ITERATIONS[level])
+            if level == 'micro':
+                results = micro_benchmarks(n)
+            elif level == 'storage':
+                results = storage_benchmarks(directory, n)
+            else:
+                results = end_to_end_benchmarks(directory, n,
+                                                cgi_script=cgi_script)
+            report['results'][level] = results
+    finally:
+        shutil.rmtree(directory)
+    return report
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import collections
+import threading
+import time
+
+
+class LRUCache(object):
+    """Bounded least recently used cache with optional expiry of entries.
+
+    Args:
+        max_entries: maximum number of entries held   (default: 10000)
+        ttl:         seconds an entry is valid after being stored; 0 means
+                     that entries never expire       (default: 3600)
+        timer:       function returning the current time in seconds
+                     (default: time.time)
+
+    Usage:
+        cache = LRUCache(max_entries=100, ttl=60)
+        cache.put(1337, 'http://example.com/')
+        cache.get(1337)
+
+    Raises:
+        ValueError if max_entries is not positive or ttl is negative.
+    """
+    def __init__(self, max_entries=10000, ttl=3600, timer=time.time):
+        max_entries = int(max_entries)
+        ttl = float(ttl)
+        if max_entries < 1:
+            raise ValueError('max_entries must be positive.')
+        if ttl < 0:
+            raise ValueError('ttl must not be negative.')
+
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._timer = timer
+        # key -> (expiry time, value), in order of least to most recently
+        # used.
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def max_entries(self):
+        return self._max_entries
+
+    @property
+    def ttl(self):
+        return self._ttl
+
+    @property
+    def hits(self):
+        return self._hits
+
+    @property
+    def misses(self):
+        return self._misses
+
+    @property
+    def evictions(self):
+        """Number of entries dropped due to size limit or expiry."""
+        return self._evictions
+
+    def get(self, key, default=None):
+        """Return cached value for key, or default if not cached."""
+        with self._lock:
+            try:
+                (expires, value) = self._entries.pop(key)
+            except KeyError:
+                self._misses += 1
+                return default
+
+            if expires is not None and expires <= self._timer():
+                self._evictions += 1
+                self._misses += 1
+                return default
+
+            # Reinsert to mark as most recently used.
+            self._entries[key] = (expires, value)
+            self._hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store value for key, evicting the least recently used entry if the
+        cache is full."""
+        expires = self._timer() + self._ttl if self._ttl else None
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (expires, value)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, key):
+        """Drop the entry for key, if any."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Drop all entries. Statistics are kept."""
+        with self._lock:
+            self._entries.clear()
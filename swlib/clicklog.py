@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import datetime
+import os
+import re
+import socket
+import threading
+import time
+
+import config
+
+
+# Segment file names: clicks-<UTC start time>-<host>.log
+_SEGMENT_NAME = re.compile(r'^clicks-(\d{8}T\d{6})-(.+)\.log$')
+_SEGMENT_TIME_FORMAT = '%Y%m%dT%H%M%S'
+_SEPARATORS = re.compile(r'[\t\r\n]')
+# Longer referrers and user agents are truncated, so that every event is
+# written with one short write().
+MAX_FIELD_LENGTH = 1024
+
+
+def _field(value):
+    if not value:
+        return ''
+    return _SEPARATORS.sub(' ', value[:MAX_FIELD_LENGTH])
+
+
+class ClickLog(object):
+    """Append-only log of redirects (clicks) in local files, so that counting
+    them costs no database writes. rollup() folds the events into per-ID,
+    per-day counts in the database.
+
+    Events are tab-separated lines of integer ID, Unix time, referrer and
+    user agent, appended with one write() each, so that several processes
+    (e.g. one per CGI request) can log to the same file. Files are segments
+    of segment_seconds each: an event is written to the segment of its time,
+    and rollup() only reads segments which have ended.
+
+    Args:
+        directory: directory of the segment files.
+        segment_seconds: length of a segment (default: 60)
+        referrer: if true, log the referrer of clicks (default: False)
+        user_agent: if true, log the user agent of clicks (default: False)
+        clock: function returning Unix time (default: time.time)
+
+    Usage:
+        with ClickLog('/var/lib/shortweb/clicks') as click_log:
+            click_log.record(1337, referrer='http://example.com/')
+    """
+    def __init__(self, directory, segment_seconds=60, referrer=False,
+                 user_agent=False, clock=time.time):
+        self._directory = directory
+        self._segment_seconds = int(segment_seconds)
+        if self._segment_seconds < 1:
+            raise ValueError('segment_seconds must be positive.')
+        self._referrer = config.boolean(referrer)
+        self._user_agent = config.boolean(user_agent)
+        self._clock = clock
+        self._host = re.sub(r'[^\w.]', '_', socket.gethostname())
+        # Start of the current segment and its file descriptor.
+        self._segment = None
+        self._fd = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    @property
+    def directory(self):
+        return self._directory
+
+    @property
+    def segment_seconds(self):
+        return self._segment_seconds
+
+    def record(self, int_id, referrer=None, user_agent=None):
+        """Append a click of the given integer ID."""
+        now = self._clock()
+        line = '{}\t{:.3f}\t{}\t{}\n'.format(
+                int_id, now, _field(referrer) if self._referrer else '',
+                _field(user_agent) if self._user_agent else '')
+        segment = int(now) - int(now) % self._segment_seconds
+        with self._lock:
+            if segment != self._segment:
+                self._close()
+                path = os.path.join(self._directory, 'clicks-{}-{}.log'.format(
+                        time.strftime(_SEGMENT_TIME_FORMAT,
+                                      time.gmtime(segment)),
+                        self._host))
+                self._fd = os.open(path,
+                                   os.O_WRONLY | os.O_APPEND | os.O_CREAT,
+                                   0644)
+                self._segment = segment
+            os.write(self._fd, line)
+
+    def _close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = self._segment = None
+
+    def close(self):
+        """Close the current segment file."""
+        with self._lock:
+            self._close()
+
+
+def read_events(path):
+    """Yield (int_id, datetime.datetime, referrer, user_agent) tuples of the
+    events of a segment file, in local time, skipping malformed lines (e.g. a
+    partial last line of a full disk)."""
+    with open(path) as f:
+        for line in f:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) != 4 or not line.endswith('\n'):
+                continue
+            try:
+                int_id = int(fields[0])
+                timestamp = datetime.datetime.fromtimestamp(float(fields[1]))
+            except ValueError:
+                continue
+            yield (int_id, timestamp, fields[2] or None, fields[3] or None)
+
+
+def ended_segments(directory, segment_seconds=60, grace=5, now=None):
+    """Return sorted paths of the segment files in directory which ended at
+    least grace seconds ago."""
+    now = time.time() if now is None else now
+    paths = []
+    for name in os.listdir(directory):
+        match = _SEGMENT_NAME.match(name)
+        if match is None:
+            continue
+        start = datetime.datetime.strptime(match.group(1),
+                                           _SEGMENT_TIME_FORMAT)
+        start = (start - datetime.datetime(1970, 1, 1)).total_seconds()
+        if start + segment_seconds + grace <= now:
+            paths.append(os.path.join(directory, name))
+    return sorted(paths)
+
+
+def rollup(dbconn, directory, segment_seconds=60, archive_directory=None,
+           grace=5, now=None):
+    """Fold the events of ended segments into the per-ID, per-day click
+    rollups of the database (see ShortDBConn.add_click_rollups()), one
+    transaction per segment, and then remove the segments, or move them to
+    archive_directory if given, e.g. to keep referrers and user agents.
+
+    A segment is rolled up again if the process dies after its transaction
+    but before it is removed, so clicks are counted at least once.
+
+    Args:
+        dbconn: ShortDBConn object.
+        directory: directory of the segment files.
+        segment_seconds: as for ClickLog (default: 60)
+        archive_directory: optional directory to move rolled up segments to.
+        grace: seconds to wait after the end of a segment, for writes of
+            events timed just before it (default: 5)
+        now: optional Unix time to use as the current time.
+
+    Returns:
+        (number of segments, number of events) tuple.
+    """
+    (segments, events) = (0, 0)
+    for path in ended_segments(directory, int(segment_seconds), grace, now):
+        # (int_id, day) -> [clicks, last_click]
+        rollups = {}
+        for (int_id, timestamp, _, _) in read_events(path):
+            entry = rollups.setdefault((int_id, timestamp.date()),
+                                       [0, timestamp])
+            entry[0] += 1
+            entry[1] = max(entry[1], timestamp)
+            events += 1
+        dbconn.add_click_rollups(
+                (int_id, day, clicks, last_click)
+                for ((int_id, day), (clicks, last_click))
+                in sorted(rollups.iteritems()))
+        if archive_directory is None:
+            os.remove(path)
+        else:
+            os.rename(path, os.path.join(archive_directory,
+                                         os.path.basename(path)))
+        segments += 1
+    return (segments, events)
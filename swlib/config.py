@@ -1,8 +1,6 @@
 #!/usr/bin/env python
 # -*- coding: UTF-8 -*-
 import ConfigParser
-import StringIO
-import unittest
 
 
 class ConfigItems(object):
@@ -10,6 +8,10 @@ class ConfigItems(object):
     configuration file readable by ConfigParser.SafeConfigParser as defined in
     the documentation of the ConfigParser module.
 
+    Values from the optional "Cache", "Counter", "Metrics", "Index", "Clicks",
+    "NotFound", "Limits" and "SharedCache" sections are also available, as
+    empty dicts if the sections are missing.
+
     Args:
         config_file_descriptor: optional file descriptor.
         config_file: optional filename.
@@ -35,6 +37,22 @@ class ConfigItems(object):
 
         self._dbargs = dict(config.items('DB'))
         self._webargs = dict(config.items('Web'))
+        self._cacheargs = self._optional_items(config, 'Cache')
+        self._counterargs = self._optional_items(config, 'Counter')
+        self._metricsargs = self._optional_items(config, 'Metrics')
+        self._indexargs = self._optional_items(config, 'Index')
+        self._clicksargs = self._optional_items(config, 'Clicks')
+        self._notfoundargs = self._optional_items(config, 'NotFound')
+        self._limitsargs = self._optional_items(config, 'Limits')
+        self._sharedcacheargs = self._optional_items(config, 'SharedCache')
+
+    @staticmethod
+    def _optional_items(config, section):
+        """Return values of a section which is allowed to be missing."""
+        try:
+            return dict(config.items(section))
+        except ConfigParser.NoSectionError:
+            return {}
 
     @property
     def dbargs(self):
@@ -44,115 +62,63 @@ class ConfigItems(object):
     def webargs(self):
         return self._webargs
 
+    @property
+    def cacheargs(self):
+        return self._cacheargs
+
+    @property
+    def counterargs(self):
+        return self._counterargs
+
+    @property
+    def metricsargs(self):
+        return self._metricsargs
+
+    @property
+    def indexargs(self):
+        return self._indexargs
+
+    @property
+    def clicksargs(self):
+        return self._clicksargs
+
+    @property
+    def notfoundargs(self):
+        return self._notfoundargs
+
+    @property
+    def limitsargs(self):
+        return self._limitsargs
+
+    @property
+    def sharedcacheargs(self):
+        return self._sharedcacheargs
 
-class TestSequence(unittest.TestCase):
-    def setUp(self):
-        self.fields = {
-                'host':'localhost',
-                'user': 'short',
-                'passwd': 'shortpassword',
-                'db': 'short',
-                'base_url': 'http://example.com/s/',
-                'title': 'Test suite title',
-                'h1': 'Test suite h1'}
-
-    def test_configitems_data_integrity(self):
-        """Read back values should be identical to input."""
-        config_contents = (
-                '[DB]\n'
-                'host = {host}\n'
-                'user = {user}\n'
-                'passwd = {passwd}\n'
-                'db = {db}\n'
-                '\n'
-                '[Web]\n'
-                'base_url = {base_url}\n'
-                'title = {title}\n'
-                'h1 = {h1}').format(**self.fields)
-
-        testfile = StringIO.StringIO(config_contents)
-        c = ConfigItems(config_file_descriptor=testfile)
-
-        self.assertEqual(c.dbargs['host'], self.fields['host'])
-        self.assertEqual(c.dbargs['user'], self.fields['user'])
-        self.assertEqual(c.dbargs['passwd'], self.fields['passwd'])
-        self.assertEqual(c.dbargs['db'], self.fields['db'])
-        self.assertEqual(c.webargs['base_url'], self.fields['base_url'])
-        self.assertEqual(c.webargs['title'], self.fields['title'])
-
-    def test_configitems_sections_exist(self):
-        """Lack of [DB] and/or [Web] sections should raise
-        ConfigParser.NoSectionError."""
-        config_contents_no_db = (
-                '[Web]\n'
-                'base_url = {base_url}\n'
-                'title = {title}\n'
-                'h1 = {h1}').format(**self.fields)
-
-        config_contents_no_web = (
-                '[DB]\n'
-                'host = {host}\n'
-                'user = {user}\n'
-                'passwd = {passwd}\n'
-                'db = {db}\n').format(**self.fields)
-
-
-        with self.assertRaises(ConfigParser.NoSectionError):
-            testfile = StringIO.StringIO(config_contents_no_db)
-            ConfigItems(config_file_descriptor=testfile)
-
-        with self.assertRaises(ConfigParser.NoSectionError):
-            testfile = StringIO.StringIO(config_contents_no_web)
-            ConfigItems(config_file_descriptor=testfile)
-
-    def test_configuration_no_empty_values(self):
-        """Empty values should not be allowed and raise
-        ConfigParser.ParserError."""
-        config_contents_empty_value = (
-                '[DB]\n'
-                'host\n'
-                '\n'
-                '[Web]\n'
-                'base_url = {base_url}\n'
-                'title = {title}\n'
-                'h1 = {h1}').format(**self.fields)
-
-        with self.assertRaises(ConfigParser.ParsingError):
-            testfile = StringIO.StringIO(config_contents_empty_value)
-            ConfigItems(config_file_descriptor=testfile)
-
-    def test_configitems_non_existent_file(self):
-        """Non-existent filename should raise IOError."""
-        with self.assertRaises(IOError):
-            ConfigItems(config_file='/bananarama')
-
-    def test_configitems_interpolation(self):
-        """Ensure implementation of ConfigParser style %()s interpolation."""
-        config_contents_interpolation = (
-                '[DB]\n'
-                'host = {host}\n'
-                'user = {user}\n'
-                'passwd = {passwd}\n'
-                'db = {db}\n'
-                '\n'
-                '[Web]\n'
-                'domain = {domain}\n'
-                'base_url = %(domain)s/s/\n'
-                'title = %(domain)s title\n'
-                'h1 = %(title)s in body\n').format(domain='example.com',
-                                                   **self.fields)
-
-        testfile = StringIO.StringIO(config_contents_interpolation)
-        c = ConfigItems(config_file_descriptor=testfile)
-
-        self.assertEqual(c.webargs['base_url'], 'example.com/s/')
-        self.assertEqual(c.webargs['title'], 'example.com title')
-        self.assertEqual(c.webargs['h1'], 'example.com title in body')
-
-
-def main():
-    unittest.main()
-
-
-if __name__ == '__main__':
-    main()
+
+def boolean(value):
+    """Interpret a configuration value as a boolean the way
+    ConfigParser.getboolean() does.
+
+    Raises:
+        ValueError if the value is not a recognized boolean.
+    """
+    if isinstance(value, bool):
+        return value
+    try:
+        return {'1': True, 'yes': True, 'true': True, 'on': True,
+                '0': False, 'no': False, 'false': False, 'off': False}[
+                        value.lower()]
+    except KeyError:
+        raise ValueError('not a boolean: {}'.format(value))
+
+
+def split_list(value):
+    """Return list of the comma-separated items of a configuration value,
+    stripped of whitespace. Lists and tuples are returned as lists.
+
+    Usage:
+        split_list('db1, db2:3307') == ['db1', 'db2:3307']
+    """
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [item.strip() for item in value.split(',') if item.strip()]
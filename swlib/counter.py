@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import datetime
+import threading
+import traceback
+
+
+class CounterBuffer(object):
+    """Collect access counter increments in memory and write them to the
+    database in batches (write-behind), instead of one UPDATE and COMMIT per
+    redirect.
+
+    Pending increments are flushed in one statement when flush_hits hits have
+    been collected, at the latest every flush_interval milliseconds, and on
+    close(). Up to flush_interval milliseconds of hits can thus be lost if the
+    process dies; this is the durability window. last_accessed is set to the
+    time of the last collected hit of each ID.
+
+    Args:
+        dbconn: ShortDBConn object to write with. With write-behind it is used
+            from a background thread, so it must not be shared with request
+            handling unless it is thread safe.
+        flush_interval: maximum number of milliseconds between flushes
+            (default: 1000).
+        flush_hits: number of pending hits which triggers a flush
+            (default: 1000).
+        synchronous: if true, increment in the database on every hit like
+            ShortDBEntry.increment() does, and start no background thread
+            (default: False).
+
+    Usage:
+        with CounterBuffer(ShortDBConn(...)) as counter:
+            counter.add(1337)
+    """
+    def __init__(self, dbconn, flush_interval=1000, flush_hits=1000,
+                 synchronous=False):
+        self._dbconn = dbconn
+        self._flush_interval = float(flush_interval) / 1000
+        self._flush_hits = int(flush_hits)
+        self._synchronous = synchronous
+
+        # int_id -> (hits, last_accessed)
+        self._counts = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+        # Serializes database access.
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+
+        if not synchronous:
+            self._thread = threading.Thread(target=self._run,
+                                            name='CounterBuffer')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    @property
+    def synchronous(self):
+        return self._synchronous
+
+    @property
+    def pending(self):
+        """Number of hits not yet written to the database."""
+        return self._pending
+
+    def add(self, int_id):
+        """Record one hit of the given integer ID."""
+        if self._synchronous:
+            with self._flush_lock:
+                self._dbconn.increment(int_id)
+            return
+
+        now = datetime.datetime.now()
+        with self._lock:
+            (hits, _) = self._counts.get(int_id, (0, None))
+            self._counts[int_id] = (hits + 1, now)
+            self._pending += 1
+            if self._pending >= self._flush_hits:
+                self._wakeup.set()
+
+    def flush(self):
+        """Write all pending hits to the database. On failure, the hits are
+        kept for the next flush and the exception is reraised."""
+        with self._flush_lock:
+            with self._lock:
+                (counts, self._counts) = (self._counts, {})
+                self._pending = 0
+            if not counts:
+                return
+
+            try:
+                self._dbconn.increment_many(counts)
+            except Exception:
+                self._merge(counts)
+                raise
+
+    def _merge(self, counts):
+        """Put hits back in the buffer, e.g. after a failed flush."""
+        with self._lock:
+            for (int_id, (hits, last_accessed)) in counts.iteritems():
+                (pending_hits, pending_last_accessed) = self._counts.get(
+                        int_id, (0, last_accessed))
+                self._counts[int_id] = (
+                        hits + pending_hits,
+                        max(last_accessed, pending_last_accessed))
+                self._pending += hits
+
+    def _run(self):
+        """Flush periodically until closed."""
+        while not self._closed:
+            self._wakeup.wait(self._flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                # Keep going; the hits are retried on the next flush.
+                traceback.print_exc()
+
+    def close(self):
+        """Stop the background thread and flush pending hits."""
+        if self._closed:
+            return
+        self._closed = True
+        if not self._synchronous:
+            self._wakeup.set()
+            self._thread.join()
+        self.flush()
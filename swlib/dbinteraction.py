@@ -1,52 +1,219 @@
 #!/usr/bin/env python
 # -*- coding: UTF-8 -*-
-import datetime
-import random
-import unittest
-
-import dateutil.tz
-import MySQLdb
-import MySQLdb.cursors
-import _mysql_exceptions
+import hashlib
+import heapq
+import itertools
+import threading
+import urlparse
 
 import basetranslate
 import config
+import idallocator
+import pool
+
+
+def normalize_url(long_url):
+    """Return the form of a long URL used for duplicate detection: scheme
+    and host in lower case, without default port and with '/' for an empty
+    path."""
+    parts = urlparse.urlsplit(long_url.strip())
+    scheme = parts.scheme.lower()
+
+    (userinfo, at, hostport) = parts.netloc.rpartition('@')
+    hostport = hostport.lower()
+    default_port = {'http': ':80', 'https': ':443'}.get(scheme)
+    if default_port is not None and hostport.endswith(default_port):
+        hostport = hostport[:-len(default_port)]
+
+    return urlparse.urlunsplit((scheme, userinfo + at + hostport,
+                                parts.path or '/', parts.query,
+                                parts.fragment))
+
+
+def url_hash(long_url):
+    """Return fixed-width digest (40 hexadecimal characters) of the
+    normalized long URL."""
+    if isinstance(long_url, unicode):
+        long_url = long_url.encode('utf-8')
+    return hashlib.sha1(normalize_url(long_url)).hexdigest()
+
+
+def _keyed_by_id(chunks):
+    """Yield (id, row) tuples of the rows of chunks, for heapq.merge()."""
+    for chunk in chunks:
+        for row in chunk:
+            yield (row['id'], row)
+
+
+def _chunked(keyed_rows, chunk_size):
+    """Yield lists of up to chunk_size rows of (id, row) tuples."""
+    while True:
+        chunk = [row for (_, row)
+                 in itertools.islice(keyed_rows, int(chunk_size))]
+        if not chunk:
+            return
+        yield chunk
+
+
+class NotFound(IndexError):
+    """Raised when a valid short ID has no database entry.
+
+    Attributes:
+        base_id: base representation, without surrounding whitespace.
+        int_id: integer ID.
+    """
+    def __init__(self, base_id, int_id):
+        super(NotFound, self).__init__(
+                'Entry {} in the custom base (int: {}) does not have a '
+                'corresponding database entry.'.format(base_id, int_id))
+        self.base_id = base_id
+        self.int_id = int_id
+
+
+def backend_class(name):
+    """Return the storage backend class of the given name, "mysql" or
+    "sqlite". Backend modules are imported on demand, so that e.g. MySQLdb
+    need not be installed when using SQLite.
+
+    Raises:
+        ValueError on unknown backend names.
+    """
+    if name == 'mysql':
+        import mysqlbackend
+        return mysqlbackend.MySQLBackend
+    elif name == 'sqlite':
+        import sqlitebackend
+        return sqlitebackend.SQLiteBackend
+    raise ValueError('unknown storage backend "{}".'.format(name))
 
 
 class ShortDBConn(object):
     """Connection to Short database.
 
+    The storage itself is handled by a backend (see backend.SQLBackend),
+    which pools its connections and checks out a cursor of its own for every
+    operation, so that ShortDBConn and ShortDBEntry objects may be used from
+    several threads.
+
     Args:
+        backend: storage backend, "mysql" or "sqlite" (default: mysql)
         data_table_name: name of table with ID mappings.
         info_table_name: name of table with database settings (i.e. the base
             reprentation characters).
-        host: MySQL hostname      (default: localhost)
-        user: MySQL username      (default: short)
-        db:   MySQL database name (default: short)
-        **kwargs: passed to MySQLdb.connect(), except cursorclass attribute,
-                  which is hardcoded to MySQLdb.cursors.DictCursor.
+        dedup: if true, adding an already shortened URL returns its existing
+            short ID, by looking up a digest of the normalized URL (see
+            url_hash()) in the uniquely indexed url_hash column
+            (default: False)
+        id_block_size: if positive, new rows get IDs from blocks of this many
+            IDs leased from the sequence table (see
+            idallocator.BlockAllocator), so that several writer nodes do not
+            contend on AUTO_INCREMENT; otherwise AUTO_INCREMENT is used
+            (default: 0)
+        archive: if true, entries missing from the data table are looked up
+            in the archive table, where archive_idle() moves idle entries,
+            and max_id(), mappings() and rows() include archived entries
+            (default: False)
+        promote: if true, archived entries are moved back to the data table
+            when looked up, so that their accesses are counted again; if
+            false, archived entries are read-only (default: False)
+        **kwargs: passed to the backend; see mysqlbackend.MySQLBackend and
+                  sqlitebackend.SQLiteBackend. For MySQL, e.g.:
+            host: MySQL hostname      (default: localhost)
+            user: MySQL username      (default: short)
+            db:   MySQL database name (default: short)
+            pool_min_size: connections opened up front           (default: 1)
+            pool_max_size: maximum number of connections         (default: 5)
+            pool_timeout:  seconds to wait for a free connection (default: 10)
+            replicas: read replicas, "host[:port], ..."         (default: none)
 
     Usage:
         with ShortDBConn(...) as myconn:
             ...
 
     Raises:
+        ValueError on unknown backend.
         _mysql_exceptions.OperationalError on failed MySQL login.
     """
-    def __init__(self, host='localhost', user='short', db='short',
-                 data_table_name='translation_table',
-                 info_table_name='base_info', **kwargs):
-        self._data_table_name = data_table_name
-        self._info_table_name = info_table_name
-        kwargs['cursorclass'] = MySQLdb.cursors.DictCursor
-        self.conn = MySQLdb.connect(host=host, user=user, db=db, **kwargs)
-        self.cursor = self.conn.cursor()
+    def __init__(self, backend='mysql', data_table_name='translation_table',
+                 info_table_name='base_info', dedup=False, id_block_size=0,
+                 archive=False, promote=False, lazy=False, base_chars=None,
+                 **kwargs):
+        self._dedup = config.boolean(dedup)
+        self._archive = config.boolean(archive)
+        self._promote = config.boolean(promote)
+        self._backend_class = backend_class(backend)
+        self._backend_args = dict(kwargs, data_table_name=data_table_name,
+                                  info_table_name=info_table_name)
+        self._id_block_size = int(id_block_size)
+        self._backend = None
+        self._allocator = None
+        self._backend_lock = threading.Lock()
+        if base_chars is not None:
+            self._base_chars = base_chars
+        if not config.boolean(lazy):
+            self.backend
 
     def __enter__(self):
         return self
 
     def __exit__(self, type, value, traceback):
-        self.cursor.close()
+        self.close()
+
+    def close(self):
+        """Give back unused leased IDs and close all pooled connections."""
+        if self._backend is None:
+            return
+        try:
+            if self._allocator is not None:
+                self._allocator.close()
+        finally:
+            self._backend.close()
+
+    @property
+    def backend(self):
+        """Storage backend, connected on first use if lazy is set."""
+        if self._backend is None:
+            with self._backend_lock:
+                if self._backend is None:
+                    backend = self._backend_class(**self._backend_args)
+                    if self._id_block_size:
+                        self._allocator = idallocator.BlockAllocator(
+                                backend, block_size=self._id_block_size)
+                    self._backend = backend
+        return self._backend
+
+    @property
+    def errors(self):
+        """Tuple of the exceptions raised when the database cannot be used,
+        e.g. while it is down."""
+        return self._backend_class.database_errors + (pool.PoolTimeout,)
+
+    @property
+    def data_table_name(self):
+        return self.backend.data_table_name
+
+    @property
+    def dedup(self):
+        return self._dedup
+
+    @property
+    def leased_ids(self):
+        """True if new rows get IDs from leased blocks (see id_block_size).
+        Writers then commit their IDs in any order, so an ID above the
+        highest one read may still be followed by lower ones, and exports
+        cannot resume after the highest ID they have seen."""
+        return self._id_block_size > 0
+
+    def cursor(self):
+        """Context manager yielding a cursor on a pooled connection; see
+        backend.SQLBackend.cursor().
+
+        Usage:
+            with myconn.cursor() as cursor:
+                cursor.execute(...)
+                cursor.connection.commit()
+        """
+        return self.backend.cursor()
 
     @property
     def base_chars(self):
@@ -54,12 +221,29 @@ class ShortDBConn(object):
         try:
             return self._base_chars
         except AttributeError:
-            query = 'SELECT base_chars FROM {} LIMIT 1'.format(
-                    self._info_table_name)
-            self.cursor.execute(query)
-            self._base_chars = self.cursor.fetchone()['base_chars']
+            self._base_chars = self.backend.base_chars()
             return self._base_chars
 
+    @property
+    def translation(self):
+        """basetranslate.Translation object of the base representation."""
+        try:
+            return self._translation
+        except AttributeError:
+            self._translation = basetranslate.Translation(self.base_chars)
+            return self._translation
+
+    def int_id(self, base_id):
+        """Return integer ID of the given base representation.
+
+        Raises:
+            ValueError if base_id is not a valid representation.
+        """
+        int_id = self.translation.base_to_int(base_id)
+        if not self.translation.is_valid_int_id_form(int_id):
+            raise ValueError('"{}" is not a valid ID in the given base.'
+                    .format(base_id))
+        return int_id
 
     def add(self, long_url):
         """Add new URL mapper.
@@ -73,34 +257,230 @@ class ShortDBConn(object):
         if not long_url.startswith(('http://', 'https://')):
             long_url = 'http://' + long_url
 
-        query = 'INSERT INTO {} (long_url, created) VALUES(%s, now())'.format(
-            self._data_table_name)
-        self.cursor.execute(query, (long_url))
-        self.conn.commit()
-        # Capture this before the self.base_chars call, since that reuses the
-        # cursor for fetching the base which resets self.cursor.lastrowid.
-        new_id = self.cursor.lastrowid
-        return basetranslate.Translation(self.base_chars).int_to_base(new_id)
+        backend = self.backend
+        int_id = None
+        if self._allocator is not None:
+            (int_id,) = self._allocator.allocate()
+        new_id = backend.add(
+                long_url, url_hash(long_url) if self._dedup else None, int_id)
+        return self.translation.int_to_base(new_id)
+
+    def add_many(self, long_urls, chunk_size=1000):
+        """Add several new URL mappers, inserting chunk_size URLs at a time
+        with one commit per chunk.
+
+        Args:
+            long_urls: iterable of long URLs.
+            chunk_size: number of URLs per INSERT and commit.
+
+        Returns:
+            list of base representations in input order.
+        """
+        chunk_size = int(chunk_size)
+        if chunk_size < 1:
+            raise ValueError('chunk_size must be positive.')
+
+        translation = self.translation
+        base_ids = []
+        chunk = []
+        for long_url in long_urls:
+            if not long_url.startswith(('http://', 'https://')):
+                long_url = 'http://' + long_url
+            chunk.append(long_url)
+            if len(chunk) == chunk_size:
+                base_ids.extend(translation.int_to_base_many(
+                        self._add_chunk(chunk)))
+                chunk = []
+        base_ids.extend(translation.int_to_base_many(self._add_chunk(chunk)))
+        return base_ids
+
+    def _add_chunk(self, long_urls):
+        backend = self.backend
+        int_ids = None
+        if self._allocator is not None and long_urls:
+            int_ids = self._allocator.allocate(len(long_urls))
+        if self._dedup:
+            return backend.add_many(
+                    long_urls, [url_hash(long_url) for long_url in long_urls],
+                    int_ids)
+        return backend.add_many(long_urls, int_ids=int_ids)
+
+    def lookup(self, int_id):
+        """Return dict with long_url, last_accessed, created and
+        access_counter of the given integer ID, or None if it does not
+        exist. With archive, an archived entry is returned, and promoted to
+        the data table if promote is set."""
+        row = self.backend.lookup(int_id)
+        if row is None and self._archive:
+            row = self._lookup_archived(int_id)
+        return row
+
+    def lookup_many(self, int_ids, chunk_size=500):
+        """Return dict mapping those of the given integer IDs which exist to
+        dicts as lookup() returns, reading chunk_size IDs per query. With
+        archive, archived entries are included but never promoted, so that
+        e.g. link checkers do not bring idle links back."""
+        int_ids = sorted(set(int_ids))
+        found = {}
+        for start in xrange(0, len(int_ids), int(chunk_size)):
+            chunk = int_ids[start:start + int(chunk_size)]
+            found.update(self.backend.lookup_many(chunk))
+            if self._archive:
+                missing = [int_id for int_id in chunk if int_id not in found]
+                found.update(self.backend.lookup_many(missing,
+                                                      archived=True))
+        return found
+
+    def _lookup_archived(self, int_id):
+        row = self.backend.lookup_archived(int_id)
+        if row is not None and self._promote:
+            self.backend.promote(int_id, url_hash=self._dedup)
+        return row
+
+    def max_id(self):
+        """Return the highest integer ID in use, or 0 if there is none. With
+        archive, archived entries are included."""
+        max_id = self.backend.max_id()
+        if self._archive:
+            max_id = max(max_id, self.backend.max_id(archived=True))
+        return max_id
+
+    def mappings(self, after_id=0, batch_size=1000):
+        """Yield (int_id, base_id, long_url) tuples of all entries with
+        integer IDs above after_id, in ID order, reading batch_size rows at a
+        time. With archive, archived entries are included."""
+        int_to_base = self.translation.int_to_base
+        rows = self.backend.mappings(after_id, batch_size)
+        if self._archive:
+            rows = heapq.merge(rows, self.backend.mappings(
+                    after_id, batch_size, archived=True))
+        for (int_id, long_url) in rows:
+            yield (int_id, int_to_base(int_id), long_url)
+
+    def rows(self, after_id=0, chunk_size=1000):
+        """Yield lists of up to chunk_size entries with integer IDs above
+        after_id, in ID order, streamed from the database (see
+        backend.SQLBackend.rows()). Entries are dicts of the columns and
+        short_id, the base representation of id. With archive, archived
+        entries are included.
+        """
+        chunks = self.backend.rows(after_id, chunk_size)
+        if self._archive:
+            chunks = _chunked(heapq.merge(
+                    _keyed_by_id(chunks),
+                    _keyed_by_id(self.backend.rows(after_id, chunk_size,
+                                                   archived=True))),
+                    chunk_size)
+        int_to_base_many = self.translation.int_to_base_many
+        for chunk in chunks:
+            short_ids = int_to_base_many(row['id'] for row in chunk)
+            for (row, short_id) in zip(chunk, short_ids):
+                row['short_id'] = short_id
+            yield chunk
+
+    def archive_idle(self, before, after_id, end_id, clicks=False):
+        """Move entries with IDs above after_id and up to end_id, not
+        accessed since the given datetime.datetime, to the archive table;
+        with clicks true, not clicked since either according to the click
+        rollups. See backend.SQLBackend.archive_idle(). Returns number
+        moved."""
+        return self.backend.archive_idle(before, after_id, end_id,
+                                         url_hash=self._dedup, clicks=clicks)
+
+    def increment(self, int_id):
+        """Increment access counter of the given integer ID by 1."""
+        self.backend.increment(int_id)
+
+    def resolve(self, base_id, count=True):
+        """Return long URL of the given base representation and count the
+        access, in one database round trip where the backend allows.
+
+        This is the redirect path; use ShortDBEntry for the full entry. With
+        count false, the access is not counted, e.g. when clicks are logged
+        elsewhere (see clicklog.ClickLog), and the row is only read.
+
+        Raises:
+            ValueError if base_id is not a valid representation.
+            NotFound (an IndexError) if there is no corresponding database
+            entry.
+        """
+        int_id = self.int_id(base_id)
+        if count:
+            long_url = self.backend.resolve_and_count(int_id)
+            if long_url is None and self._archive:
+                row = self._lookup_archived(int_id)
+                if row is not None:
+                    long_url = row['long_url']
+                    # Archived entries are only counted once promoted.
+                    if self._promote:
+                        self.backend.increment(int_id)
+        else:
+            row = self.lookup(int_id)
+            long_url = None if row is None else row['long_url']
+        if long_url is None:
+            raise NotFound(base_id.strip(), int_id)
+        return long_url
+
+    def increment_many(self, counts):
+        """Increment access counters of several IDs in one statement.
+
+        Args:
+            counts: dict mapping integer IDs to (hits, last_accessed) tuples,
+                where hits is the number to add to the access counter and
+                last_accessed a datetime.datetime object.
+        """
+        self.backend.increment_many(counts)
+
+    def add_click_rollups(self, rollups):
+        """Add (int_id, day, clicks, last_click) tuples to the per-day click
+        rollups; see backend.SQLBackend.add_click_rollups()."""
+        self.backend.add_click_rollups(rollups)
+
+    def click_stats(self, int_id):
+        """Return (clicks, last_click) tuple of the given integer ID from the
+        click rollups, where last_click is None if there are no clicks."""
+        return self.backend.click_stats(int_id)
+
+    def click_stats_many(self, int_ids, chunk_size=500):
+        """Return dict mapping those of the given integer IDs which have
+        clicks in the click rollups to (clicks, last_click) tuples, reading
+        chunk_size IDs per query."""
+        int_ids = sorted(set(int_ids))
+        stats = {}
+        for start in xrange(0, len(int_ids), int(chunk_size)):
+            stats.update(self.backend.click_stats_many(
+                    int_ids[start:start + int(chunk_size)]))
+        return stats
 
 
 class ShortDBEntry(basetranslate.BaseItem):
-    """Entry in Short database with properties."""
-    def __init__(self, conn, base_id, data_table_name='translation_table'):
-        self._data_table_name = data_table_name
-        self.conn = conn.conn
-        self.cursor = conn.cursor
+    """Entry in Short database with properties.
+
+    Args:
+        conn: ShortDBConn object.
+        base_id: base representation of the entry.
+        data_table_name: optional; must be the table of conn if given.
+        click_rollups: if true, clicks aggregated from the click log (see
+            clicklog.rollup()) are added to the access counter, and the last
+            click is the last access if later (default: False)
+
+    Raises:
+        ValueError if base_id is invalid, or on mismatching data_table_name.
+        NotFound (an IndexError) if there is no corresponding database entry.
+    """
+    def __init__(self, conn, base_id, data_table_name=None,
+                 click_rollups=False):
+        if data_table_name not in (None, conn.data_table_name):
+            raise ValueError('data table "{}" is not the one of the '
+                    'connection.'.format(data_table_name))
+        self._dbconn = conn
 
         super(ShortDBEntry, self).__init__(conn.base_chars, base_id)
 
-        query = ('SELECT long_url, last_accessed, created, access_counter FROM '
-            '{} WHERE id=%s'.format(self._data_table_name))
-        self.cursor.execute(query, (self.int_id))
-        result = self.cursor.fetchone()
+        result = conn.lookup(self.int_id)
 
         if result is None:
-            raise IndexError('Entry {} in the custom base (int: {}) does not '
-                'have a corresponding database entry.'.format(self.base_id,
-                                                              self.int_id))
+            raise NotFound(self.base_id, self.int_id)
 
         self._long_url = result['long_url']
 
@@ -108,7 +488,9 @@ class ShortDBEntry(basetranslate.BaseItem):
         # settings that they are retrieved with. MySQL has no apparent way of
         # storing timezone info with time objects.
         #
-        # This also handles DST correctly.
+        # This also handles DST correctly. Imported here since only the link
+        # information page needs it.
+        import dateutil.tz
         tz = dateutil.tz.tzlocal()
         try:
             self._last_accessed = result['last_accessed'].replace(tzinfo=tz)
@@ -118,6 +500,15 @@ class ShortDBEntry(basetranslate.BaseItem):
 
         self._access_counter = int(result['access_counter'])
 
+        if click_rollups:
+            (clicks, last_click) = conn.click_stats(self.int_id)
+            self._access_counter += clicks
+            if last_click is not None:
+                last_click = last_click.replace(tzinfo=tz)
+                if (self._last_accessed is None or
+                        last_click > self._last_accessed):
+                    self._last_accessed = last_click
+
     @property
     def long_url(self):
         return self._long_url
@@ -139,164 +530,5 @@ class ShortDBEntry(basetranslate.BaseItem):
 
     def increment(self):
         """Increment access counter by 1."""
-        query = ('UPDATE {} set access_counter=(access_counter+1) WHERE id=%s'
-                .format(self._data_table_name))
-        self.cursor.execute(query, (self.int_id))
-        self.conn.commit()
+        self._dbconn.increment(self.int_id)
         self._access_counter += 1
-
-
-class TestSequence(unittest.TestCase):
-    def setUp(self):
-        c = config.ConfigItems(config_file='../shortweb.test.config')
-
-        self.host = c.dbargs['host']
-        self.user = c.dbargs['user']
-        self.passwd = c.dbargs['passwd']
-        self.db = c.dbargs['db']
-        self.data_table_name = c.dbargs['data_table_name']
-        self.base_id_with_no_corresponding_db_entry = \
-                c.dbargs['base_id_with_no_corresponding_db_entry']
-        self.long_url = c.dbargs['long_url']
-        self.base_id = c.dbargs['base_id']
-
-
-    def test_short_db_entry_private_variables(self):
-        """Shouldn't be able to set private variables in ShortDBEntry."""
-        with ShortDBConn(passwd=self.passwd,
-                data_table_name=self.data_table_name) as short_db_conn:
-            short_db_entry = ShortDBEntry(short_db_conn, self.base_id,
-                                          data_table_name=self.data_table_name)
-
-            with self.assertRaises(AttributeError):
-                short_db_entry.long_url = 'test'
-            with self.assertRaises(AttributeError):
-                short_db_entry.last_accessed = 'test'
-            with self.assertRaises(AttributeError):
-                short_db_entry.created = 'test'
-            with self.assertRaises(AttributeError):
-                short_db_entry.access_counter = 'test'
-
-    def test_short_db_entry_db_lookups(self):
-        """Test DB lookups in ShortDBEntry."""
-        with ShortDBConn(passwd=self.passwd,
-                data_table_name=self.data_table_name) as short_db_conn:
-            short_db_entry = ShortDBEntry(short_db_conn, self.base_id,
-                                          data_table_name=self.data_table_name)
-
-            self.assertEqual(short_db_entry.long_url, self.long_url)
-            self.assertIsNone(short_db_entry.last_accessed, datetime.datetime)
-            self.assertIsInstance(short_db_entry.created, datetime.datetime)
-            self.assertIsInstance(short_db_entry.access_counter, int)
-
-            with self.assertRaises(IndexError):
-                ShortDBEntry(short_db_conn,
-                             self.base_id_with_no_corresponding_db_entry,
-                             data_table_name=self.data_table_name)
-
-    def test_short_db_conn_private_variables(self):
-        """Shouldn't be able to set private variables in ShortDBConn."""
-        with ShortDBConn(passwd=self.passwd,
-                data_table_name=self.data_table_name) as short_db_conn:
-            with self.assertRaises(AttributeError):
-                short_db_conn.base_chars = 'test'
-
-    def test_short_db_conn_add_and_increment(self):
-        """Add URL with ShortDBConn, instantiate with ShortDBEntry, check
-        increment function."""
-        with ShortDBConn(passwd=self.passwd,
-                data_table_name=self.data_table_name) as short_db_conn:
-            test_url = 'example.com/?rand='+str(random.random())
-            self.new_base_id = short_db_conn.add(test_url)
-            test_args = (short_db_conn, self.new_base_id)
-            test_kwargs = {'data_table_name': self.data_table_name}
-            test_item = ShortDBEntry(*test_args, **test_kwargs)
-            self.new_int_id = test_item.int_id
-            self.assertEqual(test_item.long_url, 'http://' + test_url)
-
-            # Save AC, increment, check new access_counter, reload object,
-            # check that it went up by 1 also in the DB.
-            pre_access_counter = test_item.access_counter
-            test_item.increment()
-            self.assertEqual(pre_access_counter, test_item.access_counter-1)
-            test_item = ShortDBEntry(*test_args, **test_kwargs)
-            self.assertIsInstance(test_item.last_accessed, datetime.datetime)
-            self.assertEqual(pre_access_counter, test_item.access_counter-1)
-
-    def test_short_db_conn_failed_login(self):
-        """Failed login should raise _mysql_exceptions.OperationalError."""
-        with self.assertRaises(_mysql_exceptions.OperationalError):
-            ShortDBConn(passwd='invalid')
-
-    def tearDown(self):
-        try:
-            self.new_base_id
-        except AttributeError:
-            pass
-        else:
-            with ShortDBConn(passwd=self.passwd,
-                    data_table_name=self.data_table_name) as short_db_conn:
-                conn = short_db_conn.conn
-                cursor = conn.cursor()
-                query = 'DELETE FROM {} WHERE id=%s'.format(
-                        self.data_table_name)
-                cursor.execute(query, self.new_int_id)
-                conn.commit()
-
-                # Call a stored procedure to reset auto increment value to
-                # smallest available ID. Procedure created via:
-                #
-                #     DROP PROCEDURE IF EXISTS reset_test_autoincrement;
-                #     DELIMITER $$
-                #     CREATE PROCEDURE reset_test_autoincrement()
-                #     BEGIN
-                #       SELECT @maxaddone:=max(id)+1
-                #           FROM test_translation_table;
-                #       SET @query = CONCAT('ALTER TABLE test_translation_table
-                #                            AUTO_INCREMENT=', @maxaddone);
-                #       PREPARE stmt FROM @query;
-                #       EXECUTE stmt;
-                #       DEALLOCATE PREPARE stmt;
-                #     END $$
-                #     DELIMITER ;
-                #
-                # CONCAT() is used since variables can't be bound in ALTER
-                # TABLE statements. This was not the first time this has wasted
-                # time for me. Some say that it is possible, and some even say
-                # that the documentation states that it is possible, but I for
-                # sure cannot get it to work in MySQL 5.5.30.
-                #
-                # At first I tried to do things via PhpMyAdmin, but that has
-                # its own share of quirks regarding stored procedures. The
-                # DELIMITER statement should not be called in the code input
-                # fields, but a special option should be set instead. To add to
-                # this: for some infinitely strange reason, I could store
-                # procedures through PMA that worked _when called from within
-                # PMA_ with `CALL procedure`, but they did _not_ work when
-                # called from other connections. !"#¤%&/ unbelievable.
-                #
-                # This could also have been done directly here in Python, but I
-                # wanted to experiment with the above way instead. For
-                # posterity: 
-                #
-                #     query = (
-                #         'SELECT @maxaddone:=max(id)+1 FROM {};'.format(
-                #                 self.data_table_name),
-                #         'SET @query = CONCAT("ALTER TABLE {} '
-                #                 'AUTO_INCREMENT=", @maxaddone);'.format(
-                #                         self.data_table_name),
-                #         'PREPARE stmt FROM @query;',
-                #         'EXECUTE stmt;',
-                #         'DEALLOCATE PREPARE stmt;')
-                #     for i in query:
-                #         cursor.execute(i)
-                #
-                cursor.callproc('reset_test_autoincrement')
-
-
-def main():
-    unittest.main()
-
-
-if __name__ == '__main__':
-    main()
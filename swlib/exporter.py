@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import collections
+import csv
+import datetime
+import glob
+import gzip
+import json
+import os
+import re
+import shutil
+import tempfile
+import urllib
+import whichdb
+
+
+FORMATS = ('txt', 'dbm', 'nginx')
+ROW_FORMATS = ('jsonl', 'csv')
+# Columns of exported rows, in order.
+ROW_COLUMNS = ('id', 'short_id', 'long_url', 'created', 'last_accessed',
+               'access_counter')
+
+_WHITESPACE = re.compile(r'\s')
+
+
+def _quote_whitespace(long_url):
+    """Percent-encode whitespace, which would end the value of a map
+    entry."""
+    return _WHITESPACE.sub(lambda match: urllib.quote(match.group()),
+                           long_url)
+
+
+def nginx_needs_regex(base_chars):
+    """Return true if the base has characters differing only in case.
+
+    nginx matches the strings of a map ignoring case, so short IDs of such
+    bases must be given as case-sensitive regular expressions.
+    """
+    return len(set(base_chars.lower())) < len(base_chars)
+
+
+def txt_line(base_id, long_url):
+    """Return Apache RewriteMap txt entry."""
+    return '{} {}\n'.format(base_id, _quote_whitespace(long_url))
+
+
+def nginx_line(base_id, long_url, regex=False):
+    """Return nginx map entry. Dollar signs are percent-encoded, since they
+    would be taken as variables."""
+    if regex:
+        base_id = '~^{}$'.format(re.escape(base_id))
+    value = (_quote_whitespace(long_url).replace('\\', '\\\\')
+             .replace('"', '\\"').replace('$', '%24'))
+    return '{} "{}";\n'.format(base_id, value)
+
+
+def _replace(temporary, path):
+    """Move the files of a map written to temporary into place, so that
+    readers see either the old or the new map. DBM modules may add suffixes
+    (e.g. .dir and .pag), hence the glob."""
+    for name in glob.glob(temporary + '*'):
+        os.rename(name, path + name[len(temporary):])
+
+
+def _map_exists(path, file_format):
+    if file_format == 'dbm':
+        return bool(whichdb.whichdb(path))
+    return os.path.exists(path)
+
+
+def export_map(dbconn, path, file_format='txt', after_id=0, batch_size=1000,
+               dbm_module='gdbm'):
+    """Export short ID to long URL mappings to a redirect map file, which
+    lets the web server answer redirects without running ShortWeb.
+
+    Formats:
+        txt: Apache RewriteMap txt ("short_id long_url" lines).
+        dbm: Apache RewriteMap dbm, written with the given DBM module, e.g.
+            gdbm ("dbm=gdbm:" in Apache), dbm ("dbm=ndbm:") or dbhash
+            ("dbm=db:").
+        nginx: entries to include in an nginx map block. See
+            nginx_needs_regex() for the form of the keys.
+
+    If after_id is positive and the map exists, only entries with integer
+    IDs above after_id are added to it: text maps are appended to, and DBM
+    maps updated in place. Otherwise the whole map is written to a temporary
+    file which then replaces path. Entries with lower IDs committed later
+    are missed, so this is refused with leased IDs (see
+    ShortDBConn.leased_ids).
+
+    Args:
+        dbconn: ShortDBConn object.
+        path: map file.
+        file_format: one of FORMATS.
+        after_id: last integer ID already in the map (default: 0)
+        batch_size: rows per query (default: 1000)
+        dbm_module: name of DBM module for the dbm format (default: gdbm)
+
+    Returns:
+        (number of exported entries, last exported integer ID) tuple, where
+        the ID is after_id if nothing was exported.
+
+    Raises:
+        ValueError on unknown format, or if after_id is positive and IDs are
+            leased.
+        ImportError if the DBM module is not available.
+    """
+    if file_format not in FORMATS:
+        raise ValueError('unknown map format "{}".'.format(file_format))
+    if after_id > 0 and dbconn.leased_ids:
+        raise ValueError('maps cannot be exported incrementally with leased '
+                         'IDs (id_block_size).')
+    if file_format == 'dbm':
+        dbm = __import__(dbm_module)
+
+    append = after_id > 0 and _map_exists(path, file_format)
+    if not append:
+        after_id = 0
+
+    regex = nginx_needs_regex(dbconn.base_chars)
+    result = {'count': 0, 'last_id': after_id}
+
+    def entries():
+        for (int_id, base_id, long_url) in dbconn.mappings(
+                after_id=after_id, batch_size=batch_size):
+            result['count'] += 1
+            result['last_id'] = int_id
+            yield (base_id, long_url)
+
+    if append:
+        target = path
+    else:
+        directory = tempfile.mkdtemp(dir=os.path.dirname(
+                os.path.abspath(path)))
+        target = os.path.join(directory, 'map')
+
+    try:
+        if file_format == 'dbm':
+            db = dbm.open(target, 'w' if append else 'n')
+            try:
+                for (base_id, long_url) in entries():
+                    db[base_id] = long_url
+            finally:
+                db.close()
+        else:
+            with open(target, 'a' if append else 'w') as f:
+                for (base_id, long_url) in entries():
+                    if file_format == 'txt':
+                        f.write(txt_line(base_id, long_url))
+                    else:
+                        f.write(nginx_line(base_id, long_url, regex))
+        if not append:
+            _replace(target, path)
+    finally:
+        if not append:
+            shutil.rmtree(directory)
+
+    return (result['count'], result['last_id'])
+
+
+def _row_values(row):
+    """Return values of ROW_COLUMNS of row, with datetimes in ISO 8601
+    form."""
+    return [value.isoformat() if isinstance(value, datetime.datetime)
+            else value for value in (row[column] for column in ROW_COLUMNS)]
+
+
+def export_rows(dbconn, path, file_format='jsonl', after_id=0, size=0,
+                chunk_size=1000, compress=False, checkpoint=None):
+    """Export all entries with their counters and timestamps, e.g. as a
+    backup or for analysis, streaming them from the database (see
+    ShortDBConn.rows()) so that memory use does not grow with the table.
+
+    Formats:
+        jsonl: one JSON object per line (JSON Lines).
+        csv: comma-separated values, with a header line of ROW_COLUMNS.
+
+    After every chunk of entries, the file is flushed to disk and
+    checkpoint is called with the last exported integer ID and the file
+    size. To resume an interrupted export, or add newer entries to a
+    finished one, pass these as after_id and size: the file is cut to size,
+    dropping anything written after the checkpoint, and entries with IDs
+    above after_id are appended. If after_id is 0 or the file does not
+    exist, the whole table is exported to a new file. Entries with lower
+    IDs committed later are missed, so resuming is refused with leased IDs
+    (see ShortDBConn.leased_ids).
+
+    With compress, the file is gzip compressed, one gzip member per chunk,
+    so that the file can be cut at any checkpoint. gzip and zcat read the
+    members as one stream.
+
+    Args:
+        dbconn: ShortDBConn object.
+        path: file to write.
+        file_format: one of ROW_FORMATS.
+        after_id: last integer ID already in the file (default: 0)
+        size: size of the file at that ID (default: 0)
+        chunk_size: rows per chunk (default: 1000)
+        compress: true for a gzip compressed file (default: False)
+        checkpoint: optional function called as above.
+
+    Returns:
+        (number of exported entries, last exported integer ID, file size)
+        tuple, where the ID is after_id if nothing was exported.
+
+    Raises:
+        ValueError on unknown format, if the file is shorter than size, or
+            if after_id is positive and IDs are leased.
+    """
+    if file_format not in ROW_FORMATS:
+        raise ValueError('unknown row format "{}".'.format(file_format))
+    if after_id > 0 and dbconn.leased_ids:
+        raise ValueError('exports cannot be resumed with leased IDs '
+                         '(id_block_size).')
+
+    if after_id > 0 and os.path.exists(path):
+        f = open(path, 'r+b')
+        if os.fstat(f.fileno()).st_size < size:
+            f.close()
+            raise ValueError('{} is shorter than {} bytes.'.format(path,
+                                                                  size))
+        f.truncate(size)
+        f.seek(size)
+    else:
+        (after_id, size) = (0, 0)
+        f = open(path, 'wb')
+
+    count = 0
+    last_id = after_id
+    with f:
+        for chunk in dbconn.rows(after_id=after_id, chunk_size=chunk_size):
+            if compress:
+                out = gzip.GzipFile(filename='', mode='wb', fileobj=f)
+            else:
+                out = f
+            if file_format == 'csv':
+                writer = csv.writer(out, lineterminator='\n')
+                if not size:
+                    writer.writerow(ROW_COLUMNS)
+                writer.writerows(_row_values(row) for row in chunk)
+            else:
+                for row in chunk:
+                    out.write(json.dumps(collections.OrderedDict(
+                            zip(ROW_COLUMNS, _row_values(row)))) + '\n')
+            if compress:
+                out.close()
+            f.flush()
+            os.fsync(f.fileno())
+
+            count += len(chunk)
+            last_id = chunk[-1]['id']
+            size = f.tell()
+            if checkpoint is not None:
+                checkpoint(last_id, size)
+
+    return (count, last_id, size)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import threading
+
+
+class BlockAllocator(object):
+    """Hand out integer IDs from blocks leased from the database, so that
+    several writer nodes can add URLs without contending on one
+    AUTO_INCREMENT counter, and know the short ID before the row is
+    written.
+
+    A block of block_size consecutive IDs is leased (see
+    backend.SQLBackend.lease_ids()) whenever the current one is used up, so
+    only one in block_size additions waits for the central sequence row.
+    IDs of a block which are not used, e.g. when the process dies, are never
+    handed out again and remain gaps. On close(), the rest of the current
+    block is given back if no other node has leased since.
+
+    Args:
+        backend: storage backend with lease_ids() and release_ids(), e.g.
+            backend.SQLBackend.
+        block_size: number of IDs per lease (default: 10000)
+
+    Usage:
+        with BlockAllocator(dbconn.backend) as allocator:
+            int_ids = allocator.allocate(3)
+    """
+    def __init__(self, backend, block_size=10000):
+        self._backend = backend
+        self._block_size = int(block_size)
+        if self._block_size < 1:
+            raise ValueError('block_size must be positive.')
+        # Next unused ID and end (exclusive) of the current lease.
+        self._next_id = self._end_id = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    @property
+    def remaining(self):
+        """Number of IDs left in the current lease."""
+        return self._end_id - self._next_id
+
+    def allocate(self, n=1):
+        """Return list of n unused integer IDs, ascending. They are
+        consecutive unless a new lease was needed."""
+        int_ids = []
+        with self._lock:
+            while len(int_ids) < n:
+                if self._next_id == self._end_id:
+                    size = max(self._block_size, n - len(int_ids))
+                    self._next_id = self._backend.lease_ids(size)
+                    self._end_id = self._next_id + size
+                take = min(n - len(int_ids), self._end_id - self._next_id)
+                int_ids.extend(xrange(self._next_id, self._next_id + take))
+                self._next_id += take
+        return int_ids
+
+    def close(self):
+        """Give back the rest of the current lease, if possible."""
+        with self._lock:
+            if self._next_id < self._end_id:
+                self._backend.release_ids(self._next_id, self._end_id)
+            self._next_id = self._end_id = 0
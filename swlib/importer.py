@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import csv
+import itertools
+import time
+
+
+def read_urls(f, file_format='lines', column=0, skip_header=False):
+    """Yield long URLs from a file object, one line or CSV row at a time.
+
+    Args:
+        f: file object to read from.
+        file_format: "lines" for one URL per line, or "csv".
+        column: index of the URL column of CSV files (default: 0).
+        skip_header: skip the first line or row.
+
+    Blank lines, and CSV rows with an empty URL column, are skipped.
+
+    Raises:
+        ValueError on unknown file format.
+    """
+    if file_format == 'lines':
+        rows = (line.strip() for line in f)
+    elif file_format == 'csv':
+        rows = (row[column].strip() if len(row) > column else ''
+                for row in csv.reader(f))
+    else:
+        raise ValueError('unknown file format "{}".'.format(file_format))
+
+    if skip_header:
+        rows = itertools.islice(rows, 1, None)
+    for long_url in rows:
+        if long_url:
+            yield long_url
+
+
+def import_urls(dbconn, long_urls, chunk_size=1000, progress=None):
+    """Shorten a stream of long URLs in chunks with ShortDBConn.add_many(),
+    so that memory use is bounded by the chunk size.
+
+    Args:
+        dbconn: ShortDBConn object.
+        long_urls: iterable of long URLs.
+        chunk_size: number of URLs per INSERT and commit.
+        progress: optional function called after every chunk with the total
+            number of imported URLs and the seconds elapsed.
+
+    Yields:
+        (long_url, base_id) tuples in input order.
+    """
+    long_urls = iter(long_urls)
+    start = time.time()
+    count = 0
+    while True:
+        chunk = list(itertools.islice(long_urls, chunk_size))
+        if not chunk:
+            break
+        base_ids = dbconn.add_many(chunk, chunk_size=chunk_size)
+        count += len(chunk)
+        if progress is not None:
+            progress(count, time.time() - start)
+        for pair in zip(chunk, base_ids):
+            yield pair
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+
+# Statuses of looked up short IDs.
+FOUND = 'found'
+NOT_FOUND = 'not_found'
+INVALID = 'invalid'
+
+
+def short_id(short_url, base_url=''):
+    """Return the short ID of a short URL or short ID, i.e. without base_url
+    in front and without surrounding whitespace and a trailing '+'."""
+    short_url = short_url.strip()
+    if base_url and short_url.startswith(base_url):
+        short_url = short_url[len(base_url):]
+    return short_url.rstrip('+').strip()
+
+
+def _iso(value):
+    return None if value is None else value.isoformat()
+
+
+def lookup_many(dbconn, short_urls, base_url='', click_rollups=False):
+    """Return information on many short IDs at once, e.g. for link checkers
+    and dashboards, as a list of dicts in the order of short_urls.
+
+    The short IDs are translated in bulk, and the entries read with one
+    query per chunk of IDs (see ShortDBConn.lookup_many()) instead of one
+    per ID. Accesses are not counted.
+
+    Every dict has the given short URL as short and a status: FOUND,
+    NOT_FOUND or INVALID. Valid ones have short_id, and found ones also
+    long_url, created, last_accessed (None if never accessed) and
+    access_counter, with times in ISO 8601 form.
+
+    Args:
+        dbconn: ShortDBConn object.
+        short_urls: iterable of short IDs, or short URLs starting with
+            base_url.
+        base_url: prefix of short URLs (default: none)
+        click_rollups: as for dbinteraction.ShortDBEntry (default: False)
+    """
+    translation = dbconn.translation
+    results = []
+    valid = []
+    for short_url in short_urls:
+        result = {'short': short_url, 'status': INVALID}
+        base_id = short_id(short_url, base_url)
+        if base_id and translation.is_valid_base_id_form(base_id):
+            result['short_id'] = base_id
+            valid.append(result)
+        results.append(result)
+
+    int_ids = translation.base_to_int_many([result['short_id']
+                                            for result in valid])
+    pending = []
+    for (result, int_id) in zip(valid, int_ids):
+        # IDs of only the zero digit, e.g. "a", have no entries.
+        if translation.is_valid_int_id_form(int_id):
+            result['status'] = NOT_FOUND
+            pending.append((result, int_id))
+        else:
+            del result['short_id']
+
+    entries = dbconn.lookup_many(int_id for (_, int_id) in pending)
+    if click_rollups and entries:
+        stats = dbconn.click_stats_many(entries)
+    else:
+        stats = {}
+
+    for (result, int_id) in pending:
+        entry = entries.get(int_id)
+        if entry is None:
+            continue
+        last_accessed = entry['last_accessed']
+        access_counter = int(entry['access_counter'])
+        (clicks, last_click) = stats.get(int_id, (0, None))
+        access_counter += clicks
+        if last_click is not None and (last_accessed is None or
+                                       last_click > last_accessed):
+            last_accessed = last_click
+        result.update(status=FOUND, long_url=entry['long_url'],
+                      created=_iso(entry['created']),
+                      last_accessed=_iso(last_accessed),
+                      access_counter=access_counter)
+    return results
@@ -0,0 +1,387 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import contextlib
+import os
+import sys
+import threading
+import time
+
+
+def _monotonic_clock():
+    """Return function giving seconds of a monotonic clock, which is not
+    affected by changes of the system time.
+
+    Python 2 has no time.monotonic(), so clock_gettime(CLOCK_MONOTONIC) is
+    called through ctypes on Linux, with time.time() as fallback elsewhere.
+    The symbol is looked up in the running process (glibc 2.17 and later)
+    before librt, since ctypes.util.find_library() runs ldconfig, which would
+    cost every CGI request a subprocess.
+    """
+    if not sys.platform.startswith('linux'):
+        return time.time
+    import ctypes
+    try:
+        clock_gettime = ctypes.CDLL(None, use_errno=True).clock_gettime
+    except (OSError, AttributeError):
+        from ctypes.util import find_library
+        try:
+            clock_gettime = ctypes.CDLL(find_library('rt'),
+                                        use_errno=True).clock_gettime
+        except (OSError, AttributeError):
+            return time.time
+
+    class timespec(ctypes.Structure):
+        _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+    CLOCK_MONOTONIC = 1
+    clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(timespec)]
+
+    def monotonic():
+        t = timespec()
+        if clock_gettime(CLOCK_MONOTONIC, ctypes.byref(t)):
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        return t.tv_sec + t.tv_nsec * 1e-9
+
+    return monotonic
+
+
+# Function of the monotonic clock, loaded on first use, so that importing
+# this module does not load ctypes.
+_monotonic = None
+
+
+def monotonic():
+    """Return seconds of a monotonic clock, which is not affected by changes
+    of the system time; see _monotonic_clock()."""
+    global _monotonic
+    if _monotonic is None:
+        _monotonic = _monotonic_clock()
+    return _monotonic()
+
+# The request timer of the current thread, if any.
+_local = threading.local()
+
+
+class RequestTimer(object):
+    """Timings of the phases of one request, e.g. "config", "connect",
+    "select", "update" and "print".
+
+    While the timer is active (in its with block), phase() and db_error() of
+    this module record to it from anywhere in the same thread, so that the
+    storage layer needs no reference to the request. Phases are exclusive:
+    the time of a nested phase (e.g. "connect" while checking out a
+    connection for a "select") is not counted in the outer one.
+
+    Attributes:
+        outcome: set by the request handler, e.g. "redirect"; "error" unless
+            set.
+        phases: dict mapping phase names to seconds.
+        db_errors: number of database errors.
+        duration: seconds from creation to the end of the with block.
+
+    Usage:
+        with RequestTimer() as timer:
+            with timer.phase('config'):
+                ...
+            timer.outcome = 'redirect'
+    """
+    def __init__(self, clock=monotonic):
+        self._clock = clock
+        self._start = clock()
+        # Active phases as [name, start] lists, innermost last.
+        self._stack = []
+        self.outcome = 'error'
+        self.phases = {}
+        self.db_errors = 0
+        self.duration = None
+
+    def __enter__(self):
+        _local.timer = self
+        return self
+
+    def __exit__(self, type, value, traceback):
+        _local.timer = None
+        self.duration = self._clock() - self._start
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Time the with block as the given phase."""
+        start = self._clock()
+        if self._stack:
+            (outer, outer_start) = self._stack[-1]
+            self._add(outer, start - outer_start)
+        entry = [name, start]
+        self._stack.append(entry)
+        try:
+            yield
+        finally:
+            end = self._clock()
+            self._stack.pop()
+            self._add(name, end - entry[1])
+            if self._stack:
+                # Resume the outer phase.
+                self._stack[-1][1] = end
+
+    def _add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def log_line(self, **fields):
+        """Return a JSON line with outcome, duration and phase timings in
+        milliseconds, and any further fields given."""
+        record = {
+            'outcome': self.outcome,
+            'duration_ms': round((self.duration or 0.0) * 1000, 3),
+            'phases_ms': dict((name, round(seconds * 1000, 3))
+                              for (name, seconds) in self.phases.iteritems()),
+            'db_errors': self.db_errors,
+            }
+        record.update(fields)
+        # Only needed when logging requests, so imported here.
+        import json
+        return json.dumps(record, sort_keys=True)
+
+
+def current():
+    """Return the active RequestTimer of this thread, or None."""
+    return getattr(_local, 'timer', None)
+
+
+@contextlib.contextmanager
+def phase(name):
+    """Time the with block as the given phase of the current request, if
+    any."""
+    timer = current()
+    if timer is None:
+        yield
+    else:
+        with timer.phase(name):
+            yield
+
+
+def db_error():
+    """Count a database error in the current request, if any."""
+    timer = current()
+    if timer is not None:
+        timer.db_errors += 1
+
+
+def _format_labels(names, values, extra=()):
+    pairs = zip(names, values) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(
+            '{}="{}"'.format(name, str(value).replace('\\', r'\\')
+                             .replace('"', r'\"').replace('\n', r'\n'))
+            for (name, value) in pairs) + '}'
+
+
+class Values(object):
+    """Values of metrics in this process; see sharedmetrics.SharedValues for
+    values shared by processes.
+
+    Keys are tuples of the metric name and the label values, and for
+    histograms the bucket index or "sum".
+    """
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def add_many(self, amounts):
+        """Add to several values at once, given (key, amount) tuples."""
+        with self._lock:
+            for (key, amount) in amounts:
+                self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, key):
+        return self._values.get(key, 0)
+
+    def items(self):
+        """Return list of (key, value) tuples."""
+        with self._lock:
+            return self._values.items()
+
+
+class Counter(object):
+    """Monotonically increasing count, optionally per label values.
+
+    Args:
+        name, documentation: of the metric.
+        labels: names of the labels.
+        values: Values object to keep the counts in (default: a new one)
+    """
+    type = 'counter'
+
+    def __init__(self, name, documentation, labels=(), values=None):
+        self.name = name
+        self.documentation = documentation
+        self._labels = tuple(labels)
+        self._values = Values() if values is None else values
+        if not self._labels:
+            self._values.add_many([((name,), 0)])
+
+    def _key(self, labels):
+        return (self.name,) + tuple(labels[name] for name in self._labels)
+
+    def inc(self, amount=1, **labels):
+        self._values.add_many([(self._key(labels), amount)])
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels))
+
+    def samples(self):
+        """Yield lines of the Prometheus text format."""
+        values = sorted((key[1:], value)
+                        for (key, value) in self._values.items()
+                        if key[0] == self.name)
+        for (key, value) in values:
+            yield '{}{} {}'.format(self.name,
+                                   _format_labels(self._labels, key),
+                                   int(value))
+
+
+class Histogram(object):
+    """Distribution of observed values in cumulative buckets, optionally per
+    label values.
+
+    Args:
+        name, documentation: of the metric.
+        labels: names of the labels.
+        buckets: upper bounds of the buckets (default: BUCKETS)
+        values: Values object to keep the counts and sums in (default: a
+            new one)
+    """
+    type = 'histogram'
+
+    # Upper bounds in seconds, suitable for request and phase durations.
+    BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+               0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, name, documentation, labels=(), buckets=BUCKETS,
+                 values=None):
+        self.name = name
+        self.documentation = documentation
+        self._labels = tuple(labels)
+        self._buckets = tuple(sorted(buckets))
+        self._values = Values() if values is None else values
+
+    def _key(self, labels):
+        return (self.name,) + tuple(labels[name] for name in self._labels)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        i = 0
+        while i < len(self._buckets) and value > self._buckets[i]:
+            i += 1
+        self._values.add_many([(key + (i,), 1), (key + ('sum',), value)])
+
+    def count(self, **labels):
+        key = self._key(labels)
+        return int(sum(self._values.get(key + (i,))
+                       for i in xrange(len(self._buckets) + 1)))
+
+    def samples(self):
+        """Yield lines of the Prometheus text format."""
+        # Label values -> [count per bucket (+Inf last), sum]
+        entries = {}
+        for (key, value) in self._values.items():
+            if key[0] != self.name:
+                continue
+            entry = entries.setdefault(
+                    key[1:-1], [[0] * (len(self._buckets) + 1), 0.0])
+            if key[-1] == 'sum':
+                entry[1] = float(value)
+            else:
+                entry[0][key[-1]] = int(value)
+        for (key, (counts, total)) in sorted(entries.items()):
+            cumulative = 0
+            for (bound, count) in zip(self._buckets + ('+Inf',), counts):
+                cumulative += count
+                yield '{}_bucket{} {}'.format(
+                        self.name,
+                        _format_labels(self._labels, key, [('le', bound)]),
+                        cumulative)
+            labels = _format_labels(self._labels, key)
+            yield '{}_sum{} {!r}'.format(self.name, labels, total)
+            yield '{}_count{} {}'.format(self.name, labels, cumulative)
+
+
+class Registry(object):
+    """Collection of metrics rendered together, keeping their values in one
+    Values object (default: a new one)."""
+    def __init__(self, values=None):
+        self._values = Values() if values is None else values
+        self._metrics = []
+
+    def counter(self, *args, **kwargs):
+        """Create and register a Counter."""
+        metric = Counter(*args, values=self._values, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, *args, **kwargs):
+        """Create and register a Histogram."""
+        metric = Histogram(*args, values=self._values, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics:
+            lines.append('# HELP {} {}'.format(metric.name,
+                                               metric.documentation))
+            lines.append('# TYPE {} {}'.format(metric.name, metric.type))
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+class RequestMetrics(object):
+    """Request metrics of a ShortWeb server: requests by outcome, database
+    errors, and histograms of request and phase durations.
+
+    Args:
+        values: Values object to keep the metrics in, e.g. a
+            sharedmetrics.SharedValues shared by pre-forked workers, so that
+            any of them serves the totals of all (default: a new one)
+
+    Usage:
+        request_metrics = RequestMetrics()
+        with RequestTimer() as timer:
+            ...
+        request_metrics.record(timer)
+        request_metrics.render()
+    """
+    OUTCOMES = ('redirect', 'info', 'lookup', 'not_found', 'invalid',
+                'create', 'limited', 'form', 'error')
+
+    def __init__(self, values=None):
+        self._registry = Registry(values)
+        self.requests = self._registry.counter(
+                'shortweb_requests_total', 'Requests by outcome.',
+                labels=('outcome',))
+        self.db_errors = self._registry.counter(
+                'shortweb_db_errors_total',
+                'Database errors, e.g. failed connections and queries.')
+        self.request_seconds = self._registry.histogram(
+                'shortweb_request_duration_seconds',
+                'Request durations by outcome.', labels=('outcome',))
+        self.phase_seconds = self._registry.histogram(
+                'shortweb_request_phase_duration_seconds',
+                'Time spent per request phase.', labels=('phase',))
+        # Export zeros, so that rates work from the first request on.
+        for outcome in self.OUTCOMES:
+            self.requests.inc(0, outcome=outcome)
+
+    def record(self, timer):
+        """Add the timings of a finished RequestTimer."""
+        self.requests.inc(outcome=timer.outcome)
+        if timer.db_errors:
+            self.db_errors.inc(timer.db_errors)
+        self.request_seconds.observe(timer.duration, outcome=timer.outcome)
+        for (name, seconds) in timer.phases.iteritems():
+            self.phase_seconds.observe(seconds, phase=name)
+
+    def render(self):
+        """Return the metrics in the Prometheus text exposition format."""
+        return self._registry.render()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import MySQLdb
+import MySQLdb.cursors
+import _mysql_exceptions
+
+import backend
+import config
+
+
+class MySQLBackend(backend.SQLBackend):
+    """Storage in a MySQL database through MySQLdb.
+
+    Args:
+        host: MySQL hostname      (default: localhost)
+        user: MySQL username      (default: short)
+        db:   MySQL database name (default: short)
+        replicas: read replicas as a list or comma-separated string of
+            hostname[:port] entries, connected to with the same credentials
+            (default: none)
+        data_table_name, info_table_name, sequence_table_name,
+            click_table_name, archive_table_name, replica_retry,
+            read_your_writes, pool_min_size, pool_max_size, pool_timeout: as
+            for backend.SQLBackend.
+        **kwargs: passed to MySQLdb.connect(), except cursorclass attribute,
+                  which is hardcoded to MySQLdb.cursors.DictCursor.
+                  Streaming reads (see backend.SQLBackend.rows()) use the
+                  unbuffered MySQLdb.cursors.SSDictCursor instead.
+
+    Raises:
+        _mysql_exceptions.OperationalError on failed MySQL login.
+    """
+    integrity_errors = (_mysql_exceptions.IntegrityError,)
+    database_errors = (_mysql_exceptions.Error,)
+
+    def __init__(self, host='localhost', user='short', db='short',
+                 data_table_name='translation_table',
+                 info_table_name='base_info',
+                 sequence_table_name='id_sequence',
+                 click_table_name='click_rollup',
+                 archive_table_name='translation_archive', replicas=(),
+                 replica_retry=30, read_your_writes=True, pool_min_size=1,
+                 pool_max_size=5, pool_timeout=10, **kwargs):
+        kwargs['cursorclass'] = MySQLdb.cursors.DictCursor
+
+        def connector(host, **overrides):
+            arguments = dict(kwargs, **overrides)
+            return lambda: MySQLdb.connect(host=host, user=user, db=db,
+                                           **arguments)
+
+        replica_connects = []
+        for replica in config.split_list(replicas):
+            (replica_host, _, port) = replica.partition(':')
+            if port:
+                replica_connects.append(connector(replica_host,
+                                                  port=int(port)))
+            else:
+                replica_connects.append(connector(replica_host))
+
+        super(MySQLBackend, self).__init__(
+                connector(host),
+                data_table_name=data_table_name,
+                info_table_name=info_table_name,
+                sequence_table_name=sequence_table_name,
+                click_table_name=click_table_name,
+                archive_table_name=archive_table_name,
+                replica_connects=replica_connects,
+                replica_retry=replica_retry,
+                read_your_writes=read_your_writes,
+                pool_min_size=pool_min_size, pool_max_size=pool_max_size,
+                pool_timeout=pool_timeout, ping=lambda conn: conn.ping(),
+                errors=(_mysql_exceptions.OperationalError,))
+
+    def _new_cursor(self, conn, streaming=False):
+        if streaming:
+            return conn.cursor(MySQLdb.cursors.SSDictCursor)
+        return conn.cursor()
+
+    def add_click_rollups(self, rollups):
+        """Add clicks to the per-ID, per-day rollups with one multi-row
+        INSERT ... ON DUPLICATE KEY UPDATE and one commit."""
+        rollups = list(rollups)
+        if not rollups:
+            return
+        query = self._format(
+                'INSERT INTO {clicks} (int_id, day, clicks, last_click) '
+                'VALUES({p}, {p}, {p}, {p}) ON DUPLICATE KEY UPDATE '
+                'clicks=(clicks+VALUES(clicks)), '
+                'last_click=GREATEST(last_click, VALUES(last_click))')
+        with self.cursor('update') as cursor:
+            cursor.executemany(query, rollups)
+            cursor.connection.commit()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import contextlib
+import threading
+import time
+
+
+class PoolTimeout(Exception):
+    """No connection became available within the checkout timeout."""
+
+
+class ConnectionPool(object):
+    """Thread safe pool of DB-API connections.
+
+    Connections that raise one of the given errors while checked out, or fail
+    the health check at checkout, are closed and replaced by new ones. Each
+    connection is rolled back when returned to the pool, so that transactions
+    (and consistent read snapshots) never span checkouts.
+
+    Args:
+        connect: function returning a new connection.
+        min_size: connections opened up front and kept open (default: 1)
+        max_size: maximum number of open connections       (default: 5)
+        timeout: seconds to wait for a free connection     (default: 10)
+        ping: optional function taking a connection and raising one of errors
+            if it is no longer usable, e.g. lambda conn: conn.ping().
+        ping_interval: seconds a connection may be idle before it is checked
+            with ping at checkout (default: 30)
+        errors: tuple of exception classes signalling a broken connection.
+
+    Usage:
+        pool = ConnectionPool(lambda: MySQLdb.connect(...))
+        with pool.connection() as conn:
+            ...
+
+    Raises:
+        ValueError on invalid sizes.
+        Exceptions from connect when opening the initial connections.
+    """
+    def __init__(self, connect, min_size=1, max_size=5, timeout=10,
+                 ping=None, ping_interval=30, errors=()):
+        min_size = int(min_size)
+        max_size = int(max_size)
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError('pool sizes must satisfy '
+                    '0 <= min_size <= max_size and max_size >= 1.')
+
+        self._connect = connect
+        self._min_size = min_size
+        self._max_size = max_size
+        self._timeout = float(timeout)
+        self._ping = ping
+        self._ping_interval = float(ping_interval)
+        self._errors = tuple(errors)
+
+        # Idle connections as (connection, time returned) tuples; used as a
+        # stack to keep the set of active connections small.
+        self._idle = []
+        # Open connections, idle or checked out.
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+        for _ in range(min_size):
+            self._idle.append((connect(), time.time()))
+            self._size += 1
+
+    @property
+    def size(self):
+        """Number of open connections."""
+        return self._size
+
+    @property
+    def idle(self):
+        """Number of idle connections."""
+        return len(self._idle)
+
+    @contextlib.contextmanager
+    def connection(self):
+        """Check out a connection for the duration of the with block.
+
+        Raises:
+            PoolTimeout if no connection is available within the timeout.
+        """
+        conn = self._checkout()
+        try:
+            yield conn
+        except self._errors:
+            self._discard(conn)
+            raise
+        except:
+            self._checkin(conn)
+            raise
+        else:
+            self._checkin(conn)
+
+    def _checkout(self):
+        deadline = time.time() + self._timeout
+        while True:
+            with self._cond:
+                while not self._idle and self._size >= self._max_size:
+                    if self._closed:
+                        raise ValueError('connection pool is closed.')
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise PoolTimeout('no free connection in {} s.'
+                                .format(self._timeout))
+                    self._cond.wait(remaining)
+                if self._closed:
+                    raise ValueError('connection pool is closed.')
+
+                if self._idle:
+                    (conn, returned) = self._idle.pop()
+                else:
+                    (conn, returned) = (None, None)
+                    # Reserve the slot while connecting outside the lock.
+                    self._size += 1
+
+            if conn is None:
+                try:
+                    return self._connect()
+                except:
+                    self._release_slot()
+                    raise
+
+            if (self._ping is None or
+                    time.time() - returned < self._ping_interval):
+                return conn
+            try:
+                self._ping(conn)
+            except self._errors:
+                self._discard(conn)
+            else:
+                return conn
+
+    def _checkin(self, conn):
+        try:
+            conn.rollback()
+        except self._errors:
+            self._discard(conn)
+            return
+
+        with self._cond:
+            if self._closed:
+                self._size -= 1
+                conn.close()
+            else:
+                self._idle.append((conn, time.time()))
+            self._cond.notify()
+
+    def _discard(self, conn):
+        """Close a broken connection and free its slot."""
+        try:
+            conn.close()
+        except self._errors:
+            pass
+        self._release_slot()
+
+    def _release_slot(self):
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def close(self):
+        """Close idle connections, and checked out ones when returned."""
+        with self._cond:
+            self._closed = True
+            for (conn, _) in self._idle:
+                conn.close()
+            self._size -= len(self._idle)
+            self._idle = []
+            self._cond.notify_all()
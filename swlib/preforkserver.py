@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import SocketServer
+import errno
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+import wsgiref.simple_server
+
+
+class _QuietHandler(wsgiref.simple_server.WSGIRequestHandler):
+    """Request handler without a log line per request on stderr."""
+    def log_message(self, format, *args):
+        pass
+
+
+class _WorkerServer(wsgiref.simple_server.WSGIServer):
+    """wsgiref server accepting connections on a listening socket inherited
+    from the master process."""
+    def __init__(self, sock, application):
+        SocketServer.BaseServer.__init__(self, sock.getsockname(),
+                                         _QuietHandler)
+        self.socket = sock
+        (self.server_name, self.server_port) = sock.getsockname()[:2]
+        self.setup_environ()
+        self.base_environ['wsgi.multiprocess'] = True
+        self.set_app(application)
+        self.requests = 0
+
+    def finish_request(self, request, client_address):
+        self.requests += 1
+        wsgiref.simple_server.WSGIServer.finish_request(self, request,
+                                                        client_address)
+
+    def handle_error(self, request, client_address):
+        traceback.print_exc()
+
+
+class PreforkServer(object):
+    """Pre-forking HTTP server for a WSGI application: the master process
+    listens, and forks workers which accept connections on the shared socket
+    and serve one request at a time each, through the wsgiref server.
+
+    Workers share nothing but the socket and what the master created before
+    forking, e.g. a sharedcache.SharedCache. The application is created by
+    each worker after forking, so that database connections are not shared
+    between processes.
+
+    Signals to the master:
+        SIGHUP: graceful reload. New workers are started, creating the
+            application again (e.g. reading the configuration file again),
+            and the old ones exit after their current request.
+        SIGTERM, SIGINT: graceful stop. Workers exit after their current
+            request, or are killed after stop_timeout seconds.
+
+    Args:
+        application_factory: function returning the WSGI application, e.g.
+            wsgiapp.ShortWebApp. If the application has a close() method, it
+            is called when the worker exits.
+        host: interface to listen on (default: localhost)
+        port: port to listen on; 0 picks a free one (default: 8000)
+        workers: number of worker processes (default: 4)
+        max_requests: requests after which a worker exits and is replaced,
+            e.g. to bound memory growth; 0 means no limit (default: 0)
+        stop_timeout: seconds to wait for workers to exit on stop
+            (default: 10)
+        backlog: listen() backlog (default: 1024)
+
+    Usage:
+        PreforkServer(lambda: ShortWebApp(config), workers=8).serve_forever()
+
+    Raises:
+        ValueError if workers is not positive or max_requests is negative.
+    """
+    # Seconds between checks for signals and exited workers.
+    poll_interval = 1
+
+    def __init__(self, application_factory, host='localhost', port=8000,
+                 workers=4, max_requests=0, stop_timeout=10, backlog=1024):
+        self._application_factory = application_factory
+        self._workers = int(workers)
+        self._max_requests = int(max_requests)
+        self._stop_timeout = float(stop_timeout)
+        if self._workers < 1 or self._max_requests < 0:
+            raise ValueError('workers must be positive and max_requests not '
+                             'negative.')
+
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind((host, int(port)))
+        self.socket.listen(int(backlog))
+        # Idle workers all wake up on a new connection; those losing the
+        # race must not block in accept().
+        self.socket.setblocking(0)
+
+        # Worker pid -> True for current workers, False for retiring ones.
+        self._children = {}
+        self._reload = False
+        self._running = False
+
+    @property
+    def port(self):
+        return self.socket.getsockname()[1]
+
+    @property
+    def workers(self):
+        """Pids of the current workers."""
+        return sorted(pid for (pid, current) in self._children.items()
+                      if current)
+
+    def serve_forever(self):
+        """Start the workers and keep them running until SIGTERM or SIGINT
+        (or stop()), restarting workers which exit."""
+        self._running = True
+        handlers = dict((signum, signal.signal(signum, handler))
+                        for (signum, handler) in (
+                            (signal.SIGHUP, self._handle_reload),
+                            (signal.SIGTERM, self._handle_stop),
+                            (signal.SIGINT, self._handle_stop)))
+        try:
+            while self._running:
+                if self._reload:
+                    self._reload = False
+                    for pid in self.workers:
+                        self._children[pid] = False
+                        self._kill(pid, signal.SIGTERM)
+                self._reap()
+                for i in xrange(self._workers - len(self.workers)):
+                    self._spawn()
+                # Returns early when a signal arrives.
+                time.sleep(self.poll_interval)
+        finally:
+            self._stop_workers()
+            for (signum, handler) in handlers.items():
+                signal.signal(signum, handler)
+            self.socket.close()
+
+    def stop(self):
+        """Stop serve_forever(), e.g. from a signal handler."""
+        self._running = False
+
+    def reload(self):
+        """Replace the workers gracefully, e.g. from a signal handler."""
+        self._reload = True
+
+    def _handle_stop(self, signum, frame):
+        self.stop()
+
+    def _handle_reload(self, signum, frame):
+        self.reload()
+
+    @staticmethod
+    def _kill(pid, signum):
+        try:
+            os.kill(pid, signum)
+        except OSError as e:
+            if e.errno != errno.ESRCH:
+                raise
+
+    def _reap(self, block=False):
+        """Forget workers which have exited, waiting for one first if block
+        is true."""
+        options = 0 if block else os.WNOHANG
+        while self._children:
+            try:
+                (pid, status) = os.waitpid(-1, options)
+            except OSError as e:
+                if e.errno == errno.ECHILD:
+                    self._children.clear()
+                    return
+                if e.errno != errno.EINTR:
+                    raise
+                continue
+            if not pid:
+                return
+            self._children.pop(pid, None)
+            options = os.WNOHANG
+
+    def _stop_workers(self):
+        for pid in self._children:
+            self._kill(pid, signal.SIGTERM)
+        deadline = time.time() + self._stop_timeout
+        while self._children and time.time() < deadline:
+            time.sleep(0.05)
+            self._reap()
+        for pid in self._children:
+            self._kill(pid, signal.SIGKILL)
+        while self._children:
+            self._reap(block=True)
+
+    def _spawn(self):
+        pid = os.fork()
+        if pid:
+            self._children[pid] = True
+            return
+        status = 1
+        try:
+            self._serve_worker()
+            status = 0
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            # Never return into the master's code, nor run its exit
+            # handlers.
+            sys.stderr.flush()
+            os._exit(status)
+
+    def _serve_worker(self):
+        """Serve requests in a worker until told to stop, or max_requests
+        are served."""
+        stopping = []
+
+        def handle_stop(signum, frame):
+            stopping.append(signum)
+
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, handle_stop)
+        # Let a request in progress finish rather than fail on EINTR.
+        signal.siginterrupt(signal.SIGTERM, False)
+
+        application = self._application_factory()
+        try:
+            server = _WorkerServer(self.socket, application)
+            server.timeout = self.poll_interval
+            while not stopping and (not self._max_requests or
+                                    server.requests < self._max_requests):
+                server.handle_request()
+        finally:
+            close = getattr(application, 'close', None)
+            if close is not None:
+                close()
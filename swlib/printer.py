@@ -1,20 +1,146 @@
 #!/usr/bin/env python
 # -*- coding: UTF-8 -*-
+import functools
+import math
 import sys
-import unittest
 
 import cgi
 
-import basetranslate
-import config
+import metrics
+
+
+def _timed(method):
+    """Time the decorated method as the "print" phase of the current
+    request."""
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        with metrics.phase('print'):
+            return method(*args, **kwargs)
+    return wrapper
+
+
+class Response(object):
+    """Complete HTTP response: status line, headers and body.
+
+    Args:
+        status: status line, e.g. "200 OK".
+        headers: list of (name, value) tuples, without Content-Length.
+        body: body as a byte string.
+    """
+    def __init__(self, status='200 OK', headers=(), body=''):
+        self._status = status
+        self._headers = list(headers)
+        self._body = body
+
+    @property
+    def status(self):
+        return self._status
+
+    @property
+    def headers(self):
+        return self._headers
+
+    @property
+    def body(self):
+        return self._body
+
+    def wsgi(self):
+        """Return (status, headers, body) tuple for a WSGI server, with
+        Content-Length added to the headers."""
+        return (self._status,
+                self._headers + [('Content-Length', str(len(self._body)))],
+                self._body)
+
+    def cgi(self):
+        """Return the response as CGI output, i.e. with a Status header."""
+        return ''.join(['Status: {}\n'.format(self._status)] +
+                       ['{}: {}\n'.format(name, value)
+                        for (name, value) in self._headers] +
+                       ['\n', self._body])
+
+    def write_cgi(self, stream=None):
+        """Write the response as CGI output in one write (default stream:
+        sys.stdout)."""
+        stream = sys.stdout if stream is None else stream
+        stream.write(self.cgi())
+        stream.flush()
+
+
+_HTML_HEADERS = (('Content-Type', 'text/html; charset=utf-8'),)
+_JSON_HEADERS = (('Content-Type', 'application/json'),)
+
+_NEW_URL_FORM = (
+        '<form name="new" method="post">\n'
+        '  <fieldset>\n'
+        '    <legend>Add new short link</legend>\n'
+        '\n'
+        '    <table>\n'
+        '      <tr>\n'
+        '        <th>Link target\n'
+        '        <td><input name="new_url" type="url" required '
+        'size="100">\n'
+        '      <tr>\n'
+        '        <th>\n'
+        '        <td><input name="submit_url" type="submit" '
+        'value="Add">\n'
+        '    </table>\n'
+        '  </fieldset>\n'
+        '</form>\n')
+
+_LINK_INFO = (
+        '<fieldset>\n'
+        '  <legend>Link information</legend>\n'
+        '\n'
+        '  <table class="link_info">\n'
+        '    <tr>\n'
+        '      <th>ID\n'
+        '      <td>{int_id} → {base_id}\n'
+        '    <tr>\n'
+        '      <th>Short URL\n'
+        '      <td><a href="{base_url}{base_id}">{base_url}{base_id}'
+        '</a>\n'
+        '    <tr>\n'
+        '      <th>Long URL\n'
+        '      <td><a href="{long_url}">{long_url}</a>\n'
+        '    <tr>\n'
+        '      <th>Created\n'
+        '      <td><time datetime="{created_iso}">{created}</time>\n'
+        '    <tr>\n'
+        '      <th>Last accessed\n'
+        '      <td>{last_accessed_markup}'
+        '</time>\n'
+        '    <tr>\n'
+        '      <th>Access counter\n'
+        '      <td>{access_counter}\n'
+        '  </table>\n'
+        '</fieldset>\n')
 
 
 class HtmlPrinter(object):
-    """Print headers and HTML."""
+    """Build responses with headers and HTML.
+
+    Every method returns a complete Response, which the caller writes out
+    (e.g. with Response.write_cgi()), so that the printer can be used in
+    persistent servers too. The parts that only depend on the configuration
+    are built once, on initialization.
+
+    Args:
+        base_url: prefix of short URLs.
+        title: title of the generated pages.
+        **kwargs: ignored, so that the [Web] configuration section can be
+                  passed as is.
+    """
     def __init__(self, base_url='http://example.com/', title='Example title',
                  **kwargs):
         self._base_url = base_url
         self._title = title
+        self._escaped_base_url = cgi.escape(base_url, True)
+        self._preamble = (
+                '<!DOCTYPE html>\n'
+                '<meta charset="utf-8">\n'
+                '<title>{title}</title>\n'
+                '\n').format(title=title)
+        self._new_url_page = self._preamble + _NEW_URL_FORM
 
     @property
     def base_url(self):
@@ -24,26 +150,13 @@ class HtmlPrinter(object):
     def title(self):
         return self._title
 
-    def _content_header(self):
-        """Print 'Content-type' CGI header."""
-        print 'Content-Type: text/html; charset=utf-8'
-        print
-
-    def _html_starter(self):
-        """Print boilerplate HTML preamble."""
-        print ('<!DOCTYPE html>\n'
-               '<meta charset="utf-8">\n'
-               '<title>{title}</title>\n').format(title=self.title)
-
-    def _html_ender(self):
-        """Print boilerplate HTML ending and exit."""
-        sys.exit(0)
+    def _page(self, content):
+        """Return HTML page response with the given content."""
+        return Response(headers=_HTML_HEADERS, body=self._preamble + content)
 
+    @_timed
     def short_id_info(self, switem):
-        """Print a table with information on the given item."""
-        self._content_header()
-        self._html_starter()
-
+        """Return page with a table with information on the given item."""
         if switem.last_accessed is None:
             last_accessed_markup = 'Not yet accessed'
         else:
@@ -51,149 +164,82 @@ class HtmlPrinter(object):
                     '').format(isodate=switem.last_accessed.isoformat(),
                               date=switem.last_accessed)
 
-        print ('<fieldset>\n'
-               '  <legend>Link information</legend>\n'
-               '\n'
-               '  <table class="link_info">\n'
-               '    <tr>\n'
-               '      <th>ID\n'
-               '      <td>{int_id} → {base_id}\n'
-               '    <tr>\n'
-               '      <th>Short URL\n'
-               '      <td><a href="{base_url}{base_id}">{base_url}{base_id}'
-               '</a>\n'
-               '    <tr>\n'
-               '      <th>Long URL\n'
-               '      <td><a href="{long_url}">{long_url}</a>\n'
-               '    <tr>\n'
-               '      <th>Created\n'
-               '      <td><time datetime="{created_iso}">{created}</time>\n'
-               '    <tr>\n'
-               '      <th>Last accessed\n'
-               '      <td>{last_accessed_markup}'
-               '</time>\n'
-               '    <tr>\n'
-               '      <th>Access counter\n'
-               '      <td>{access_counter}\n'
-               '  </table>\n'
-               '</fieldset>').format(
-                        int_id=switem.int_id,
-                        base_id=switem.base_id,
-                        base_url=cgi.escape(self.base_url, True),
-                        long_url=cgi.escape(switem.long_url, True),
-                        created_iso=switem.created.isoformat(),
-                        created=switem.created,
-                        last_accessed_markup=last_accessed_markup,
-                        access_counter=switem.access_counter)
-        self._html_ender()
-
-    def short_url_to_id(self, dbconn, short_url):
-        """Translate a complete short URL to its base representation."""
-        base_id = short_url.lstrip(self.base_url).strip()
-
-        if dbconn is not None:
-            t = basetranslate.Translation(dbconn.base_chars)
-            try:
-                int_id = t.base_to_int(base_id)
-            except ValueError:
-                int_id = None
-        else:
-            int_id = None
-
-        return (base_id, int_id)
-
-    def short_id_not_found(self, dbconn, short_url):
-        """Print error message saying that the link was not found in the
-        database."""
-        (base_id, int_id) = self.short_url_to_id(dbconn, short_url)
-
-        self._content_header()
-        self._html_starter()
-        print ('<p class="not_found">Given short form does not exist in the '
-                'database: {base_id} → ID {int_id}'.format(
-                    base_id=base_id, int_id=int_id))
-        self._html_ender()
-
-    def invalid_short_id(self, dbconn, short_url):
-        """Print error message saying that the link was of invalid form."""
-        (base_id, int_id) = self.short_url_to_id(dbconn, short_url)
-
-        self._content_header()
-        self._html_starter()
-
-        print ('<p class="invalid">Invalid short url: {short_url}.\n'
-               '\n'
-               '<p>Only the following characters are allowed in the short '
-               'form: <pre>{base}</pre>').format(
-                       short_url=self.base_url+base_id, base=dbconn.base_chars)
-
-        self._html_ender()
-
+        return self._page(_LINK_INFO.format(
+                int_id=switem.int_id,
+                base_id=switem.base_id,
+                base_url=self._escaped_base_url,
+                long_url=cgi.escape(switem.long_url, True),
+                created_iso=switem.created.isoformat(),
+                created=switem.created,
+                last_accessed_markup=last_accessed_markup,
+                access_counter=switem.access_counter))
+
+    @_timed
+    def short_id_not_found(self, base_id, int_id):
+        """Return 404 error page saying that the link of the given base
+        representation and its integer ID (see dbinteraction.NotFound) was
+        not found in the database."""
+        return Response('404 Not Found', _HTML_HEADERS, self._preamble + (
+                '<p class="not_found">Given short form does not exist in the '
+                'database: {base_id} → ID {int_id}\n'.format(
+                    base_id=base_id, int_id=int_id)))
+
+    @_timed
+    def invalid_short_id(self, base_id, base_chars):
+        """Return 400 error page saying that the given base representation
+        is of invalid form, i.e. not made of the characters base_chars."""
+        return Response('400 Bad Request', _HTML_HEADERS, self._preamble + (
+                '<p class="invalid">Invalid short url: {short_url}.\n'
+                '\n'
+                '<p>Only the following characters are allowed in the short '
+                'form: <pre>{base}</pre>\n').format(
+                       short_url=self.base_url + base_id, base=base_chars))
+
+    @_timed
+    def too_many_requests(self, retry_after):
+        """Return error page saying that a new link was not added, since
+        the client should wait retry_after seconds first."""
+        seconds = max(1, int(math.ceil(retry_after)))
+        return Response(
+                '429 Too Many Requests',
+                _HTML_HEADERS + (('Retry-After', str(seconds)),),
+                self._preamble + (
+                    '<p class="limited">Too many new links at the moment. '
+                    'Please try again in {} seconds.\n'.format(seconds)))
+
+    @_timed
+    def lookup_results(self, results):
+        """Return JSON response with the given lookup results (see
+        lookup.lookup_many()), as {"results": [...]}."""
+        # Imported here since only lookups need it.
+        import json
+        return Response(headers=_JSON_HEADERS,
+                        body=json.dumps({'results': results}))
+
+    @_timed
+    def too_many_lookups(self, max_lookups):
+        """Return JSON error response saying that at most max_lookups short
+        IDs may be looked up at once."""
+        import json
+        return Response('400 Bad Request', _JSON_HEADERS, json.dumps(
+                {'error': 'At most {} short IDs may be looked up at once.'
+                          .format(max_lookups)}))
+
+    @_timed
     def new_url_form(self):
-        """Print form for input of new database entry."""
-        self._content_header()
-        self._html_starter()
-        print ('<form name="new" method="post">\n'
-               '  <fieldset>\n'
-               '    <legend>Add new short link</legend>\n'
-               '\n'
-               '    <table>\n'
-               '      <tr>\n'
-               '        <th>Link target\n'
-               '        <td><input name="new_url" type="url" required '
-               'size="100">\n'
-               '      <tr>\n'
-               '        <th>\n'
-               '        <td><input name="submit_url" type="submit" '
-               'value="Add">\n'
-               '    </table>\n'
-               '  </fieldset>\n'
-               '</form>')
-        self._html_ender()
+        """Return page with form for input of new database entry."""
+        return Response(headers=_HTML_HEADERS, body=self._new_url_page)
 
+    @_timed
     def reload(self, base_id):
-        """Send CGI header to reload page to the information page of the short
+        """Return response redirecting to the information page of the short
         URL representation of the given ID."""
-        print 'Location: {base_url}{base_id}+'.format(base_url=self.base_url,
-                                                      base_id=base_id)
-        print
+        return Response('302 Found', [
+                ('Location', '{base_url}{base_id}+'.format(
+                        base_url=self.base_url, base_id=base_id))])
 
-    @staticmethod
-    def redirect(long_url):
-        """Send CGI header to redirect the user to the given long URL."""
+    @_timed
+    def redirect(self, long_url):
+        """Return response redirecting the user to the given long URL."""
         # <http://en.wikipedia.org/wiki/List_of_HTTP_status_codes>
-        print 'Status: 301 Moved Permanently'
-        print 'Location: {long_url}'.format(long_url=long_url)
-        print
-
-
-class TestSequence(unittest.TestCase):
-    def setUp(self):
-        c = config.ConfigItems(config_file='../shortweb.test.config')
-
-        self.base_url = c.webargs['base_url']
-        self.title = c.webargs['title']
-
-        self.htmlprinter = HtmlPrinter(base_url=self.base_url,
-                                       title=self.title)
-
-    def test_htmlprinter_properties(self):
-        """Properties should be set on initialization but not modifiable."""
-        self.assertEqual(self.htmlprinter.base_url, self.base_url)
-        self.assertEqual(self.htmlprinter.title, self.title)
-
-        with self.assertRaises(AttributeError):
-            self.htmlprinter.base_url = 'Test'
-        with self.assertRaises(AttributeError):
-            self.htmlprinter.title = 'Test'
-
-    # TODO: Redirect sys.stdout to file descriptor via StringIO and make sure
-    # print output corresponds to known values.
-
-
-def main():
-    unittest.main()
-
-
-if __name__ == '__main__':
-    main()
+        return Response('301 Moved Permanently', [('Location', long_url)])
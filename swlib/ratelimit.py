@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import contextlib
+import errno
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+
+
+# Slot of a client: hash of the client key (0 for an unused slot), tokens
+# left and Unix time of the last update.
+_SLOT = struct.Struct('<Qdd')
+
+
+class Limited(Exception):
+    """Raised when a URL creation is not admitted.
+
+    Attributes:
+        retry_after: seconds after which a new attempt may be admitted.
+    """
+    def __init__(self, message, retry_after):
+        super(Limited, self).__init__(message)
+        self.retry_after = retry_after
+
+
+class RateLimiter(object):
+    """Admission control of URL creations, shared by all processes using the
+    same state file, e.g. CGI processes and pre-forked servers.
+
+    Every client (e.g. IP address) has a token bucket of burst tokens, which
+    refills at rate tokens per second; a creation takes one token. Buckets
+    live in a fixed table of slots in the state file, addressed by a hash of
+    the client and updated under a lock of the slot's byte range. Clients
+    whose hashes share a slot evict each other, so that the file stays the
+    same size whatever the number of clients; an evicted client starts over
+    with a full bucket.
+
+    At most max_in_flight creations are admitted at once over all processes,
+    by holding one of as many byte range locks past the table while a
+    creation runs. The locks are released by the operating system if a
+    process dies.
+
+    Args:
+        path: state file, created if missing.
+        rate: tokens added per second and client (default: 1)
+        burst: maximum tokens of a client (default: 10)
+        slots: number of client slots in the file (default: 65536)
+        max_in_flight: maximum creations admitted at once; 0 means no limit
+            (default: 0)
+        retry_after: seconds to wait when max_in_flight creations are
+            running (default: 1)
+        clock: function returning Unix time (default: time.time)
+
+    Usage:
+        with RateLimiter('/var/lib/shortweb/limits', rate=0.5) as limiter:
+            try:
+                with limiter.admit('192.0.2.1'):
+                    ...
+            except Limited as limited:
+                ... limited.retry_after ...
+
+    Raises:
+        ValueError on invalid limits.
+    """
+    def __init__(self, path, rate=1, burst=10, slots=65536, max_in_flight=0,
+                 retry_after=1, clock=time.time):
+        self._rate = float(rate)
+        self._burst = float(burst)
+        self._slots = int(slots)
+        self._max_in_flight = int(max_in_flight)
+        self._retry_after = float(retry_after)
+        if self._rate <= 0 or self._burst < 1:
+            raise ValueError('rate must be positive and burst at least 1.')
+        if self._slots < 1 or self._max_in_flight < 0:
+            raise ValueError('slots must be positive and max_in_flight not '
+                             'negative.')
+        self._clock = clock
+
+        size = self._slots * _SLOT.size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0660)
+        try:
+            if os.fstat(self._fd).st_size < size:
+                os.ftruncate(self._fd, size)
+            self._map = mmap.mmap(self._fd, size)
+        except EnvironmentError:
+            os.close(self._fd)
+            raise
+        # In-flight locks are byte range locks past the table. Such locks
+        # belong to the process, so threads of one process are told apart
+        # by the set of locks they hold.
+        self._in_flight_offset = size
+        self._held = set()
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def close(self):
+        """Release the state file."""
+        self._map.close()
+        os.close(self._fd)
+
+    @contextlib.contextmanager
+    def admit(self, client):
+        """Admit a creation by client for the duration of the with block.
+
+        Raises:
+            Limited if max_in_flight creations are running, or the client
+            has no token left.
+        """
+        ticket = self._enter()
+        try:
+            self._take_token(client)
+            yield
+        finally:
+            self._leave(ticket)
+
+    def _enter(self):
+        """Return held in-flight lock number, or None without a limit."""
+        if not self._max_in_flight:
+            return None
+        with self._lock:
+            for ticket in xrange(self._max_in_flight):
+                if ticket in self._held:
+                    continue
+                try:
+                    fcntl.lockf(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1,
+                                self._in_flight_offset + ticket)
+                except IOError as e:
+                    if e.errno not in (errno.EACCES, errno.EAGAIN):
+                        raise
+                    continue
+                self._held.add(ticket)
+                return ticket
+        raise Limited('{} creations are already running.'.format(
+                self._max_in_flight), self._retry_after)
+
+    def _leave(self, ticket):
+        if ticket is None:
+            return
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, 1,
+                        self._in_flight_offset + ticket)
+            self._held.discard(ticket)
+
+    def _slot(self, client):
+        """Return (key, offset) of the bucket slot of client."""
+        digest = struct.unpack('<Q', hashlib.md5(client).digest()[:8])[0]
+        # The slot is taken from the whole hash, so that all slots are used,
+        # and the lowest bit of the stored key is set, so that a key is never
+        # 0 (an unused slot).
+        return (digest | 1, digest % self._slots * _SLOT.size)
+
+    def _take_token(self, client):
+        """Take a token from the bucket of client.
+
+        Raises:
+            Limited if the bucket is empty.
+        """
+        (key, offset) = self._slot(client)
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, _SLOT.size, offset)
+            try:
+                now = self._clock()
+                (slot_key, tokens, updated) = _SLOT.unpack_from(self._map,
+                                                                offset)
+                if slot_key != key:
+                    tokens = self._burst
+                else:
+                    tokens = min(self._burst, tokens +
+                                 max(0.0, now - updated) * self._rate)
+                if tokens >= 1:
+                    tokens -= 1
+                    retry_after = None
+                else:
+                    retry_after = (1 - tokens) / self._rate
+                _SLOT.pack_into(self._map, offset, key, tokens, now)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, _SLOT.size, offset)
+        if retry_after is not None:
+            raise Limited('Too many new URLs from {}.'.format(client),
+                          retry_after)
+
+
+@contextlib.contextmanager
+def admit(limiter, client):
+    """Admit a creation by client with limiter (see RateLimiter.admit()), or
+    any creation if limiter is None."""
+    if limiter is None:
+        yield
+    else:
+        with limiter.admit(client):
+            yield
@@ -0,0 +1,284 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import array
+import contextlib
+import fcntl
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+
+
+# File layout, all integers little-endian unsigned 64 bit:
+#   header:  magic, count (highest indexed ID), capacity (ID slots), base
+#            representation characters (a Pascal string of up to 255 bytes)
+#   ends:    capacity + 1 blob offsets; the URL of ID i is blob[ends[i - 1]:
+#            ends[i]], empty for missing IDs, and ends[0] is 0
+#   blob:    the URLs, in ID order
+MAGIC = 'SWIDX\x00\x00\x02'
+_HEADER = struct.Struct('<8sQQ256p')
+_COUNT_OFFSET = 8
+_END = struct.Struct('<Q')
+_RANGE = struct.Struct('<QQ')
+
+
+def _ends_offset(capacity):
+    """Return file offset of the blob."""
+    return _HEADER.size + (capacity + 1) * _END.size
+
+
+def _umask():
+    """Return the file mode creation mask of the process."""
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+@contextlib.contextmanager
+def _writer_lock(path):
+    """Serialize builders of the index at path."""
+    with open(path + '.lock', 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def build_index(dbconn, path, headroom=100000, batch_size=1000):
+    """Build a redirect index of all mappings of the database, including
+    archived ones if dbconn has archive set (see ShortDBConn.mappings()).
+
+    The index is written to a temporary file which then atomically replaces
+    path, so that readers (see RedirectIndex) never see a partial index.
+    The file is readable by all, as far as the umask allows. The ends
+    array is built in memory, 8 bytes per ID slot. The base
+    representation is stored too, so that readers resolve short IDs without
+    the database.
+
+    Args:
+        dbconn: ShortDBConn object.
+        path: index file.
+        headroom: spare ID slots for append_index() (default: 100000)
+        batch_size: rows per query (default: 1000)
+
+    Returns:
+        highest indexed ID.
+    """
+    with _writer_lock(path):
+        return _build(dbconn, path, headroom, batch_size)
+
+
+def _build(dbconn, path, headroom, batch_size):
+    base_chars = dbconn.base_chars
+    if len(base_chars) > 255:
+        raise ValueError('base representations of more than 255 characters '
+                         'cannot be indexed.')
+    count = dbconn.max_id()
+    capacity = count + int(headroom)
+    ends = array.array('L', [0]) * (capacity + 1)
+    if ends.itemsize != _END.size:
+        raise RuntimeError('unsigned long is not 64 bit on this platform.')
+
+    (fd, temporary) = tempfile.mkstemp(dir=os.path.dirname(
+            os.path.abspath(path)))
+    try:
+        # mkstemp() creates the file readable by its owner only, but the
+        # index is built e.g. from cron and read by the web server.
+        os.fchmod(fd, 0644 & ~_umask())
+        with os.fdopen(fd, 'wb') as f:
+            f.seek(_ends_offset(capacity))
+            (position, last) = (0, 0)
+            for (int_id, _, long_url) in dbconn.mappings(
+                    batch_size=batch_size):
+                if int_id > count:
+                    # Added since max_id(); left to append_index().
+                    break
+                for i in xrange(last + 1, int_id):
+                    ends[i] = position
+                f.write(long_url)
+                position += len(long_url)
+                ends[int_id] = position
+                last = int_id
+            for i in xrange(last + 1, capacity + 1):
+                ends[i] = position
+            if sys.byteorder != 'little':
+                ends.byteswap()
+
+            f.seek(0)
+            f.write(_HEADER.pack(MAGIC, count, capacity, base_chars))
+            ends.tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(temporary, path)
+    except BaseException:
+        os.remove(temporary)
+        raise
+    return count
+
+
+def append_index(dbconn, path, headroom=100000, batch_size=1000):
+    """Add mappings newer than the index to it in place, or rebuild it with
+    build_index() if it is missing or out of spare ID slots.
+
+    Readers pick up the new IDs without reopening the index: URLs and ends
+    are written beyond what readers look at before the count in the header
+    is raised.
+
+    Only IDs above the indexed count are added, so entries with lower IDs
+    committed since would be missed; with leased IDs (see
+    ShortDBConn.leased_ids), which writers commit in any order, indexes
+    must be rebuilt with build_index() instead.
+
+    Indexes written by earlier versions are rebuilt.
+
+    Returns:
+        highest indexed ID.
+
+    Raises:
+        ValueError if IDs are leased, or path is not a redirect index.
+    """
+    if dbconn.leased_ids:
+        raise ValueError('redirect indexes cannot be appended to with leased '
+                         'IDs (id_block_size).')
+    with _writer_lock(path):
+        try:
+            f = open(path, 'r+b')
+        except IOError:
+            return _build(dbconn, path, headroom, batch_size)
+
+        with f:
+            header = f.read(_HEADER.size)
+            if header[:len(MAGIC)] != MAGIC:
+                if header[:5] != MAGIC[:5]:
+                    raise ValueError('{} is not a redirect index.'.format(
+                            path))
+                f.close()
+                return _build(dbconn, path, headroom, batch_size)
+            (_, count, capacity, _) = _HEADER.unpack(header)
+            max_id = dbconn.max_id()
+            if max_id > capacity:
+                f.close()
+                return _build(dbconn, path, headroom, batch_size)
+            if max_id <= count:
+                return count
+
+            f.seek(_HEADER.size + count * _END.size)
+            (position,) = _END.unpack(f.read(_END.size))
+            ends = []
+            last = count
+            f.seek(_ends_offset(capacity) + position)
+            for (int_id, _, long_url) in dbconn.mappings(
+                    after_id=count, batch_size=batch_size):
+                if int_id > max_id:
+                    break
+                ends.extend([position] * (int_id - last - 1))
+                f.write(long_url)
+                position += len(long_url)
+                ends.append(position)
+                last = int_id
+            ends.extend([position] * (max_id - last))
+
+            f.seek(_HEADER.size + (count + 1) * _END.size)
+            f.write(''.join(_END.pack(end) for end in ends))
+            # The slots above the new count keep pointing to the end of the
+            # blob, so that they stay empty.
+            f.write(_END.pack(position) * (capacity - max_id))
+            f.flush()
+            os.fsync(f.fileno())
+            f.seek(_COUNT_OFFSET)
+            f.write(_END.pack(max_id))
+            f.flush()
+        return max_id
+
+
+class RedirectIndex(object):
+    """Read-only, memory mapped redirect index built by build_index().
+
+    Lookups are two array reads in memory shared by all processes mapping
+    the file, without database access. IDs above the indexed count are
+    looked up again after re-reading the header, which appends raise, and
+    after checking (at most every check_interval seconds) whether the file
+    has been replaced by a rebuild.
+
+    Args:
+        path: index file.
+        check_interval: minimum seconds between checks for a rebuilt file
+            (default: 1)
+
+    Raises:
+        IOError if the file does not exist.
+        ValueError if it is not a redirect index.
+    """
+    def __init__(self, path, check_interval=1, timer=time.time):
+        self._path = path
+        self._check_interval = float(check_interval)
+        self._timer = timer
+        self._lock = threading.Lock()
+        self._open()
+
+    def _open(self):
+        with open(self._path, 'rb') as f:
+            inode = os.fstat(f.fileno()).st_ino
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, count, capacity, base_chars) = _HEADER.unpack_from(mapped)
+        if magic != MAGIC:
+            raise ValueError('{} is not a redirect index.'.format(self._path))
+        self._base_chars = base_chars
+        # Replaced together; lookups use a consistent snapshot.
+        self._state = (mapped, count, _ends_offset(capacity))
+        self._inode = inode
+        self._checked = self._timer()
+
+    @property
+    def count(self):
+        """Highest indexed ID."""
+        return self._state[1]
+
+    @property
+    def base_chars(self):
+        """Base representation characters of the indexed database."""
+        return self._base_chars
+
+    def lookup(self, int_id):
+        """Return long URL of the given integer ID, or None if it is not in
+        the index."""
+        (mapped, count, blob) = self._state
+        if int_id > count:
+            (mapped, count, blob) = self._refresh()
+            if int_id > count:
+                return None
+        if int_id < 1:
+            return None
+        (start, end) = _RANGE.unpack_from(mapped,
+                                          _HEADER.size + (int_id - 1) * 8)
+        if start == end:
+            return None
+        return mapped[blob + start:blob + end]
+
+    def _refresh(self):
+        with self._lock:
+            (mapped, count, blob) = self._state
+            now = self._timer()
+            if now - self._checked >= self._check_interval:
+                self._checked = now
+                try:
+                    if os.stat(self._path).st_ino != self._inode:
+                        self._open()
+                        return self._state
+                except OSError:
+                    pass
+
+            (new_count,) = _END.unpack_from(mapped, _COUNT_OFFSET)
+            if new_count > count:
+                (end,) = _END.unpack_from(mapped,
+                                          _HEADER.size + new_count * 8)
+                if blob + end > len(mapped):
+                    # The blob has grown beyond the mapping.
+                    self._open()
+                else:
+                    self._state = (mapped, new_count, blob)
+            return self._state
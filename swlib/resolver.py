@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import threading
+import time
+
+import basetranslate
+import dbinteraction
+
+
+class Resolver(object):
+    """Resolve short representations to long URLs on the redirect path.
+
+    Mappings never change once written, so resolved long URLs can be kept in a
+    cache in front of the database. Only the long URL is cached; the link
+    information page should still use ShortDBEntry to get fresh counters.
+
+    Args:
+        dbconn: ShortDBConn object, which may connect lazily (see its lazy
+            argument); resolving from the cache and the index then needs no
+            database connection, given its base_chars.
+        cache: optional cache.LRUCache object (or any object with get(), put()
+            and invalidate() methods) keyed by integer ID.
+        counter: optional counter.CounterBuffer object recording hits. If not
+            given, hits are written to the database immediately.
+        index: optional redirectindex.RedirectIndex object, consulted after
+            the cache and before the database. IDs newer than the index are
+            read from the database, and indexed IDs are resolved while the
+            database is down.
+        click_log: optional clicklog.ClickLog object. If given, hits are
+            logged there instead of being counted in the database, and
+            counter is not used.
+        max_id_interval: if positive, IDs above the highest ID in the
+            database are not found without a lookup. The highest ID is read
+            again when a higher ID is requested, but at most once per this
+            many seconds, so links added by other servers may be not found
+            for that long (default: 0)
+        negative_cache: optional cache.LRUCache object keyed by integer ID,
+            remembering IDs not found in the database until they expire. It
+            is not used if dbconn has leased IDs (see
+            ShortDBConn.leased_ids), as missing IDs then fill in later.
+        timer: function returning the current time in seconds
+            (default: time.time)
+    """
+    def __init__(self, dbconn, cache=None, counter=None, index=None,
+                 click_log=None, max_id_interval=0, negative_cache=None,
+                 timer=time.time):
+        self._dbconn = dbconn
+        self._cache = cache
+        self._counter = counter
+        self._index = index
+        self._click_log = click_log
+        self._max_id_interval = float(max_id_interval)
+        # With leased IDs, IDs missing below the highest one may still be
+        # added by writers whose leases they are in, so they are not
+        # remembered.
+        self._negative_cache = None if dbconn.leased_ids else negative_cache
+        self._timer = timer
+        self._translation = basetranslate.Translation(dbconn.base_chars)
+        # Highest ID in the database, and when it was read.
+        self._max_id = 0
+        self._max_id_read = None
+        self._max_id_lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return self._cache
+
+    @property
+    def index(self):
+        return self._index
+
+    @property
+    def negative_cache(self):
+        return self._negative_cache
+
+    def _above_max_id(self, int_id):
+        """Return whether int_id is above the highest ID in the database,
+        reading the highest ID again if it is older than max_id_interval."""
+        if int_id <= self._max_id:
+            return False
+        with self._max_id_lock:
+            now = self._timer()
+            if (self._max_id_read is None or
+                    now >= self._max_id_read + self._max_id_interval):
+                self._max_id = max(self._max_id, self._dbconn.max_id())
+                self._max_id_read = now
+            return int_id > self._max_id
+
+    def resolve(self, base_id):
+        """Return (int_id, long_url) tuple for the given base representation.
+
+        Raises:
+            ValueError if base_id is not a valid representation.
+            dbinteraction.NotFound (an IndexError) if there is no
+            corresponding database entry.
+        """
+        int_id = self._translation.base_to_int(base_id)
+        if not self._translation.is_valid_int_id_form(int_id):
+            raise ValueError('"{}" is not a valid ID in the given base.'
+                    .format(base_id))
+
+        if self._cache is not None:
+            long_url = self._cache.get(int_id)
+            if long_url is not None:
+                return (int_id, long_url)
+
+        if self._index is not None:
+            long_url = self._index.lookup(int_id)
+            if long_url is not None:
+                return (int_id, long_url)
+
+        # IDs are handed out in increasing order, so IDs above the highest
+        # one, and recently missing ones, need no database lookup.
+        if self._max_id_interval > 0 and self._above_max_id(int_id):
+            self._not_found(base_id, int_id)
+        if (self._negative_cache is not None and
+                self._negative_cache.get(int_id) is not None):
+            self._not_found(base_id, int_id)
+
+        # Only the long URL is needed, so skip building a ShortDBEntry.
+        row = self._dbconn.lookup(int_id)
+        if row is None:
+            if self._negative_cache is not None:
+                self._negative_cache.put(int_id, True)
+            self._not_found(base_id, int_id)
+        long_url = row['long_url']
+        if self._cache is not None:
+            self._cache.put(int_id, long_url)
+        return (int_id, long_url)
+
+    @staticmethod
+    def _not_found(base_id, int_id):
+        raise dbinteraction.NotFound(base_id.strip(), int_id)
+
+    def added(self, int_id):
+        """Note that the given integer ID was just added to the database, so
+        that it is found before the highest ID is read again."""
+        with self._max_id_lock:
+            self._max_id = max(self._max_id, int_id)
+        if self._negative_cache is not None:
+            self._negative_cache.invalidate(int_id)
+
+    def hit(self, int_id, referrer=None, user_agent=None):
+        """Record an access of the given integer ID. Accesses which cannot
+        be counted since the database is down are dropped, so that links
+        resolved from the cache or the index are still redirected."""
+        if self._click_log is not None:
+            self._click_log.record(int_id, referrer, user_agent)
+            return
+        try:
+            if self._counter is not None:
+                self._counter.add(int_id)
+            else:
+                self._dbconn.increment(int_id)
+        except self._dbconn.errors:
+            pass
+
+    def invalidate(self, int_id):
+        """Drop any cached mapping of the given integer ID, e.g. after the
+        database row has been changed or deleted."""
+        if self._cache is not None:
+            self._cache.invalidate(int_id)
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import fcntl
+import mmap
+import os
+import struct
+import tempfile
+import threading
+
+
+# File header: magic, number of slots and slot size, so that a file written
+# with other dimensions is cleared rather than misread.
+_HEADER = struct.Struct('<8sII')
+_MAGIC = 'SWCACHE1'
+# Slot header: integer ID (0 for an unused slot) and long URL length, followed
+# by the long URL.
+_SLOT = struct.Struct('<QH')
+
+
+class SharedCache(object):
+    """Cache of long URLs by integer ID in a memory mapped file, shared by all
+    processes mapping it, e.g. pre-forked workers (see
+    preforkserver.PreforkServer). A popular link is then read from the
+    database once for all workers rather than once per worker, and the cache
+    takes the same memory however many workers there are.
+
+    The table has a fixed number of slots, and ID n lives in slot n % slots:
+    IDs added about the same time never share a slot, while IDs slots apart
+    evict each other. Long URLs too long for a slot are not cached. Slots
+    are read and written under a lock of their byte range, so unrelated
+    processes may share the file too. Mappings never change, so entries do
+    not expire; invalidate() drops one for all processes.
+
+    It has the get(), put() and invalidate() methods of cache.LRUCache, so
+    that it can be given to resolver.Resolver instead.
+
+    Args:
+        path: file to map, created if missing. If not given, an unlinked
+            temporary file is used, shared only by processes forked after
+            creating the cache.
+        slots: number of slots (default: 65536)
+        slot_size: bytes per slot, including a 10 byte header (default: 512)
+
+    Usage:
+        cache = SharedCache(slots=1024)
+        cache.put(1337, 'http://example.com/')
+        if os.fork() == 0:
+            cache.get(1337)
+
+    Raises:
+        ValueError if slots is not positive, or slot_size is not between 11
+        and 65545.
+    """
+    def __init__(self, path=None, slots=65536, slot_size=512):
+        self._slots = int(slots)
+        self._slot_size = int(slot_size)
+        if self._slots < 1:
+            raise ValueError('slots must be positive.')
+        if not _SLOT.size < self._slot_size <= _SLOT.size + 0xffff:
+            raise ValueError('slot_size must be between {} and {}.'.format(
+                    _SLOT.size + 1, _SLOT.size + 0xffff))
+        self._max_length = self._slot_size - _SLOT.size
+
+        if path is None:
+            (self._fd, path) = tempfile.mkstemp(prefix='shortweb-cache-')
+            os.unlink(path)
+        else:
+            self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0660)
+        try:
+            self._map = self._open()
+        except EnvironmentError:
+            os.close(self._fd)
+            raise
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+
+    def _open(self):
+        """Map the file, clearing it unless it has the expected header."""
+        size = _HEADER.size + self._slots * self._slot_size
+        header = _HEADER.pack(_MAGIC, self._slots, self._slot_size)
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, _HEADER.size, 0)
+        try:
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            if os.read(self._fd, _HEADER.size) != header:
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, size)
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                os.write(self._fd, header)
+            return mmap.mmap(self._fd, size)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, _HEADER.size, 0)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def close(self):
+        """Release the file."""
+        self._map.close()
+        os.close(self._fd)
+
+    @property
+    def slots(self):
+        return self._slots
+
+    @property
+    def max_length(self):
+        """Length of the longest long URL cached."""
+        return self._max_length
+
+    @property
+    def hits(self):
+        """Hits in this process."""
+        return self._hits
+
+    @property
+    def misses(self):
+        """Misses in this process."""
+        return self._misses
+
+    def _offset(self, key):
+        return _HEADER.size + key % self._slots * self._slot_size
+
+    def get(self, key, default=None):
+        """Return cached long URL for integer ID key, or default if not
+        cached."""
+        offset = self._offset(key)
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_SH, self._slot_size, offset)
+            try:
+                (slot_key, length) = _SLOT.unpack_from(self._map, offset)
+                if slot_key == key:
+                    start = offset + _SLOT.size
+                    value = self._map[start:start + length]
+                else:
+                    value = None
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, self._slot_size, offset)
+            if value is None:
+                self._misses += 1
+                return default
+            self._hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store long URL value for integer ID key, replacing the entry in
+        its slot. Values longer than max_length are not stored."""
+        if len(value) > self._max_length or key <= 0:
+            return
+        offset = self._offset(key)
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, self._slot_size, offset)
+            try:
+                _SLOT.pack_into(self._map, offset, key, len(value))
+                start = offset + _SLOT.size
+                self._map[start:start + len(value)] = value
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, self._slot_size, offset)
+
+    def invalidate(self, key):
+        """Drop the entry for integer ID key, if any, for all processes."""
+        offset = self._offset(key)
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, self._slot_size, offset)
+            try:
+                if _SLOT.unpack_from(self._map, offset)[0] == key:
+                    _SLOT.pack_into(self._map, offset, 0, 0)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, self._slot_size, offset)
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import ast
+import contextlib
+import fcntl
+import mmap
+import os
+import struct
+import tempfile
+import threading
+
+
+# File header: magic and number of slots, so that a file written with other
+# dimensions is cleared rather than misread.
+_HEADER = struct.Struct('<8sI')
+_MAGIC = 'SWMETRC1'
+# Slot header: value and key length (0 for an unused slot), followed by the
+# key as its repr().
+_SLOT = struct.Struct('<dB')
+_SLOT_SIZE = 128
+_MAX_KEY_LENGTH = _SLOT_SIZE - _SLOT.size
+
+
+class SharedValues(object):
+    """Values of metrics (see metrics.Values) in a memory mapped file, shared
+    by all processes mapping it, e.g. pre-forked workers (see
+    preforkserver.PreforkServer). The workers then add to the same counters,
+    so that the metrics served by any of them are the totals of all, and
+    scrapes which reach different workers see consistent counters.
+
+    Every key gets a slot of its own the first time it is added to, in
+    order, and each process remembers the slots of the keys it has seen.
+    The whole file is locked while adding, since a request adds to several
+    values at once. Keys beyond the number of slots, or longer than 119
+    characters as repr(), are not kept.
+
+    Args:
+        path: file to map, created if missing. If not given, an unlinked
+            temporary file is used, shared only by processes forked after
+            creating it.
+        slots: number of slots, 128 bytes each (default: 1024)
+
+    Usage:
+        values = SharedValues()
+        request_metrics = metrics.RequestMetrics(values)
+
+    Raises:
+        ValueError if slots is not positive.
+    """
+    def __init__(self, path=None, slots=1024):
+        self._slots = int(slots)
+        if self._slots < 1:
+            raise ValueError('slots must be positive.')
+
+        if path is None:
+            (self._fd, path) = tempfile.mkstemp(prefix='shortweb-metrics-')
+            os.unlink(path)
+        else:
+            self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0660)
+        try:
+            self._map = self._open()
+        except EnvironmentError:
+            os.close(self._fd)
+            raise
+        self._lock = threading.Lock()
+        # Key -> offset of its slot, of the keys seen by this process.
+        self._offsets = {}
+
+    def _open(self):
+        """Map the file, clearing it unless it has the expected header."""
+        size = _HEADER.size + self._slots * _SLOT_SIZE
+        header = _HEADER.pack(_MAGIC, self._slots)
+        fcntl.lockf(self._fd, fcntl.LOCK_EX)
+        try:
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            if os.read(self._fd, _HEADER.size) != header:
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, size)
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                os.write(self._fd, header)
+            return mmap.mmap(self._fd, size)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def close(self):
+        """Release the file."""
+        self._map.close()
+        os.close(self._fd)
+
+    @property
+    def slots(self):
+        return self._slots
+
+    @contextlib.contextmanager
+    def _locked(self, operation):
+        with self._lock:
+            fcntl.lockf(self._fd, operation)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+    def _offset(self, key, add=False):
+        """Return offset of the slot of key, taking a free slot if add is
+        true and key has none, or None. Called with the file locked."""
+        offset = self._offsets.get(key)
+        if offset is not None:
+            return offset
+        encoded = repr(key)
+        if len(encoded) > _MAX_KEY_LENGTH:
+            return None
+        for i in xrange(self._slots):
+            offset = _HEADER.size + i * _SLOT_SIZE
+            (_, length) = _SLOT.unpack_from(self._map, offset)
+            start = offset + _SLOT.size
+            if not length:
+                if not add:
+                    return None
+                self._map[start:start + len(encoded)] = encoded
+                _SLOT.pack_into(self._map, offset, 0.0, len(encoded))
+            elif self._map[start:start + length] != encoded:
+                continue
+            self._offsets[key] = offset
+            return offset
+        return None
+
+    def add_many(self, amounts):
+        """Add to several values at once, given (key, amount) tuples."""
+        with self._locked(fcntl.LOCK_EX):
+            for (key, amount) in amounts:
+                offset = self._offset(key, add=True)
+                if offset is not None:
+                    (value, length) = _SLOT.unpack_from(self._map, offset)
+                    _SLOT.pack_into(self._map, offset, value + amount,
+                                    length)
+
+    def get(self, key):
+        with self._locked(fcntl.LOCK_SH):
+            offset = self._offset(key)
+            if offset is None:
+                return 0
+            return _SLOT.unpack_from(self._map, offset)[0]
+
+    def items(self):
+        """Return list of (key, value) tuples."""
+        items = []
+        with self._locked(fcntl.LOCK_SH):
+            for i in xrange(self._slots):
+                offset = _HEADER.size + i * _SLOT_SIZE
+                (value, length) = _SLOT.unpack_from(self._map, offset)
+                if not length:
+                    break
+                start = offset + _SLOT.size
+                items.append((self._map[start:start + length], value))
+        return [(ast.literal_eval(key), value) for (key, value) in items]
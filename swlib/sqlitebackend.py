@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import datetime
+import sqlite3
+
+import backend
+import config
+
+
+def _dict_factory(cursor, row):
+    """Return rows as dicts, like MySQLdb.cursors.DictCursor does."""
+    return dict((column[0], value)
+                for (column, value) in zip(cursor.description, row))
+
+
+class SQLiteBackend(backend.SQLBackend):
+    """Storage in an embedded SQLite database in WAL mode, for small
+    deployments and for testing without a database server.
+
+    WAL mode lets readers proceed concurrently with a writer, and lookups
+    need no network round trip.
+
+    Args:
+        database: path of the database file (default: shortweb.sqlite).
+            Note that every connection to ':memory:' gets a database of its
+            own, so the pool size must then be 1.
+        timeout: seconds to wait for a lock held by another connection
+            (default: 5)
+        replicas: read replicas as a list or comma-separated string of
+            database file paths, e.g. copies kept up to date by a replication
+            tool (default: none)
+        data_table_name, info_table_name, sequence_table_name,
+            click_table_name, archive_table_name, replica_retry,
+            read_your_writes, pool_min_size, pool_max_size, pool_timeout: as
+            for backend.SQLBackend.
+        host, user, passwd, db: ignored, so that a [DB] section written for
+            MySQL works after setting backend = sqlite.
+
+    Usage:
+        sqlite_backend = SQLiteBackend(database='/path/shortweb.sqlite')
+        sqlite_backend.create_tables('abcdefghijkmnopqrstuvwxyz...')
+    """
+    placeholder = '?'
+    integrity_errors = (sqlite3.IntegrityError,)
+    database_errors = (sqlite3.Error,)
+    # SQLite locks the whole database instead; see _begin_write().
+    for_update = ''
+
+    def __init__(self, database='shortweb.sqlite', timeout=5,
+                 data_table_name='translation_table',
+                 info_table_name='base_info',
+                 sequence_table_name='id_sequence',
+                 click_table_name='click_rollup',
+                 archive_table_name='translation_archive', replicas=(),
+                 replica_retry=30, read_your_writes=True, pool_min_size=1,
+                 pool_max_size=5, pool_timeout=10, host=None, user=None,
+                 passwd=None, db=None):
+        self._database = database
+
+        def connector(database):
+            def connect():
+                # Connections are only used by one thread at a time, which
+                # the pool guarantees.
+                conn = sqlite3.connect(database, timeout=float(timeout),
+                                       detect_types=sqlite3.PARSE_DECLTYPES,
+                                       check_same_thread=False)
+                conn.row_factory = _dict_factory
+                # Return str like MySQLdb does, and accept 8-bit str
+                # parameters.
+                conn.text_factory = str
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute('PRAGMA synchronous=NORMAL')
+                return conn
+            return connect
+
+        super(SQLiteBackend, self).__init__(
+                connector(database), data_table_name=data_table_name,
+                info_table_name=info_table_name,
+                sequence_table_name=sequence_table_name,
+                click_table_name=click_table_name,
+                archive_table_name=archive_table_name,
+                replica_connects=[connector(replica) for replica
+                                  in config.split_list(replicas)],
+                replica_retry=replica_retry,
+                read_your_writes=read_your_writes,
+                pool_min_size=pool_min_size,
+                pool_max_size=pool_max_size, pool_timeout=pool_timeout)
+
+    @property
+    def database(self):
+        return self._database
+
+    def _first_insert_id(self, cursor, n):
+        """Return the ID of the first of n rows just inserted by executemany()
+        on cursor. The rows are inserted in one transaction by the only
+        writer, so their IDs are consecutive."""
+        cursor.execute('SELECT last_insert_rowid() AS id')
+        return cursor.fetchone()['id'] - n + 1
+
+    def _begin_write(self, cursor):
+        """Take the write lock of the database right away, since sqlite3
+        only starts a transaction before the first write, which would let
+        other writers change the rows read before it."""
+        cursor.execute('BEGIN IMMEDIATE')
+
+    @staticmethod
+    def _timestamp(value):
+        """Aggregates have no declared type, so sqlite3 returns their
+        timestamps as text; convert them like timestamp columns."""
+        if isinstance(value, str):
+            return sqlite3.converters['TIMESTAMP'](value)
+        return value
+
+    def resolve_and_count(self, int_id):
+        """Return the long URL of the given integer ID and count the access,
+        or return None if the ID does not exist.
+
+        SQLite 3.35 and later do this in one UPDATE ... RETURNING statement.
+        """
+        if sqlite3.sqlite_version_info < (3, 35, 0):
+            return super(SQLiteBackend, self).resolve_and_count(int_id)
+        query = self._format(
+                'UPDATE {data} SET access_counter=(access_counter+1), '
+                'last_accessed={p} WHERE id={p} RETURNING long_url')
+        with self.cursor('update') as cursor:
+            cursor.execute(query, (datetime.datetime.now(), int_id))
+            row = cursor.fetchone()
+            cursor.connection.commit()
+        return None if row is None else row['long_url']
+
+    def add_click_rollups(self, rollups):
+        """Add clicks to the per-ID, per-day rollups in one transaction; see
+        backend.SQLBackend.add_click_rollups().
+
+        SQLite 3.24 and later do this with INSERT ... ON CONFLICT DO UPDATE,
+        so that concurrent inserts of the same row need no retries.
+        """
+        if sqlite3.sqlite_version_info < (3, 24, 0):
+            return super(SQLiteBackend, self).add_click_rollups(rollups)
+        rollups = list(rollups)
+        if not rollups:
+            return
+        query = self._format(
+                'INSERT INTO {clicks} (int_id, day, clicks, last_click) '
+                'VALUES({p}, {p}, {p}, {p}) ON CONFLICT (int_id, day) '
+                'DO UPDATE SET clicks=(clicks+excluded.clicks), '
+                'last_click=MAX(last_click, excluded.last_click)')
+        with self.cursor('update') as cursor:
+            cursor.executemany(query, rollups)
+            cursor.connection.commit()
+
+    def create_tables(self, base_chars):
+        """Create the tables if they do not exist, with the given base
+        representation characters if there are none yet."""
+        with self.cursor() as cursor:
+            cursor.execute(self._format(
+                    'CREATE TABLE IF NOT EXISTS {data} ('
+                    'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                    'long_url TEXT NOT NULL, '
+                    'last_accessed timestamp, '
+                    'created timestamp NOT NULL, '
+                    'access_counter INTEGER NOT NULL DEFAULT 0, '
+                    'url_hash TEXT)'))
+            # Upgrade tables created before url_hash was added.
+            cursor.execute(self._format('PRAGMA table_info({data})'))
+            if 'url_hash' not in [row['name'] for row in cursor.fetchall()]:
+                cursor.execute(self._format(
+                        'ALTER TABLE {data} ADD COLUMN url_hash TEXT'))
+            cursor.execute(self._format(
+                    'CREATE UNIQUE INDEX IF NOT EXISTS {data}_url_hash '
+                    'ON {data} (url_hash)'))
+            cursor.execute(self._format(
+                    'CREATE TABLE IF NOT EXISTS {info} ('
+                    'base_chars TEXT NOT NULL PRIMARY KEY)'))
+            cursor.execute(self._format(
+                    'CREATE TABLE IF NOT EXISTS {seq} ('
+                    'name TEXT NOT NULL PRIMARY KEY, '
+                    'next_id INTEGER NOT NULL)'))
+            cursor.execute(self._format(
+                    'CREATE TABLE IF NOT EXISTS {clicks} ('
+                    'int_id INTEGER NOT NULL, '
+                    'day date NOT NULL, '
+                    'clicks INTEGER NOT NULL, '
+                    'last_click timestamp NOT NULL, '
+                    'PRIMARY KEY (int_id, day))'))
+            cursor.execute(self._format(
+                    'CREATE TABLE IF NOT EXISTS {archive} ('
+                    'id INTEGER PRIMARY KEY, '
+                    'long_url TEXT NOT NULL, '
+                    'last_accessed timestamp, '
+                    'created timestamp NOT NULL, '
+                    'access_counter INTEGER NOT NULL DEFAULT 0, '
+                    'url_hash TEXT)'))
+            cursor.execute(self._format('SELECT COUNT(*) AS n FROM {info}'))
+            if not cursor.fetchone()['n']:
+                cursor.execute(self._format(
+                        'INSERT INTO {info} (base_chars) VALUES({p})'),
+                        (base_chars,))
+            cursor.connection.commit()
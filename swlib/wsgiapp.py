@@ -0,0 +1,272 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import atexit
+
+import cgi
+import threading
+
+import basetranslate
+import cache
+import clicklog
+import config as swconfig
+import counter
+import dbinteraction
+import lookup
+import metrics
+import printer
+import ratelimit
+import redirectindex
+import resolver
+
+
+class ShortWebApp(object):
+    """WSGI application serving the same routes as shortweb.cgi.
+
+    The configuration, the database connection and the base representation
+    are set up once and kept between requests, instead of once per hit as for
+    the CGI script. Database connections are pooled as configured in the [DB]
+    section, so the application may be served from several threads. Resolved
+    long URLs are cached as configured in the [Cache] section, where
+    max_entries = 0 disables the cache. Access counters are written behind in
+    batches as configured in the [Counter] section, and flushed at exit.
+
+    Request metrics (see metrics.RequestMetrics) are served in Prometheus
+    format from the path given in the [Metrics] section (default: /metrics),
+    and with log = yes a JSON line per request is written to wsgi.errors.
+
+    If the [Index] section gives the path of a redirect index (see
+    redirectindex.build_index()), redirects are resolved from it before the
+    database, so indexed links keep working while the database is down,
+    also in servers started meanwhile.
+
+    If the [Clicks] section gives a directory, redirects are logged there
+    (see clicklog.ClickLog) instead of being counted in the database, and
+    the link information page shows the rolled up clicks.
+
+    Short IDs above the highest ID in the database, and IDs recently not
+    found, are answered "not found" without a database lookup as configured
+    in the [NotFound] section (see resolver.Resolver), where max_id_interval
+    = 0 and max_entries = 0 disable either.
+
+    If the [Limits] section gives the path of a state file, new links are
+    rate limited per client address (see ratelimit.RateLimiter), and
+    refused ones are answered with 429.
+
+    Many short IDs or URLs are looked up at once, as JSON, with lookup
+    fields (see lookup.lookup_many()), up to max_lookups in the [Web]
+    section (default: 1000) per request.
+
+    Args:
+        config: swlib.config.ConfigItems object.
+        url_cache: optional cache of resolved long URLs to use instead of
+            the one configured in the [Cache] section, e.g. a
+            sharedcache.SharedCache shared by pre-forked workers.
+        metric_values: optional metrics.Values object to keep the request
+            metrics in, e.g. a sharedmetrics.SharedValues shared by
+            pre-forked workers.
+
+    Usage:
+        application = ShortWebApp(swlib.config.ConfigItems())
+    """
+    def __init__(self, config, url_cache=None, metric_values=None):
+        self._config = config
+        self._dbconn = None
+        self._resolver = None
+        self._counter_buffer = None
+        self._dbconn_lock = threading.Lock()
+
+        cacheargs = dict(config.cacheargs)
+        if url_cache is not None:
+            self._cache = url_cache
+        elif int(cacheargs.setdefault('max_entries', 10000)):
+            self._cache = cache.LRUCache(**cacheargs)
+        else:
+            self._cache = None
+
+        self._counterargs = dict(config.counterargs)
+        self._counterargs['synchronous'] = swconfig.boolean(
+                self._counterargs.get('synchronous', False))
+
+        if config.clicksargs.get('directory'):
+            self._click_log = clicklog.ClickLog(**config.clicksargs)
+            atexit.register(self._click_log.close)
+        else:
+            self._click_log = None
+
+        notfoundargs = dict(config.notfoundargs)
+        self._max_id_interval = float(notfoundargs.pop('max_id_interval', 1))
+        if int(notfoundargs.setdefault('max_entries', 10000)):
+            notfoundargs.setdefault('ttl', 60)
+            self._negative_cache = cache.LRUCache(**notfoundargs)
+        else:
+            self._negative_cache = None
+
+        if config.limitsargs.get('path'):
+            self._limiter = ratelimit.RateLimiter(**config.limitsargs)
+        else:
+            self._limiter = None
+
+        if config.indexargs.get('path'):
+            self._index = redirectindex.RedirectIndex(**config.indexargs)
+        else:
+            self._index = None
+
+        # Pages are built without per-request state, so one printer serves
+        # all requests.
+        self._htmlprinter = printer.HtmlPrinter(**config.webargs)
+        self._max_lookups = int(config.webargs.get('max_lookups', 1000))
+
+        self._metrics = metrics.RequestMetrics(metric_values)
+        self._metrics_path = config.metricsargs.get('path', '/metrics')
+        self._log_requests = swconfig.boolean(
+                config.metricsargs.get('log', False))
+
+    @property
+    def cache(self):
+        """Cache of resolved long URLs, or None if disabled."""
+        return self._cache
+
+    @property
+    def metrics(self):
+        """metrics.RequestMetrics of the served requests."""
+        return self._metrics
+
+    @property
+    def dbconn(self):
+        """Long-lived, pooled ShortDBConn. It connects on first database
+        access, and takes the base representation from the redirect index if
+        there is one, so that indexed links are redirected while the
+        database is down."""
+        with self._dbconn_lock:
+            if self._dbconn is None:
+                dbargs = dict(self._config.dbargs, lazy=True)
+                if self._index is not None:
+                    dbargs['base_chars'] = self._index.base_chars
+                dbconn = dbinteraction.ShortDBConn(**dbargs)
+                if self._click_log is None:
+                    counter_buffer = counter.CounterBuffer(
+                            dbconn, **self._counterargs)
+                    atexit.register(counter_buffer.close)
+                else:
+                    counter_buffer = None
+                self._counter_buffer = counter_buffer
+                self._resolver = resolver.Resolver(dbconn, cache=self._cache,
+                                                   counter=counter_buffer,
+                                                   index=self._index,
+                                                   click_log=self._click_log,
+                                                   max_id_interval=
+                                                   self._max_id_interval,
+                                                   negative_cache=
+                                                   self._negative_cache)
+                self._dbconn = dbconn
+        return self._dbconn
+
+    @property
+    def resolver(self):
+        self.dbconn
+        return self._resolver
+
+    def close(self):
+        """Flush pending access counters and clicks, and close the database
+        connections, e.g. when a pre-forked worker exits without running
+        exit handlers."""
+        with self._dbconn_lock:
+            if self._counter_buffer is not None:
+                self._counter_buffer.close()
+            if self._click_log is not None:
+                self._click_log.close()
+            if self._dbconn is not None:
+                self._dbconn.close()
+                self._dbconn = None
+
+    def __call__(self, environ, start_response):
+        if (self._metrics_path and
+                environ.get('PATH_INFO') == self._metrics_path):
+            return self._serve_metrics(environ, start_response)
+
+        timer = metrics.RequestTimer()
+        try:
+            with timer:
+                form = cgi.FieldStorage(fp=environ.get('wsgi.input'),
+                                        environ=environ)
+                response = self._route(environ, form, self._htmlprinter,
+                                       timer)
+        finally:
+            self._metrics.record(timer)
+            if self._log_requests:
+                environ['wsgi.errors'].write(timer.log_line() + '\n')
+
+        (status, headers, body) = response.wsgi()
+        start_response(status, headers)
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            return []
+        return [body]
+
+    def _serve_metrics(self, environ, start_response):
+        body = self._metrics.render()
+        start_response('200 OK',
+                       [('Content-Type', 'text/plain; version=0.0.4'),
+                        ('Content-Length', str(len(body)))])
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            return []
+        return [body]
+
+    def _route(self, environ, form, htmlprinter, timer):
+        """Dispatch a request like route() in shortweb.cgi does, setting the
+        outcome of the request timer, and return a printer.Response."""
+        dbconn = self.dbconn
+        request_method = environ['REQUEST_METHOD']
+
+        if request_method == 'POST' and 'new_url' in form:
+            try:
+                with ratelimit.admit(self._limiter,
+                                     environ.get('REMOTE_ADDR', '')):
+                    int_id = dbconn.add(form.getfirst('new_url'))
+            except ratelimit.Limited as limited:
+                timer.outcome = 'limited'
+                return htmlprinter.too_many_requests(limited.retry_after)
+            item = basetranslate.BaseItem(dbconn.base_chars, int_id)
+            self.resolver.added(item.int_id)
+            timer.outcome = 'create'
+            return htmlprinter.reload(item.base_id)
+        elif request_method in ('GET', 'HEAD', 'POST') and 'lookup' in form:
+            short_urls = [short_url for value in form.getlist('lookup')
+                          for short_url in value.split()]
+            if len(short_urls) > self._max_lookups:
+                timer.outcome = 'invalid'
+                return htmlprinter.too_many_lookups(self._max_lookups)
+            results = lookup.lookup_many(
+                    dbconn, short_urls, base_url=htmlprinter.base_url,
+                    click_rollups=self._click_log is not None)
+            timer.outcome = 'lookup'
+            return htmlprinter.lookup_results(results)
+        elif request_method in ('GET', 'HEAD') and 'short' in form:
+            short_url = cgi.escape(form.getfirst('short'))
+            # Trailing '+' (mangled into a trailing space) shows link info,
+            # which is always read from the database to get fresh counters.
+            show_info = short_url[-1] == ' '
+            try:
+                if show_info:
+                    shortdbentry = dbinteraction.ShortDBEntry(
+                            dbconn, short_url,
+                            click_rollups=self._click_log is not None)
+                else:
+                    (int_id, long_url) = self.resolver.resolve(short_url)
+            except dbinteraction.NotFound as not_found:
+                timer.outcome = 'not_found'
+                return htmlprinter.short_id_not_found(not_found.base_id,
+                                                      not_found.int_id)
+            except ValueError:
+                timer.outcome = 'invalid'
+                return htmlprinter.invalid_short_id(short_url.strip(),
+                                                    dbconn.base_chars)
+            if show_info:
+                timer.outcome = 'info'
+                return htmlprinter.short_id_info(shortdbentry)
+            self.resolver.hit(int_id, environ.get('HTTP_REFERER'),
+                              environ.get('HTTP_USER_AGENT'))
+            timer.outcome = 'redirect'
+            return htmlprinter.redirect(long_url)
+        else:
+            timer.outcome = 'form'
+            return htmlprinter.new_url_form()
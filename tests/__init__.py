@@ -0,0 +1,6 @@
+import os
+
+
+# Configuration file of the tests which need a database; see the README.
+TEST_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           os.pardir, 'shortweb.test.config')
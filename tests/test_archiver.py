@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+from swlib import dbinteraction
+from swlib.archiver import archive_idle
+
+
+class TestSequence(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.database = os.path.join(self.directory, 'test.sqlite')
+        self.dbconn = self.connect()
+        self.dbconn.backend.create_tables(
+                'abcdefghijkmnopqrstuvwxyzACDEFGHJKLMNPQRTUVWXYZ234679')
+        self.ids = self.dbconn.backend.add_many(
+                ['http://example.com/{}'.format(i) for i in range(5)])
+        with self.dbconn.cursor() as cursor:
+            cursor.execute('UPDATE translation_table SET created=?',
+                           (datetime.datetime(2000, 1, 1),))
+            cursor.connection.commit()
+        self.dbconn.increment(self.ids[3])
+
+    def tearDown(self):
+        self.dbconn.close()
+        shutil.rmtree(self.directory)
+
+    def connect(self, **kwargs):
+        return dbinteraction.ShortDBConn(backend='sqlite',
+                                         database=self.database, **kwargs)
+
+    def test_archive_idle(self):
+        """Idle entries but the highest one should be archived in batches,
+        and still be found with archive set."""
+        batches = []
+        self.assertEqual(archive_idle(self.dbconn, batch_size=2,
+                                      progress=lambda *a: batches.append(a)),
+                         3)
+        self.assertEqual(batches, [(2, 2), (4, 3)])
+        self.assertIsNone(self.dbconn.lookup(self.ids[0]))
+        self.assertIsNotNone(self.dbconn.lookup(self.ids[3]))
+        self.assertIsNotNone(self.dbconn.lookup(self.ids[4]))
+        self.assertEqual(archive_idle(self.dbconn), 0)
+
+        with self.connect(archive=True) as archive_dbconn:
+            base_id = archive_dbconn.translation.int_to_base(self.ids[0])
+            self.assertEqual(archive_dbconn.resolve(base_id),
+                             'http://example.com/0')
+            entry = dbinteraction.ShortDBEntry(archive_dbconn, base_id)
+            self.assertEqual(entry.long_url, 'http://example.com/0')
+            self.assertEqual(entry.access_counter, 0)
+            self.assertEqual([int_id for (int_id, _, _) in
+                              archive_dbconn.mappings()], self.ids)
+        self.assertIsNone(self.dbconn.lookup(self.ids[0]))
+
+    def test_archive_idle_clicks(self):
+        """With clicks, entries clicked since according to the click rollups
+        should be kept, in IN lists of any length."""
+        self.dbconn.backend.max_parameters = 1
+        now = datetime.datetime.now()
+        self.dbconn.add_click_rollups([(self.ids[1], now.date(), 2, now),
+                                       (self.ids[2], datetime.date(2000, 1, 2),
+                                        1, datetime.datetime(2000, 1, 2))])
+        self.assertEqual(archive_idle(self.dbconn, clicks=True), 2)
+        self.assertIsNone(self.dbconn.lookup(self.ids[0]))
+        self.assertIsNotNone(self.dbconn.lookup(self.ids[1]))
+        self.assertIsNone(self.dbconn.lookup(self.ids[2]))
+        self.assertEqual(archive_idle(self.dbconn), 1)
+        self.assertIsNone(self.dbconn.lookup(self.ids[1]))
+        self.assertEqual(
+                [self.dbconn.backend.lookup_archived(int_id)['long_url']
+                 for int_id in self.ids[:3]],
+                ['http://example.com/{}'.format(i) for i in range(3)])
+
+    def test_archive_promote(self):
+        """Archived entries should be promoted back when accessed."""
+        archive_idle(self.dbconn)
+        with self.connect(archive=True, promote='yes') as promote_dbconn:
+            base_id = promote_dbconn.translation.int_to_base(self.ids[1])
+            self.assertEqual(promote_dbconn.resolve(base_id),
+                             'http://example.com/1')
+        row = self.dbconn.lookup(self.ids[1])
+        self.assertEqual(row['access_counter'], 1)
+        self.assertIsNone(self.dbconn.backend.lookup_archived(self.ids[1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
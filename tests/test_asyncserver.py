@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import httplib
+import socket
+import threading
+import unittest
+
+from swlib.asyncserver import AsyncServer
+
+
+def _echo_application(environ, start_response):
+    body = '{REQUEST_METHOD} {PATH_INFO}?{QUERY_STRING} {body}'.format(
+            body=environ['wsgi.input'].read(), **environ)
+    start_response('200 OK', [('Content-Type', 'text/plain'),
+                              ('Content-Length', str(len(body)))])
+    return [body]
+
+
+class TestSequence(unittest.TestCase):
+    def setUp(self):
+        self.server = AsyncServer(_echo_application, port=0, workers=2)
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       kwargs={'poll_interval': 0.05})
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.thread.join()
+
+    def test_async_server_keep_alive(self):
+        """Several requests should be served on one connection."""
+        conn = httplib.HTTPConnection('localhost', self.server.port)
+        for i in range(3):
+            conn.request('GET', '/s?short={}'.format(i))
+            response = conn.getresponse()
+            self.assertEqual(response.status, 200)
+            self.assertEqual(response.read(), 'GET /s?short={} '.format(i))
+        conn.request('POST', '/', 'new_url=example.com',
+                     {'Content-Type': 'application/x-www-form-urlencoded'})
+        self.assertEqual(conn.getresponse().read(),
+                         'POST /? new_url=example.com')
+        conn.close()
+
+    def test_async_server_head(self):
+        """HEAD responses should have headers but no body."""
+        conn = httplib.HTTPConnection('localhost', self.server.port)
+        conn.request('HEAD', '/?short=c')
+        response = conn.getresponse()
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.getheader('Content-Length'),
+                         str(len('HEAD /?short=c ')))
+        self.assertEqual(response.read(), '')
+        conn.close()
+
+    def test_async_server_bad_request(self):
+        """Malformed requests should be answered with 400."""
+        sock = socket.create_connection(('localhost', self.server.port))
+        sock.sendall('nonsense\r\n\r\n')
+        self.assertTrue(sock.recv(1024).startswith('HTTP/1.0 400'))
+        sock.close()
+
+    def test_async_server_transfer_encoding(self):
+        """Requests with Transfer-Encoding, or with their body length given
+        twice, should be refused and the connection closed, rather than
+        their bodies read as further requests."""
+        for (head, status) in (
+                ('Transfer-Encoding: chunked', '501'),
+                ('Transfer-Encoding: chunked\r\nContent-Length: 5', '400'),
+                ('Content-Length: 5\r\nContent-Length: 26', '400')):
+            sock = socket.create_connection(('localhost', self.server.port))
+            sock.sendall('POST / HTTP/1.1\r\nHost: x\r\n{}\r\n\r\n'
+                         '5\r\nshort\r\n0\r\n\r\n'
+                         'GET /?smuggled HTTP/1.1\r\n\r\n'.format(head))
+            response = ''
+            while True:
+                data = sock.recv(1024)
+                if not data:
+                    break
+                response += data
+            sock.close()
+            self.assertTrue(response.startswith('HTTP/1.0 ' + status),
+                            response)
+            self.assertNotIn('smuggled', response)
+            self.assertEqual(response.count('HTTP/'), 1)
+
+    def test_async_server_many_clients(self):
+        """Idle clients should not keep others from being served."""
+        idle = [socket.create_connection(('localhost', self.server.port))
+                for _ in range(50)]
+        conn = httplib.HTTPConnection('localhost', self.server.port)
+        conn.request('GET', '/')
+        self.assertEqual(conn.getresponse().status, 200)
+        conn.close()
+        for sock in idle:
+            sock.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,22 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import unittest
+
+from swlib.backend import SQLBackend
+
+
+class TestSequence(unittest.TestCase):
+    def test_sql_backend_format(self):
+        """Queries should get table names and placeholders filled in."""
+        backend = SQLBackend(lambda: None, data_table_name='d',
+                             info_table_name='i', pool_min_size=0)
+        self.assertEqual(backend._format('{data} {info} {seq} {clicks} '
+                                         'id={p}'),
+                         'd i id_sequence click_rollup id=%s')
+        self.assertEqual(backend.data_table_name, 'd')
+        self.assertEqual(backend.info_table_name, 'i')
+        self.assertIs(backend._format('{data}'), backend._format('{data}'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import unittest
+
+from swlib.basetranslate import BaseItem, Translation, _import_numpy
+
+
+class TestSequence(unittest.TestCase):
+    def setUp(self):
+        self.representation = '''
+            abcdefghijk mnopqrstuvwxyz
+            A CDEFGH JKLMN PQR TUVWXYZ
+              234 67 9
+          	'''
+        # Precalculated values.
+        self.base_id = 'An'
+        self.int_id = 1337
+
+        self.translation = Translation(self.representation)
+        self.base_item = BaseItem(self.representation, self.base_id)
+
+    def test_translation_init(self):
+        """Check intialization of invalid bases in Translation."""
+        with self.assertRaises(ValueError):
+            Translation('aaa')
+        with self.assertRaises(TypeError):
+            Translation(123)
+        with self.assertRaises(TypeError):
+            Translation(('a', 'b', 'c'))
+        with self.assertRaises(ValueError):
+            Translation(' ')
+        with self.assertRaises(ValueError):
+            Translation('\t')
+        with self.assertRaises(ValueError):
+            Translation('\n')
+
+    def test_translation_functions(self):
+        """Check function calls with invalid arguments and that item
+        translation is bidirectionally consistent in Translation."""
+        with self.assertRaises(TypeError):
+            self.translation.int_to_base('Five')
+        with self.assertRaises(ValueError):
+            self.translation.int_to_base(-1)
+        with self.assertRaises(ValueError):
+            self.translation.int_to_base(2.7)
+        with self.assertRaises(ValueError):
+            self.translation.base_to_int('lBIOS1580')
+
+        self.assertEqual(
+                self.translation.int_to_base(self.int_id), self.base_id)
+        self.assertEqual(
+                self.translation.base_to_int(self.base_id), self.int_id)
+
+        # Check that whitespace is correctly stripped.
+        self.assertEqual(
+                self.translation.base_to_int(' \t\n' + self.base_id + ' \t\n'),
+                self.int_id)
+
+    def test_translation_many(self):
+        """Bulk translation should be consistent with single translation."""
+        int_ids = range(1, 3000, 7) + [self.int_id, 53**10 + 1]
+        base_ids = [self.translation.int_to_base(i) for i in int_ids]
+
+        self.assertEqual(
+                self.translation.int_to_base_many(int_ids, use_numpy=False),
+                base_ids)
+        self.assertEqual(
+                self.translation.base_to_int_many(base_ids, use_numpy=False),
+                int_ids)
+        self.assertEqual(self.translation.int_to_base_many([]), [])
+
+        with self.assertRaises(ValueError):
+            self.translation.int_to_base_many([1, -1], use_numpy=False)
+        with self.assertRaises(ValueError):
+            self.translation.base_to_int_many(['An', 'lBIOS1580'],
+                                              use_numpy=False)
+
+    @unittest.skipIf(_import_numpy() is None, 'NumPy is not installed.')
+    def test_translation_many_numpy(self):
+        """Vectorized bulk translation should give the same results, and
+        leave invalid input to the pure Python implementation."""
+        int_ids = range(1, 3000, 7) + [self.int_id, 53**10 + 1]
+        base_ids = [self.translation.int_to_base(i) for i in int_ids]
+
+        self.assertEqual(
+                self.translation.int_to_base_many(int_ids, use_numpy=True),
+                base_ids)
+        self.assertEqual(
+                self.translation.base_to_int_many(
+                        base_ids + [' An\t'], use_numpy=True),
+                int_ids + [self.int_id])
+        self.assertEqual(
+                self.translation.int_to_base_many([2**70], use_numpy=True),
+                [self.translation.int_to_base(2**70)])
+
+        with self.assertRaises(ValueError):
+            self.translation.int_to_base_many([1, 0], use_numpy=True)
+        with self.assertRaises(ValueError):
+            self.translation.base_to_int_many(['An', 'An1'], use_numpy=True)
+
+    def test_base_item_init(self):
+        """Test initialization with invalid arguments and that whitespace is
+        handled correctly in BaseItem."""
+        with self.assertRaises(TypeError):
+            BaseItem(self.representation, self.int_id)
+        with self.assertRaises(ValueError):
+            BaseItem(self.representation, 'lBIOS1580')
+        with self.assertRaises(AttributeError):
+            self.base_item.base_id = 'cat'
+        with self.assertRaises(AttributeError):
+            self.base_item.int_id = self.int_id + 1
+
+        # Check that whitespace is correctly stripped.
+        with_space = BaseItem(self.representation,
+                              ' \t\n' + self.base_id + ' \t\n')
+        self.assertEqual(with_space.int_id, self.base_item.int_id)
+
+    def test_base_item_calc(self):
+        """Check concistency in bidirectional translation in BaseItem."""
+        self.assertEqual(self.base_item.base_id, self.base_id)
+        self.assertEqual(self.base_item.int_id, self.int_id)
+
+        # Check that whitespace is correctly stripped.
+        with_space = BaseItem(self.representation,
+                              ' \t\n' + self.base_id + ' \t\n')
+        self.assertEqual(with_space.base_id, self.base_id)
+        self.assertEqual(with_space.int_id, self.int_id)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import unittest
+
+from swlib.benchmark import percentile, run, run_benchmarks
+
+
+class TestSequence(unittest.TestCase):
+    def test_percentile(self):
+        """Percentiles should be taken by nearest rank."""
+        values = range(1, 101)
+        self.assertEqual(percentile(values, 0.5), 50)
+        self.assertEqual(percentile(values, 0.99), 99)
+        self.assertEqual(percentile(values, 0), 1)
+        self.assertEqual(percentile([7], 0.95), 7)
+
+    def test_run(self):
+        """Every iteration should be timed and summarized."""
+        calls = []
+        result = run('test', calls.append, 20, warmup=5)
+        self.assertEqual(calls, range(5) + range(20))
+        self.assertEqual(result['iterations'], 20)
+        latency = result['latency_us']
+        self.assertTrue(latency['min'] <= latency['p50'] <= latency['p99'] <=
+                        latency['max'])
+
+    def test_run_benchmarks(self):
+        """All levels should run and report every benchmark."""
+        report = run_benchmarks(iterations=3)
+        self.assertEqual(len(report['results']['micro']), 12)
+        self.assertEqual([result['name']
+                          for result in report['results']['storage']],
+                         ['add', 'lookup', 'increment', 'resolve'])
+        self.assertEqual([result['name']
+                          for result in report['results']['end_to_end']],
+                         ['redirect', 'info', 'create'])
+        with self.assertRaises(ValueError):
+            run_benchmarks(levels=['macro'])
+
+
+if __name__ == '__main__':
+    unittest.main()
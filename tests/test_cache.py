@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import unittest
+
+from swlib.cache import LRUCache
+
+
+class TestSequence(unittest.TestCase):
+    def setUp(self):
+        self.now = 0
+        self.cache = LRUCache(max_entries=2, ttl=10, timer=lambda: self.now)
+
+    def test_lru_cache_init(self):
+        """Invalid sizes and expiry times should raise ValueError."""
+        with self.assertRaises(ValueError):
+            LRUCache(max_entries=0)
+        with self.assertRaises(ValueError):
+            LRUCache(ttl=-1)
+        with self.assertRaises(AttributeError):
+            self.cache.max_entries = 5
+
+    def test_lru_cache_eviction(self):
+        """Least recently used entry should be evicted when full."""
+        self.cache.put(1, 'a')
+        self.cache.put(2, 'b')
+        self.assertEqual(self.cache.get(1), 'a')
+        self.cache.put(3, 'c')
+
+        self.assertIsNone(self.cache.get(2))
+        self.assertEqual(self.cache.get(1), 'a')
+        self.assertEqual(self.cache.get(3), 'c')
+        self.assertEqual(len(self.cache), 2)
+        self.assertEqual(self.cache.hits, 3)
+        self.assertEqual(self.cache.misses, 1)
+        self.assertEqual(self.cache.evictions, 1)
+
+    def test_lru_cache_expiry(self):
+        """Entries should expire after ttl seconds, unless ttl is 0."""
+        self.cache.put(1, 'a')
+        self.now = 9
+        self.assertEqual(self.cache.get(1), 'a')
+        self.now = 10
+        self.assertIsNone(self.cache.get(1))
+        self.assertEqual(self.cache.evictions, 1)
+
+        cache = LRUCache(ttl=0, timer=lambda: self.now)
+        cache.put(1, 'a')
+        self.now = 10**9
+        self.assertEqual(cache.get(1), 'a')
+
+    def test_lru_cache_invalidate(self):
+        """Invalidated entries should not be returned."""
+        self.cache.put(1, 'a')
+        self.cache.put(2, 'b')
+        self.cache.invalidate(1)
+        self.cache.invalidate(5)
+        self.assertIsNone(self.cache.get(1))
+        self.assertEqual(self.cache.get(2), 'b')
+        self.cache.clear()
+        self.assertEqual(len(self.cache), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+from swlib import dbinteraction
+from swlib.clicklog import ClickLog, ended_segments, read_events, rollup
+
+
+class _FakeClock(object):
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestSequence(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.clock = _FakeClock(1577872800.0)
+        self.dbconn = dbinteraction.ShortDBConn(
+                backend='sqlite',
+                database=os.path.join(self.directory, 'test.sqlite'))
+        self.dbconn.backend.create_tables(
+                'abcdefghijkmnopqrstuvwxyzACDEFGHJKLMNPQRTUVWXYZ234679')
+
+    def tearDown(self):
+        self.dbconn.close()
+        shutil.rmtree(self.directory)
+
+    def test_click_log_segments(self):
+        """Events should be written to the segment of their time."""
+        with ClickLog(self.directory, segment_seconds=60, referrer='yes',
+                      clock=self.clock) as click_log:
+            click_log.record(1, referrer='http://a.example/\tx',
+                             user_agent='Agent')
+            self.clock.now += 30
+            click_log.record(2)
+            self.clock.now += 30
+            click_log.record(1)
+
+        paths = ended_segments(self.directory, 60, grace=5,
+                               now=self.clock.now + 65)
+        self.assertEqual(len(paths), 2)
+        self.assertEqual(ended_segments(self.directory, 60, grace=5,
+                                        now=self.clock.now + 64),
+                         paths[:1])
+        events = list(read_events(paths[0]))
+        self.assertEqual([event[0] for event in events], [1, 2])
+        self.assertEqual(events[0][1:],
+                         (datetime.datetime.fromtimestamp(1577872800),
+                          'http://a.example/ x', None))
+
+    def test_rollup(self):
+        """Ended segments should be added to the rollups and removed."""
+        archive = os.path.join(self.directory, 'archive')
+        os.mkdir(archive)
+        int_id = self.dbconn.backend.add('http://example.com/')
+        with ClickLog(self.directory, clock=self.clock) as click_log:
+            for seconds in (0, 10, 86400, 86460):
+                self.clock.now = 1577872800 + seconds
+                click_log.record(int_id)
+        with open(ended_segments(self.directory, now=self.clock.now)[0],
+                  'a') as f:
+            f.write('garbage\n{}\t1577872801'.format(int_id))
+
+        self.assertEqual(rollup(self.dbconn, self.directory,
+                                archive_directory=archive,
+                                now=self.clock.now + 5), (2, 3))
+        self.assertEqual(len(os.listdir(archive)), 2)
+        self.assertEqual(self.dbconn.click_stats(int_id),
+                         (3, datetime.datetime.fromtimestamp(1577959200)))
+        self.assertEqual(rollup(self.dbconn, self.directory,
+                                now=self.clock.now + 65), (1, 1))
+        self.assertEqual(self.dbconn.click_stats(int_id)[0], 4)
+
+        entry = dbinteraction.ShortDBEntry(
+                self.dbconn, self.dbconn.translation.int_to_base(int_id),
+                click_rollups=True)
+        self.assertEqual(entry.access_counter, 4)
+        self.assertEqual(entry.last_accessed.replace(tzinfo=None),
+                         datetime.datetime.fromtimestamp(1577959260))
+
+
+if __name__ == '__main__':
+    unittest.main()
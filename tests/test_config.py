@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import ConfigParser
+import StringIO
+import unittest
+
+from swlib.config import ConfigItems, boolean, split_list
+
+
+class TestSequence(unittest.TestCase):
+    def setUp(self):
+        self.fields = {
+                'host':'localhost',
+                'user': 'short',
+                'passwd': 'shortpassword',
+                'db': 'short',
+                'base_url': 'http://example.com/s/',
+                'title': 'Test suite title',
+                'h1': 'Test suite h1'}
+
+    def test_configitems_data_integrity(self):
+        """Read back values should be identical to input."""
+        config_contents = (
+                '[DB]\n'
+                'host = {host}\n'
+                'user = {user}\n'
+                'passwd = {passwd}\n'
+                'db = {db}\n'
+                '\n'
+                '[Web]\n'
+                'base_url = {base_url}\n'
+                'title = {title}\n'
+                'h1 = {h1}').format(**self.fields)
+
+        testfile = StringIO.StringIO(config_contents)
+        c = ConfigItems(config_file_descriptor=testfile)
+
+        self.assertEqual(c.dbargs['host'], self.fields['host'])
+        self.assertEqual(c.dbargs['user'], self.fields['user'])
+        self.assertEqual(c.dbargs['passwd'], self.fields['passwd'])
+        self.assertEqual(c.dbargs['db'], self.fields['db'])
+        self.assertEqual(c.webargs['base_url'], self.fields['base_url'])
+        self.assertEqual(c.webargs['title'], self.fields['title'])
+
+    def test_configitems_sections_exist(self):
+        """Lack of [DB] and/or [Web] sections should raise
+        ConfigParser.NoSectionError."""
+        config_contents_no_db = (
+                '[Web]\n'
+                'base_url = {base_url}\n'
+                'title = {title}\n'
+                'h1 = {h1}').format(**self.fields)
+
+        config_contents_no_web = (
+                '[DB]\n'
+                'host = {host}\n'
+                'user = {user}\n'
+                'passwd = {passwd}\n'
+                'db = {db}\n').format(**self.fields)
+
+
+        with self.assertRaises(ConfigParser.NoSectionError):
+            testfile = StringIO.StringIO(config_contents_no_db)
+            ConfigItems(config_file_descriptor=testfile)
+
+        with self.assertRaises(ConfigParser.NoSectionError):
+            testfile = StringIO.StringIO(config_contents_no_web)
+            ConfigItems(config_file_descriptor=testfile)
+
+    def test_configitems_optional_sections(self):
+        """Optional sections should be read if present and empty otherwise."""
+        config_contents = (
+                '[DB]\n'
+                'host = {host}\n'
+                '\n'
+                '[Web]\n'
+                'base_url = {base_url}\n').format(**self.fields)
+
+        testfile = StringIO.StringIO(config_contents)
+        c = ConfigItems(config_file_descriptor=testfile)
+        self.assertEqual(c.cacheargs, {})
+
+        testfile = StringIO.StringIO(config_contents +
+                                     '\n[Cache]\nmax_entries = 10\n')
+        c = ConfigItems(config_file_descriptor=testfile)
+        self.assertEqual(c.cacheargs, {'max_entries': '10'})
+        self.assertEqual(c.counterargs, {})
+        self.assertEqual(c.metricsargs, {})
+        self.assertEqual(c.indexargs, {})
+        self.assertEqual(c.clicksargs, {})
+        self.assertEqual(c.notfoundargs, {})
+        self.assertEqual(c.limitsargs, {})
+        self.assertEqual(c.sharedcacheargs, {})
+
+    def test_boolean(self):
+        """Boolean values should be interpreted like ConfigParser does."""
+        self.assertTrue(boolean('Yes'))
+        self.assertTrue(boolean('1'))
+        self.assertFalse(boolean('off'))
+        self.assertFalse(boolean(False))
+        with self.assertRaises(ValueError):
+            boolean('maybe')
+
+    def test_split_list(self):
+        """Comma-separated values should be split into stripped items."""
+        self.assertEqual(split_list(' db1, db2:3307 ,'), ['db1', 'db2:3307'])
+        self.assertEqual(split_list(''), [])
+        self.assertEqual(split_list(('a', 'b')), ['a', 'b'])
+
+    def test_configuration_no_empty_values(self):
+        """Empty values should not be allowed and raise
+        ConfigParser.ParserError."""
+        config_contents_empty_value = (
+                '[DB]\n'
+                'host\n'
+                '\n'
+                '[Web]\n'
+                'base_url = {base_url}\n'
+                'title = {title}\n'
+                'h1 = {h1}').format(**self.fields)
+
+        with self.assertRaises(ConfigParser.ParsingError):
+            testfile = StringIO.StringIO(config_contents_empty_value)
+            ConfigItems(config_file_descriptor=testfile)
+
+    def test_configitems_non_existent_file(self):
+        """Non-existent filename should raise IOError."""
+        with self.assertRaises(IOError):
+            ConfigItems(config_file='/bananarama')
+
+    def test_configitems_interpolation(self):
+        """Ensure implementation of ConfigParser style %()s interpolation."""
+        config_contents_interpolation = (
+                '[DB]\n'
+                'host = {host}\n'
+                'user = {user}\n'
+                'passwd = {passwd}\n'
+                'db = {db}\n'
+                '\n'
+                '[Web]\n'
+                'domain = {domain}\n'
+                'base_url = %(domain)s/s/\n'
+                'title = %(domain)s title\n'
+                'h1 = %(title)s in body\n').format(domain='example.com',
+                                                   **self.fields)
+
+        testfile = StringIO.StringIO(config_contents_interpolation)
+        c = ConfigItems(config_file_descriptor=testfile)
+
+        self.assertEqual(c.webargs['base_url'], 'example.com/s/')
+        self.assertEqual(c.webargs['title'], 'example.com title')
+        self.assertEqual(c.webargs['h1'], 'example.com title in body')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import datetime
+import threading
+import unittest
+
+from swlib.counter import CounterBuffer
+
+
+class _FakeShortDBConn(object):
+    def __init__(self):
+        self.increments = []
+        self.batches = []
+        self.fail = False
+
+    def increment(self, int_id):
+        self.increments.append(int_id)
+
+    def increment_many(self, counts):
+        if self.fail:
+            raise IOError('simulated database failure')
+        self.batches.append(counts)
+
+
+class TestSequence(unittest.TestCase):
+    def setUp(self):
+        self.dbconn = _FakeShortDBConn()
+
+    def test_counter_buffer_synchronous(self):
+        """Synchronous mode should increment immediately."""
+        with CounterBuffer(self.dbconn, synchronous=True) as counter:
+            counter.add(1)
+            counter.add(1)
+            self.assertEqual(self.dbconn.increments, [1, 1])
+            self.assertEqual(counter.pending, 0)
+        self.assertEqual(self.dbconn.batches, [])
+
+    def test_counter_buffer_batching(self):
+        """Hits should be collected per ID and written on close."""
+        counter = CounterBuffer(self.dbconn, flush_interval=10**6)
+        for i in (1, 2, 1, 1):
+            counter.add(i)
+        self.assertEqual(counter.pending, 4)
+        self.assertEqual(self.dbconn.batches, [])
+
+        counter.close()
+        self.assertEqual(counter.pending, 0)
+        self.assertEqual(len(self.dbconn.batches), 1)
+        batch = self.dbconn.batches[0]
+        self.assertEqual(batch[1][0], 3)
+        self.assertEqual(batch[2][0], 1)
+        self.assertIsInstance(batch[1][1], datetime.datetime)
+
+    def test_counter_buffer_flush_hits(self):
+        """Reaching flush_hits should trigger a flush by the background
+        thread."""
+        counter = CounterBuffer(self.dbconn, flush_interval=10**6,
+                                flush_hits=2)
+        counter.add(1)
+        counter.add(2)
+        for _ in range(100):
+            if self.dbconn.batches:
+                break
+            threading.Event().wait(0.01)
+        self.assertEqual(len(self.dbconn.batches), 1)
+        counter.close()
+
+    def test_counter_buffer_failed_flush(self):
+        """Hits should be kept when a flush fails."""
+        counter = CounterBuffer(self.dbconn, synchronous=False,
+                                flush_interval=10**6)
+        counter.add(1)
+        self.dbconn.fail = True
+        with self.assertRaises(IOError):
+            counter.flush()
+        self.assertEqual(counter.pending, 1)
+        counter.add(1)
+        self.dbconn.fail = False
+        counter.close()
+        self.assertEqual(self.dbconn.batches[0][1][0], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import datetime
+import os
+import random
+import shutil
+import tempfile
+import threading
+import unittest
+
+from swlib import config
+from swlib.dbinteraction import (ShortDBConn, ShortDBEntry, normalize_url,
+                                 url_hash)
+from tests import TEST_CONFIG
+
+
+class TestSequence(unittest.TestCase):
+    def setUp(self):
+        c = config.ConfigItems(config_file=TEST_CONFIG)
+
+        self.host = c.dbargs['host']
+        self.user = c.dbargs['user']
+        self.passwd = c.dbargs['passwd']
+        self.db = c.dbargs['db']
+        self.data_table_name = c.dbargs['data_table_name']
+        self.base_id_with_no_corresponding_db_entry = \
+                c.dbargs['base_id_with_no_corresponding_db_entry']
+        self.long_url = c.dbargs['long_url']
+        self.base_id = c.dbargs['base_id']
+
+
+    def test_short_db_entry_private_variables(self):
+        """Shouldn't be able to set private variables in ShortDBEntry."""
+        with ShortDBConn(passwd=self.passwd,
+                data_table_name=self.data_table_name) as short_db_conn:
+            short_db_entry = ShortDBEntry(short_db_conn, self.base_id,
+                                          data_table_name=self.data_table_name)
+
+            with self.assertRaises(AttributeError):
+                short_db_entry.long_url = 'test'
+            with self.assertRaises(AttributeError):
+                short_db_entry.last_accessed = 'test'
+            with self.assertRaises(AttributeError):
+                short_db_entry.created = 'test'
+            with self.assertRaises(AttributeError):
+                short_db_entry.access_counter = 'test'
+
+    def test_short_db_entry_db_lookups(self):
+        """Test DB lookups in ShortDBEntry."""
+        with ShortDBConn(passwd=self.passwd,
+                data_table_name=self.data_table_name) as short_db_conn:
+            short_db_entry = ShortDBEntry(short_db_conn, self.base_id,
+                                          data_table_name=self.data_table_name)
+
+            self.assertEqual(short_db_entry.long_url, self.long_url)
+            self.assertIsNone(short_db_entry.last_accessed, datetime.datetime)
+            self.assertIsInstance(short_db_entry.created, datetime.datetime)
+            self.assertIsInstance(short_db_entry.access_counter, int)
+
+            with self.assertRaises(IndexError):
+                ShortDBEntry(short_db_conn,
+                             self.base_id_with_no_corresponding_db_entry,
+                             data_table_name=self.data_table_name)
+
+    def test_short_db_conn_private_variables(self):
+        """Shouldn't be able to set private variables in ShortDBConn."""
+        with ShortDBConn(passwd=self.passwd,
+                data_table_name=self.data_table_name) as short_db_conn:
+            with self.assertRaises(AttributeError):
+                short_db_conn.base_chars = 'test'
+
+    def test_short_db_conn_add_and_increment(self):
+        """Add URL with ShortDBConn, instantiate with ShortDBEntry, check
+        increment function."""
+        with ShortDBConn(passwd=self.passwd,
+                data_table_name=self.data_table_name) as short_db_conn:
+            test_url = 'example.com/?rand='+str(random.random())
+            self.new_base_id = short_db_conn.add(test_url)
+            test_args = (short_db_conn, self.new_base_id)
+            test_kwargs = {'data_table_name': self.data_table_name}
+            test_item = ShortDBEntry(*test_args, **test_kwargs)
+            self.new_int_id = test_item.int_id
+            self.assertEqual(test_item.long_url, 'http://' + test_url)
+
+            # Save AC, increment, check new access_counter, reload object,
+            # check that it went up by 1 also in the DB.
+            pre_access_counter = test_item.access_counter
+            test_item.increment()
+            self.assertEqual(pre_access_counter, test_item.access_counter-1)
+            test_item = ShortDBEntry(*test_args, **test_kwargs)
+            self.assertIsInstance(test_item.last_accessed, datetime.datetime)
+            self.assertEqual(pre_access_counter, test_item.access_counter-1)
+
+    def test_short_db_conn_threads(self):
+        """Lookups should work concurrently from several threads."""
+        with ShortDBConn(passwd=self.passwd, pool_max_size=4,
+                data_table_name=self.data_table_name) as short_db_conn:
+            results = []
+
+            def lookup():
+                for _ in range(10):
+                    results.append(ShortDBEntry(
+                            short_db_conn, self.base_id,
+                            data_table_name=self.data_table_name).long_url)
+
+            threads = [threading.Thread(target=lookup) for _ in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+            self.assertEqual(results, [self.long_url] * 80)
+
+    def test_short_db_conn_failed_login(self):
+        """Failed login should raise _mysql_exceptions.OperationalError."""
+        import _mysql_exceptions
+        with self.assertRaises(_mysql_exceptions.OperationalError):
+            ShortDBConn(passwd='invalid')
+
+    def tearDown(self):
+        try:
+            self.new_base_id
+        except AttributeError:
+            pass
+        else:
+            with ShortDBConn(passwd=self.passwd,
+                    data_table_name=self.data_table_name) as short_db_conn, \
+                    short_db_conn.cursor() as cursor:
+                query = 'DELETE FROM {} WHERE id=%s'.format(
+                        self.data_table_name)
+                cursor.execute(query, self.new_int_id)
+                cursor.connection.commit()
+
+                # Call a stored procedure to reset auto increment value to
+                # smallest available ID. Procedure created via:
+                #
+                #     DROP PROCEDURE IF EXISTS reset_test_autoincrement;
+                #     DELIMITER $$
+                #     CREATE PROCEDURE reset_test_autoincrement()
+                #     BEGIN
+                #       SELECT @maxaddone:=max(id)+1
+                #           FROM test_translation_table;
+                #       SET @query = CONCAT('ALTER TABLE test_translation_table
+                #                            AUTO_INCREMENT=', @maxaddone);
+                #       PREPARE stmt FROM @query;
+                #       EXECUTE stmt;
+                #       DEALLOCATE PREPARE stmt;
+                #     END $$
+                #     DELIMITER ;
+                #
+                # CONCAT() is used since variables can't be bound in ALTER
+                # TABLE statements. This was not the first time this has wasted
+                # time for me. Some say that it is possible, and some even say
+                # that the documentation states that it is possible, but I for
+                # sure cannot get it to work in MySQL 5.5.30.
+                #
+                # At first I tried to do things via PhpMyAdmin, but that has
+                # its own share of quirks regarding stored procedures. The
+                # DELIMITER statement should not be called in the code input
+                # fields, but a special option should be set instead. To add to
+                # this: for some infinitely strange reason, I could store
+                # procedures through PMA that worked _when called from within
+                # PMA_ with `CALL procedure`, but they did _not_ work when
+                # called from other connections. !"#¤%&/ unbelievable.
+                #
+                # This could also have been done directly here in Python, but I
+                # wanted to experiment with the above way instead. For
+                # posterity: 
+                #
+                #     query = (
+                #         'SELECT @maxaddone:=max(id)+1 FROM {};'.format(
+                #                 self.data_table_name),
+                #         'SET @query = CONCAT("ALTER TABLE {} '
+                #                 'AUTO_INCREMENT=", @maxaddone);'.format(
+                #                         self.data_table_name),
+                #         'PREPARE stmt FROM @query;',
+                #         'EXECUTE stmt;',
+                #         'DEALLOCATE PREPARE stmt;')
+                #     for i in query:
+                #         cursor.execute(i)
+                #
+                cursor.callproc('reset_test_autoincrement')
+
+
+class TestSQLiteSequence(unittest.TestCase):
+    """ShortDBConn on the SQLite backend, without a database server."""
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.database = os.path.join(self.directory, 'test.sqlite')
+        self.base_chars = 'abcdefghijkmnopqrstuvwxyzACDEFGHJKLMNPQRTUVWXYZ234679'
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_short_db_conn_sqlite(self):
+        """The whole stack should work on the SQLite backend."""
+        with ShortDBConn(backend='sqlite',
+                         database=self.database) as short_db_conn:
+            short_db_conn.backend.create_tables(self.base_chars)
+            base_id = short_db_conn.add('example.com')
+            test_item = ShortDBEntry(short_db_conn, base_id)
+            self.assertEqual(test_item.long_url, 'http://example.com')
+            self.assertIsNone(test_item.last_accessed)
+            self.assertIsInstance(test_item.created, datetime.datetime)
+
+            test_item.increment()
+            test_item = ShortDBEntry(short_db_conn, base_id)
+            self.assertEqual(test_item.access_counter, 1)
+            self.assertIsInstance(test_item.last_accessed, datetime.datetime)
+
+            self.assertEqual(short_db_conn.resolve(base_id + ' '),
+                             'http://example.com')
+            self.assertEqual(
+                    ShortDBEntry(short_db_conn, base_id).access_counter, 2)
+
+            with self.assertRaises(IndexError):
+                ShortDBEntry(short_db_conn, 'bananarama')
+            with self.assertRaises(IndexError):
+                short_db_conn.resolve('bananarama')
+            with self.assertRaises(ValueError):
+                short_db_conn.resolve('lBIOS1580')
+
+    def test_short_db_conn_add_many(self):
+        """Bulk added URLs should map to their short forms in input order."""
+        with ShortDBConn(backend='sqlite',
+                         database=self.database) as short_db_conn:
+            short_db_conn.backend.create_tables(self.base_chars)
+            urls = ['example.com/{}'.format(i) for i in range(7)]
+            base_ids = short_db_conn.add_many(iter(urls), chunk_size=3)
+            self.assertEqual(len(base_ids), 7)
+            for (base_id, url) in zip(base_ids, urls):
+                self.assertEqual(
+                        ShortDBEntry(short_db_conn, base_id).long_url,
+                        'http://' + url)
+            with self.assertRaises(ValueError):
+                short_db_conn.add_many(urls, chunk_size=0)
+
+    def test_short_db_conn_leased_ids(self):
+        """Writers with leased ID blocks should not overlap, and unused IDs
+        should be given back on close."""
+        with ShortDBConn(backend='sqlite', database=self.database,
+                         id_block_size=5) as first:
+            first.backend.create_tables(self.base_chars)
+            with ShortDBConn(backend='sqlite', database=self.database,
+                             id_block_size='5') as second:
+                base_ids = [first.add('example.com/1'),
+                            second.add('example.com/2')]
+                base_ids.extend(first.add_many(
+                        ['example.com/{}'.format(i) for i in range(3, 9)],
+                        chunk_size=4))
+            self.assertEqual([first.int_id(base_id) for base_id in base_ids],
+                             [1, 6, 2, 3, 4, 5, 11, 12])
+            self.assertEqual(ShortDBEntry(first, base_ids[1]).long_url,
+                             'http://example.com/2')
+        with ShortDBConn(backend='sqlite', database=self.database,
+                         id_block_size=5) as third:
+            self.assertEqual(third.int_id(third.add('example.com/9')), 13)
+
+    def test_normalize_url(self):
+        """Equivalent URLs should be normalized to the same form."""
+        self.assertEqual(normalize_url('HTTP://Example.COM:80'),
+                         'http://example.com/')
+        self.assertEqual(normalize_url('https://User@Example.com:443/A?b#c'),
+                         'https://User@example.com/A?b#c')
+        self.assertEqual(normalize_url('http://example.com:8080/'),
+                         'http://example.com:8080/')
+        self.assertEqual(url_hash('http://Example.com'),
+                         url_hash(u'http://example.com/'))
+        self.assertEqual(len(url_hash('http://example.com/')), 40)
+
+    def test_short_db_conn_dedup(self):
+        """Duplicate URLs should get the same short ID in dedup mode."""
+        with ShortDBConn(backend='sqlite', dedup='yes',
+                         database=self.database) as short_db_conn:
+            short_db_conn.backend.create_tables(self.base_chars)
+            base_id = short_db_conn.add('example.com')
+            self.assertEqual(short_db_conn.add('http://EXAMPLE.com/'),
+                             base_id)
+            self.assertEqual(
+                    short_db_conn.add_many(['example.com', 'a.example',
+                                            'a.example']),
+                    [base_id] + [short_db_conn.add('a.example')] * 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
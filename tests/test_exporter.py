@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import anydbm
+import datetime
+import csv
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from swlib import dbinteraction
+from swlib.exporter import (export_map, export_rows, nginx_line,
+                            nginx_needs_regex)
+
+
+class TestSequence(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.dbconn = dbinteraction.ShortDBConn(
+                backend='sqlite',
+                database=os.path.join(self.directory, 'test.sqlite'))
+        self.dbconn.backend.create_tables(
+                'abcdefghijkmnopqrstuvwxyzACDEFGHJKLMNPQRTUVWXYZ234679')
+        self.base_ids = self.dbconn.add_many(['example.com/a b',
+                                              'example.com/$x"'])
+
+    def tearDown(self):
+        self.dbconn.close()
+        shutil.rmtree(self.directory)
+
+    def test_export_map_txt(self):
+        """Text maps should be written whole, then appended to."""
+        path = os.path.join(self.directory, 'map.txt')
+        self.assertEqual(export_map(self.dbconn, path, batch_size=1),
+                         (2, 2))
+        with open(path) as f:
+            self.assertEqual(f.read(),
+                             '{} http://example.com/a%20b\n'
+                             '{} http://example.com/$x"\n'.format(
+                                     *self.base_ids))
+
+        new_id = self.dbconn.add('example.com/c')
+        self.assertEqual(export_map(self.dbconn, path, after_id=2), (1, 3))
+        self.assertEqual(export_map(self.dbconn, path, after_id=3), (0, 3))
+        with open(path) as f:
+            self.assertEqual(f.readlines()[2],
+                             '{} http://example.com/c\n'.format(new_id))
+
+    def test_export_map_nginx(self):
+        """nginx maps should have case-sensitive keys and quoted values."""
+        path = os.path.join(self.directory, 'map.nginx')
+        export_map(self.dbconn, path, file_format='nginx')
+        with open(path) as f:
+            self.assertEqual(f.readlines()[1],
+                             '~^{}$ "http://example.com/%24x\\"";\n'.format(
+                                     self.base_ids[1]))
+        self.assertTrue(nginx_needs_regex('aA'))
+        self.assertFalse(nginx_needs_regex('abc123'))
+        self.assertEqual(nginx_line('c', 'http://x/'), 'c "http://x/";\n')
+
+    def test_export_map_dbm(self):
+        """DBM maps should be created and updated."""
+        path = os.path.join(self.directory, 'map')
+        export_map(self.dbconn, path, file_format='dbm', dbm_module='dumbdbm')
+        new_id = self.dbconn.add('example.com/c')
+        export_map(self.dbconn, path, file_format='dbm', after_id=2,
+                   dbm_module='dumbdbm')
+        db = anydbm.open(path, 'r')
+        try:
+            self.assertEqual(db[self.base_ids[0]], 'http://example.com/a b')
+            self.assertEqual(db[new_id], 'http://example.com/c')
+        finally:
+            db.close()
+        with self.assertRaises(ValueError):
+            export_map(self.dbconn, path, file_format='xml')
+
+    def test_export_map_missing(self):
+        """A missing map should be exported whole despite after_id."""
+        path = os.path.join(self.directory, 'map.txt')
+        self.assertEqual(export_map(self.dbconn, path, after_id=2), (2, 2))
+
+    def test_export_map_leased_ids(self):
+        """Incremental exports should be refused with leased IDs, which are
+        committed in any order; full exports should work."""
+        path = os.path.join(self.directory, 'map.txt')
+        with dbinteraction.ShortDBConn(
+                backend='sqlite', id_block_size=10,
+                database=os.path.join(self.directory, 'test.sqlite')) \
+                as dbconn:
+            self.assertEqual(export_map(dbconn, path), (2, 2))
+            with self.assertRaises(ValueError):
+                export_map(dbconn, path, after_id=2)
+
+    def test_export_rows_jsonl(self):
+        """Rows should be exported with short IDs, and resumed from the last
+        checkpoint, dropping anything written after it."""
+        path = os.path.join(self.directory, 'rows.jsonl')
+        checkpoints = []
+        result = export_rows(self.dbconn, path, chunk_size=1,
+                             checkpoint=lambda *args: checkpoints.append(args))
+        self.assertEqual(result, (2, 2, checkpoints[-1][1]))
+        self.assertEqual([last_id for (last_id, _) in checkpoints], [1, 2])
+        with open(path) as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual(rows[0]['short_id'], self.base_ids[0])
+        self.assertEqual(rows[0]['long_url'], 'http://example.com/a b')
+        self.assertEqual(rows[1]['id'], 2)
+        self.assertIsNone(rows[1]['last_accessed'])
+
+        with open(path, 'a') as f:
+            f.write('{"id": 3, "trunc')
+        new_id = self.dbconn.add('example.com/c')
+        (after_id, size) = checkpoints[-1]
+        self.assertEqual(export_rows(self.dbconn, path, after_id=after_id,
+                                     size=size)[:2], (1, 3))
+        with open(path) as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual([row['short_id'] for row in rows],
+                         self.base_ids + [new_id])
+        with self.assertRaises(ValueError):
+            export_rows(self.dbconn, path, after_id=3, size=10 ** 9)
+
+    def test_export_rows_csv_gzip(self):
+        """Compressed files should be read as one stream after resuming."""
+        path = os.path.join(self.directory, 'rows.csv.gz')
+        (_, last_id, size) = export_rows(self.dbconn, path, file_format='csv',
+                                         chunk_size=1, compress=True)
+        self.dbconn.add('example.com/c')
+        export_rows(self.dbconn, path, file_format='csv', after_id=last_id,
+                    size=size, compress=True)
+        f = gzip.open(path)
+        try:
+            rows = list(csv.reader(f))
+        finally:
+            f.close()
+        self.assertEqual(rows[0][:3], ['id', 'short_id', 'long_url'])
+        self.assertEqual([row[0] for row in rows[1:]], ['1', '2', '3'])
+        with self.assertRaises(ValueError):
+            export_rows(self.dbconn, path, file_format='xml')
+
+    def test_export_rows_archive(self):
+        """With archive, archived rows should be merged in ID order."""
+        self.dbconn.add('example.com/c')
+        self.dbconn.archive_idle(datetime.datetime.now(), 1, 2)
+        path = os.path.join(self.directory, 'rows.jsonl')
+        self.assertEqual(export_rows(self.dbconn, path)[0], 2)
+        archive_dbconn = dbinteraction.ShortDBConn(
+                backend='sqlite',
+                database=os.path.join(self.directory, 'test.sqlite'),
+                archive=True)
+        try:
+            self.assertEqual([[row['id'] for row in chunk] for chunk in
+                              archive_dbconn.rows(chunk_size=2)],
+                             [[1, 2], [3]])
+        finally:
+            archive_dbconn.close()
+
+    def test_export_rows_leased_ids(self):
+        """Resuming should be refused with leased IDs, which are committed
+        in any order; full exports should work."""
+        path = os.path.join(self.directory, 'rows.jsonl')
+        with dbinteraction.ShortDBConn(
+                backend='sqlite', id_block_size=10,
+                database=os.path.join(self.directory, 'test.sqlite')) \
+                as dbconn:
+            (count, last_id, size) = export_rows(dbconn, path)
+            self.assertEqual((count, last_id), (2, 2))
+            with self.assertRaises(ValueError):
+                export_rows(dbconn, path, after_id=last_id, size=size)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import threading
+import unittest
+
+from swlib.idallocator import BlockAllocator
+
+
+class _FakeBackend(object):
+    def __init__(self):
+        self.next_id = 1
+        self.leases = []
+
+    def lease_ids(self, n):
+        self.leases.append(n)
+        self.next_id += n
+        return self.next_id - n
+
+    def release_ids(self, first_id, end_id):
+        if self.next_id != end_id:
+            return False
+        self.next_id = first_id
+        return True
+
+
+class TestSequence(unittest.TestCase):
+    def setUp(self):
+        self.backend = _FakeBackend()
+
+    def test_block_allocator(self):
+        """IDs should be handed out from leased blocks."""
+        allocator = BlockAllocator(self.backend, block_size=3)
+        self.assertEqual(allocator.allocate(), [1])
+        self.assertEqual(allocator.allocate(3), [2, 3, 4])
+        self.assertEqual(allocator.allocate(7), range(5, 12))
+        self.assertEqual(self.backend.leases, [3, 3, 5])
+        self.assertEqual(allocator.remaining, 0)
+
+    def test_block_allocator_close(self):
+        """The rest of the last lease should be given back on close."""
+        with BlockAllocator(self.backend, block_size=10) as allocator:
+            allocator.allocate(4)
+        self.assertEqual(self.backend.next_id, 5)
+        with BlockAllocator(self.backend, block_size=10) as allocator:
+            self.assertEqual(allocator.allocate(), [5])
+            self.backend.lease_ids(10)
+        self.assertEqual(self.backend.next_id, 25)
+
+    def test_block_allocator_threads(self):
+        """Concurrent allocations should not overlap."""
+        allocator = BlockAllocator(self.backend, block_size=7)
+        int_ids = []
+
+        def allocate():
+            for _ in range(50):
+                int_ids.extend(allocator.allocate(2))
+
+        threads = [threading.Thread(target=allocate) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(sorted(int_ids), range(1, 401))
+
+    def test_block_allocator_block_size(self):
+        """Block sizes below 1 should raise ValueError."""
+        with self.assertRaises(ValueError):
+            BlockAllocator(self.backend, block_size=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
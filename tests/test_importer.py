@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import StringIO
+import unittest
+
+from swlib.importer import import_urls, read_urls
+
+
+class _FakeShortDBConn(object):
+    def __init__(self):
+        self.chunks = []
+
+    def add_many(self, long_urls, chunk_size):
+        self.chunks.append(long_urls)
+        first = sum(len(chunk) for chunk in self.chunks) - len(long_urls)
+        return ['id{}'.format(first + i) for i in range(len(long_urls))]
+
+
+class TestSequence(unittest.TestCase):
+    def test_read_urls_lines(self):
+        """Lines should be stripped and blank lines skipped."""
+        f = StringIO.StringIO('url\nhttp://a.example\n\n  b.example  \n')
+        self.assertEqual(list(read_urls(f, skip_header=True)),
+                         ['http://a.example', 'b.example'])
+
+    def test_read_urls_csv(self):
+        """The given CSV column should be read."""
+        f = StringIO.StringIO('1,http://a.example\n2,"b.example"\n3\n')
+        self.assertEqual(list(read_urls(f, file_format='csv', column=1)),
+                         ['http://a.example', 'b.example'])
+        with self.assertRaises(ValueError):
+            list(read_urls(f, file_format='xml'))
+
+    def test_import_urls(self):
+        """URLs should be added in chunks and paired with their IDs."""
+        dbconn = _FakeShortDBConn()
+        reports = []
+        urls = ['u{}'.format(i) for i in range(5)]
+        pairs = list(import_urls(dbconn, iter(urls), chunk_size=2,
+                                 progress=lambda n, t: reports.append(n)))
+        self.assertEqual(pairs, [('u{}'.format(i), 'id{}'.format(i))
+                                 for i in range(5)])
+        self.assertEqual([len(chunk) for chunk in dbconn.chunks], [2, 2, 1])
+        self.assertEqual(reports, [2, 4, 5])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from swlib import sqlitebackend
+
+
+_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+_CGI_SCRIPT = os.path.join(_ROOT, 'shortweb.cgi')
+
+# Run the CGI script in this interpreter and write the modules it imported to
+# stderr, as the last line.
+_DRIVER = '''
+import sys
+before = set(sys.modules)
+sys.argv = [{script!r}]
+try:
+    execfile({script!r}, {{'__name__': '__main__'}})
+finally:
+    sys.stdout.flush()
+    sys.stderr.write('\\n' + ' '.join(sorted(
+            name for (name, module) in sys.modules.items()
+            if module is not None and name not in before)) + '\\n')
+'''
+
+# Modules which no request of the CGI script should import: test code,
+# tracebacks of failed requests, JSON (but for lookups), the click log (not
+# configured here), ctypes (for the monotonic clock of persistent servers) and
+# MySQL drivers.
+_NEVER = ('unittest', 'cgitb', 'json', 'socket', 'ctypes', 'subprocess',
+          'MySQLdb', '_mysql_exceptions', 'swlib.clicklog', 'swlib.cache',
+          'swlib.resolver', 'tests')
+
+
+class TestSequence(unittest.TestCase):
+    """Import budget of the CGI script, which pays for every module it
+    imports on every request. Python 2 has no -X importtime, so the modules
+    imported per kind of request are checked instead of timings."""
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        database = os.path.join(self.directory, 'test.sqlite')
+        backend = sqlitebackend.SQLiteBackend(database=database)
+        backend.create_tables(
+                'abcdefghijkmnopqrstuvwxyzACDEFGHJKLMNPQRTUVWXYZ234679')
+        backend.add('http://example.com/')
+        backend.close()
+        with open(os.path.join(self.directory, 'shortweb.config'), 'w') as f:
+            f.write('[DB]\nbackend = sqlite\ndatabase = {}\n'
+                    '[Web]\nbase_url = http://example.com/s/\n'
+                    .format(database))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def request(self, query):
+        """Return (status line, set of imported modules) of a GET request."""
+        environ = dict(os.environ, REQUEST_METHOD='GET', QUERY_STRING=query)
+        environ['PYTHONPATH'] = os.pathsep.join(
+                [_ROOT] + filter(None, [os.environ.get('PYTHONPATH')]))
+        process = subprocess.Popen(
+                [sys.executable, '-c', _DRIVER.format(script=_CGI_SCRIPT)],
+                cwd=self.directory, env=environ, stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE)
+        (stdout, stderr) = process.communicate()
+        self.assertEqual(process.returncode, 0, stderr)
+        return (stdout.split('\n', 1)[0],
+                set(stderr.rstrip('\n').rsplit('\n', 1)[-1].split()))
+
+    def test_import_budget_form(self):
+        """The form should need neither the database nor its modules."""
+        (status, modules) = self.request('')
+        self.assertEqual(status, 'Status: 200 OK')
+        self.assertEqual(set(name for name in modules
+                             if name.startswith('swlib.')),
+                         set(['swlib.basetranslate', 'swlib.config',
+                              'swlib.metrics', 'swlib.printer']))
+        self.assertFalse(modules.intersection(_NEVER + ('sqlite3',)))
+
+    def test_import_budget_redirect(self):
+        """Redirects and unknown IDs should not import dateutil, which only
+        the link information page needs."""
+        for (query, status) in (('short=b', 'Status: 301 Moved Permanently'),
+                                ('short=zz', 'Status: 404 Not Found')):
+            (status_line, modules) = self.request(query)
+            self.assertEqual(status_line, status)
+            self.assertIn('swlib.sqlitebackend', modules)
+            self.assertFalse(modules.intersection(_NEVER + ('dateutil',)))
+
+    def test_import_budget_lookup(self):
+        """Lookups should only add JSON and the lookup module."""
+        (status, modules) = self.request('lookup=b+zz')
+        self.assertEqual(status, 'Status: 200 OK')
+        self.assertIn('swlib.lookup', modules)
+        self.assertIn('json', modules)
+        self.assertFalse(modules.intersection(
+                set(_NEVER).union(['dateutil']).difference(['json'])))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+from swlib import dbinteraction
+from swlib.lookup import lookup_many, short_id
+
+
+class TestSequence(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.database = os.path.join(self.directory, 'test.sqlite')
+        self.dbconn = self.connect()
+        self.dbconn.backend.create_tables(
+                'abcdefghijkmnopqrstuvwxyzACDEFGHJKLMNPQRTUVWXYZ234679')
+        self.base_ids = self.dbconn.add_many(['http://example.com/0',
+                                              'http://example.com/1'])
+
+    def tearDown(self):
+        self.dbconn.close()
+        shutil.rmtree(self.directory)
+
+    def connect(self, **kwargs):
+        return dbinteraction.ShortDBConn(backend='sqlite',
+                                         database=self.database, **kwargs)
+
+    def test_short_id(self):
+        """Base URLs, whitespace and trailing '+' should be removed."""
+        self.assertEqual(short_id(' http://x/s/bc+ ', 'http://x/s/'), 'bc')
+        self.assertEqual(short_id('bc'), 'bc')
+        self.assertEqual(short_id('http://y/bc', 'http://x/'), 'http://y/bc')
+
+    def test_lookup_many(self):
+        """Results should be in input order, with status markers."""
+        self.dbconn.increment(1)
+        results = lookup_many(
+                self.dbconn, ['http://x/s/c', 'b+', 'zz', 'b!', 'a', ''],
+                base_url='http://x/s/')
+        self.assertEqual([result['status'] for result in results],
+                         ['found', 'found', 'not_found', 'invalid',
+                          'invalid', 'invalid'])
+        self.assertEqual(results[0]['short'], 'http://x/s/c')
+        self.assertEqual(results[0]['short_id'], 'c')
+        self.assertEqual(results[0]['long_url'], 'http://example.com/1')
+        self.assertIsNone(results[0]['last_accessed'])
+        self.assertEqual(results[1]['access_counter'], 1)
+        datetime.datetime.strptime(results[1]['last_accessed'][:19],
+                                   '%Y-%m-%dT%H:%M:%S')
+        self.assertEqual(results[2], {'short': 'zz', 'short_id': 'zz',
+                                      'status': 'not_found'})
+        self.assertNotIn('short_id', results[4])
+        self.assertEqual(lookup_many(self.dbconn, []), [])
+
+    def test_lookup_many_clicks_and_archive(self):
+        """Rolled up clicks should be added, and archived entries found."""
+        last_click = datetime.datetime(2030, 1, 1, 12)
+        self.dbconn.add_click_rollups([(1, last_click.date(), 5,
+                                        last_click)])
+        self.dbconn.add('http://example.com/2')
+        self.dbconn.archive_idle(datetime.datetime.now(), 1, 2)
+
+        results = lookup_many(self.dbconn, ['b', 'c'], click_rollups=True)
+        self.assertEqual(results[0]['access_counter'], 5)
+        self.assertEqual(results[0]['last_accessed'], last_click.isoformat())
+        self.assertEqual(results[1]['status'], 'not_found')
+
+        archive_dbconn = self.connect(archive=True, promote=True)
+        try:
+            results = lookup_many(archive_dbconn, ['c'])
+            self.assertEqual(results[0]['long_url'], 'http://example.com/1')
+            # Lookups do not promote.
+            self.assertIsNone(archive_dbconn.backend.lookup(2))
+        finally:
+            archive_dbconn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import json
+import unittest
+
+from swlib.metrics import (Counter, RequestMetrics, RequestTimer, current,
+                           db_error, monotonic, phase)
+
+
+class _FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestSequence(unittest.TestCase):
+    def test_monotonic(self):
+        """The monotonic clock should not go backwards."""
+        first = monotonic()
+        self.assertLessEqual(first, monotonic())
+
+    def test_request_timer_phases(self):
+        """Nested phases should not be counted in the outer phase."""
+        clock = _FakeClock()
+        with RequestTimer(clock=clock) as timer:
+            with phase('select'):
+                clock.now += 1
+                with phase('connect'):
+                    clock.now += 2
+                    db_error()
+                clock.now += 3
+            with phase('select'):
+                clock.now += 4
+            timer.outcome = 'redirect'
+        self.assertEqual(timer.phases, {'select': 8.0, 'connect': 2.0})
+        self.assertEqual(timer.duration, 10.0)
+        self.assertEqual(timer.db_errors, 1)
+        self.assertIsNone(current())
+        self.assertEqual(json.loads(timer.log_line(status=301))['phases_ms'],
+                         {'select': 8000.0, 'connect': 2000.0})
+
+        # No-ops outside of requests.
+        with phase('select'):
+            db_error()
+
+    def test_request_metrics_render(self):
+        """Recorded requests should be rendered in Prometheus format."""
+        clock = _FakeClock()
+        with RequestTimer(clock=clock) as timer:
+            with phase('select'):
+                clock.now += 0.002
+            db_error()
+        request_metrics = RequestMetrics()
+        request_metrics.record(timer)
+
+        text = request_metrics.render()
+        self.assertIn('# TYPE shortweb_requests_total counter\n', text)
+        self.assertIn('shortweb_requests_total{outcome="error"} 1\n', text)
+        self.assertIn('shortweb_requests_total{outcome="redirect"} 0\n', text)
+        self.assertIn('shortweb_db_errors_total 1\n', text)
+        self.assertIn('shortweb_request_phase_duration_seconds_bucket'
+                      '{phase="select",le="0.001"} 0\n', text)
+        self.assertIn('shortweb_request_phase_duration_seconds_bucket'
+                      '{phase="select",le="0.0025"} 1\n', text)
+        self.assertIn('shortweb_request_phase_duration_seconds_bucket'
+                      '{phase="select",le="+Inf"} 1\n', text)
+        self.assertIn('shortweb_request_phase_duration_seconds_count'
+                      '{phase="select"} 1\n', text)
+
+    def test_label_escaping(self):
+        """Label values should be escaped."""
+        counter = Counter('c', 'Test.', labels=('l',))
+        counter.inc(2, l='a"b\\')
+        self.assertEqual(list(counter.samples()), [r'c{l="a\"b\\"} 2'])
+        self.assertEqual(counter.value(l='a"b\\'), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import unittest
+
+from swlib import basetranslate
+from swlib import config
+from tests import TEST_CONFIG
+
+try:
+    from swlib.mysqlbackend import MySQLBackend
+except ImportError:
+    MySQLBackend = None
+
+
+@unittest.skipIf(MySQLBackend is None, 'MySQLdb is not installed.')
+class TestSequence(unittest.TestCase):
+    def setUp(self):
+        c = config.ConfigItems(config_file=TEST_CONFIG)
+        self.passwd = c.dbargs['passwd']
+        self.data_table_name = c.dbargs['data_table_name']
+        self.base_id = c.dbargs['base_id']
+        self.long_url = c.dbargs['long_url']
+
+    def test_mysql_backend_lookup(self):
+        """Lookups should return rows as dicts, or None if missing."""
+        mysql_backend = MySQLBackend(passwd=self.passwd,
+                                     data_table_name=self.data_table_name)
+        try:
+            base_chars = mysql_backend.base_chars()
+            int_id = basetranslate.Translation(base_chars).base_to_int(
+                    self.base_id)
+            self.assertEqual(mysql_backend.lookup(int_id)['long_url'],
+                             self.long_url)
+            self.assertIsNone(mysql_backend.lookup(2**31))
+        finally:
+            mysql_backend.close()
+
+    def test_mysql_backend_resolve_and_count(self):
+        """Redirects should be resolved and counted with a SELECT ... FOR
+        UPDATE and an UPDATE, and missing IDs with the SELECT only."""
+        mysql_backend = MySQLBackend(passwd=self.passwd,
+                                     data_table_name=self.data_table_name)
+        queries = []
+        new_cursor = mysql_backend._new_cursor
+
+        def counting_cursor(conn, streaming=False):
+            cursor = new_cursor(conn, streaming)
+            execute = cursor.execute
+
+            def counted_execute(query, args=None):
+                queries.append(query)
+                return execute(query, args)
+
+            cursor.execute = counted_execute
+            return cursor
+
+        int_id = mysql_backend.add('http://example.com/resolve')
+        try:
+            mysql_backend._new_cursor = counting_cursor
+            self.assertEqual(mysql_backend.resolve_and_count(int_id),
+                             'http://example.com/resolve')
+            self.assertEqual(len(queries), 2)
+            self.assertTrue(queries[0].endswith(' FOR UPDATE'))
+            self.assertIsNone(mysql_backend.resolve_and_count(2**31))
+            self.assertEqual(len(queries), 3)
+            mysql_backend._new_cursor = new_cursor
+
+            row = mysql_backend.lookup(int_id)
+            self.assertEqual(row['access_counter'], 1)
+            self.assertIsNotNone(row['last_accessed'])
+        finally:
+            mysql_backend._new_cursor = new_cursor
+            with mysql_backend.cursor() as cursor:
+                cursor.execute('DELETE FROM {} WHERE id=%s'.format(
+                        self.data_table_name), (int_id,))
+                cursor.connection.commit()
+                # See tests.test_dbinteraction.
+                cursor.callproc('reset_test_autoincrement')
+            mysql_backend.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import unittest
+
+from swlib.pool import ConnectionPool, PoolTimeout
+
+
+class _FakeError(Exception):
+    pass
+
+
+class _FakeConnection(object):
+    def __init__(self):
+        self.broken = False
+        self.closed = False
+        self.rollbacks = 0
+
+    def ping(self):
+        if self.broken:
+            raise _FakeError('gone away')
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+class TestSequence(unittest.TestCase):
+    def setUp(self):
+        self.pool = ConnectionPool(_FakeConnection, min_size=1, max_size=2,
+                                   timeout=0.05, errors=(_FakeError,))
+
+    def test_pool_init(self):
+        """Invalid sizes should raise ValueError."""
+        with self.assertRaises(ValueError):
+            ConnectionPool(_FakeConnection, min_size=2, max_size=1)
+        with self.assertRaises(ValueError):
+            ConnectionPool(_FakeConnection, max_size=0)
+        self.assertEqual(self.pool.size, 1)
+        self.assertEqual(self.pool.idle, 1)
+
+    def test_pool_checkout(self):
+        """Connections should be reused, bounded and rolled back."""
+        with self.pool.connection() as first:
+            with self.pool.connection() as second:
+                self.assertIsNot(first, second)
+                self.assertEqual(self.pool.size, 2)
+                with self.assertRaises(PoolTimeout):
+                    with self.pool.connection():
+                        pass
+        self.assertEqual(first.rollbacks, 1)
+        with self.pool.connection() as third:
+            self.assertIn(third, (first, second))
+
+    def test_pool_broken_connection(self):
+        """Connections raising errors should be replaced."""
+        with self.assertRaises(_FakeError):
+            with self.pool.connection() as conn:
+                raise _FakeError('gone away')
+        self.assertTrue(conn.closed)
+        self.assertEqual(self.pool.size, 0)
+        with self.pool.connection() as new_conn:
+            self.assertIsNot(new_conn, conn)
+
+    def test_pool_ping(self):
+        """Connections failing the health check should be replaced."""
+        pool = ConnectionPool(_FakeConnection, min_size=1, max_size=1,
+                              ping=lambda conn: conn.ping(), ping_interval=0,
+                              errors=(_FakeError,))
+        with pool.connection() as conn:
+            conn.broken = True
+        with pool.connection() as new_conn:
+            self.assertIsNot(new_conn, conn)
+        self.assertTrue(conn.closed)
+        self.assertEqual(pool.size, 1)
+
+    def test_pool_close(self):
+        """Closed pools should close their connections."""
+        with self.pool.connection() as conn:
+            self.pool.close()
+            self.assertEqual(self.pool.size, 1)
+        self.assertTrue(conn.closed)
+        self.assertEqual(self.pool.size, 0)
+        with self.assertRaises(ValueError):
+            with self.pool.connection():
+                pass
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import httplib
+import os
+import shutil
+import signal
+import tempfile
+import time
+import unittest
+
+from swlib.preforkserver import PreforkServer
+
+
+class _PidApp(object):
+    """WSGI application answering with the pid of its process, and noting
+    the pids of closed applications in a file."""
+    def __init__(self, closed_path):
+        self._closed_path = closed_path
+
+    def __call__(self, environ, start_response):
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return [str(os.getpid())]
+
+    def close(self):
+        with open(self._closed_path, 'a') as f:
+            f.write('{}\n'.format(os.getpid()))
+
+
+class TestSequence(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.closed_path = os.path.join(self.directory, 'closed')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def get(self, port):
+        conn = httplib.HTTPConnection('localhost', port, timeout=10)
+        try:
+            conn.request('GET', '/')
+            return int(conn.getresponse().read())
+        finally:
+            conn.close()
+
+    def test_prefork_server_init(self):
+        """Invalid worker settings should raise ValueError."""
+        for kwargs in ({'workers': 0}, {'max_requests': -1}):
+            with self.assertRaises(ValueError):
+                PreforkServer(lambda: None, port=0, **kwargs)
+
+    def test_prefork_server(self):
+        """Workers should be recycled after max_requests, replaced on
+        SIGHUP and stopped with the master on SIGTERM."""
+        server = PreforkServer(lambda: _PidApp(self.closed_path), port=0,
+                               workers=1, max_requests=2)
+        server.poll_interval = 0.05
+        port = server.port
+        master = os.fork()
+        if master == 0:
+            status = 1
+            try:
+                server.serve_forever()
+                status = 0
+            finally:
+                os._exit(status)
+        server.socket.close()
+        try:
+            pids = [self.get(port) for i in range(3)]
+            self.assertEqual(pids[0], pids[1])
+            self.assertNotEqual(pids[1], pids[2])
+
+            os.kill(master, signal.SIGHUP)
+            deadline = time.time() + 10
+            last = self.get(port)
+            while last == pids[2] and time.time() < deadline:
+                time.sleep(0.05)
+                last = self.get(port)
+            self.assertNotIn(last, pids)
+        finally:
+            os.kill(master, signal.SIGTERM)
+            (_, status) = os.waitpid(master, 0)
+        self.assertEqual(status, 0)
+        with self.assertRaises(OSError):
+            os.kill(last, 0)
+        with open(self.closed_path) as f:
+            closed = [int(line) for line in f]
+        self.assertTrue(set(pids + [last]).issubset(closed))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import StringIO
+import unittest
+
+from swlib import config
+from swlib.printer import HtmlPrinter
+from tests import TEST_CONFIG
+
+
+class TestSequence(unittest.TestCase):
+    def setUp(self):
+        c = config.ConfigItems(config_file=TEST_CONFIG)
+
+        self.base_url = c.webargs['base_url']
+        self.title = c.webargs['title']
+
+        self.htmlprinter = HtmlPrinter(base_url=self.base_url,
+                                       title=self.title)
+
+    def test_htmlprinter_properties(self):
+        """Properties should be set on initialization but not modifiable."""
+        self.assertEqual(self.htmlprinter.base_url, self.base_url)
+        self.assertEqual(self.htmlprinter.title, self.title)
+
+        with self.assertRaises(AttributeError):
+            self.htmlprinter.base_url = 'Test'
+        with self.assertRaises(AttributeError):
+            self.htmlprinter.title = 'Test'
+
+    def test_htmlprinter_redirect(self):
+        """Redirects should be complete responses without body."""
+        response = self.htmlprinter.redirect('http://example.com/')
+        self.assertEqual(response.cgi(),
+                         'Status: 301 Moved Permanently\n'
+                         'Location: http://example.com/\n'
+                         '\n')
+        self.assertEqual(response.wsgi(),
+                         ('301 Moved Permanently',
+                          [('Location', 'http://example.com/'),
+                           ('Content-Length', '0')],
+                          ''))
+
+    def test_htmlprinter_page(self):
+        """Pages should be HTML documents with the configured title."""
+        response = self.htmlprinter.new_url_form()
+        self.assertEqual(response.status, '200 OK')
+        self.assertEqual(response.headers,
+                         [('Content-Type', 'text/html; charset=utf-8')])
+        self.assertTrue(response.body.startswith(
+                '<!DOCTYPE html>\n<meta charset="utf-8">\n'
+                '<title>{}</title>\n'.format(self.title)))
+        self.assertIn('<input name="new_url"', response.body)
+
+        stream = StringIO.StringIO()
+        response.write_cgi(stream)
+        self.assertEqual(stream.getvalue(), response.cgi())
+        self.assertTrue(stream.getvalue().endswith('\n\n' + response.body))
+
+    def test_htmlprinter_errors(self):
+        """Unknown short IDs should be 404 pages, and invalid ones 400
+        pages."""
+        response = self.htmlprinter.short_id_not_found('An', 1337)
+        self.assertEqual(response.status, '404 Not Found')
+        self.assertIn('An → ID 1337', response.body)
+
+        response = self.htmlprinter.invalid_short_id('l', 'abc')
+        self.assertEqual(response.status, '400 Bad Request')
+        self.assertIn('{}l'.format(self.base_url), response.body)
+        self.assertIn('<pre>abc</pre>', response.body)
+
+    # TODO: Make sure the output of complete pages corresponds to known values.
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+
+from swlib.ratelimit import Limited, RateLimiter, admit
+
+
+class _FakeClock(object):
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestSequence(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'limits')
+        self.clock = _FakeClock(1577872800.0)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_rate_limiter_init(self):
+        """Invalid limits should raise ValueError."""
+        for kwargs in ({'rate': 0}, {'burst': 0.5}, {'slots': 0},
+                       {'max_in_flight': -1}):
+            with self.assertRaises(ValueError):
+                RateLimiter(self.path, **kwargs)
+
+    def test_rate_limiter_token_bucket(self):
+        """Clients should be admitted burst times, and then at rate."""
+        with RateLimiter(self.path, rate=2, burst=2, slots=16,
+                         clock=self.clock) as limiter:
+            for i in range(2):
+                with limiter.admit('192.0.2.1'):
+                    pass
+            with self.assertRaises(Limited) as refused:
+                with limiter.admit('192.0.2.1'):
+                    pass
+            self.assertAlmostEqual(refused.exception.retry_after, 0.5)
+            with limiter.admit('192.0.2.2'):
+                pass
+
+            self.clock.now += 0.25
+            with self.assertRaises(Limited) as refused:
+                with limiter.admit('192.0.2.1'):
+                    pass
+            self.assertAlmostEqual(refused.exception.retry_after, 0.25)
+            self.clock.now += 0.25
+            with limiter.admit('192.0.2.1'):
+                pass
+
+    def test_rate_limiter_slots(self):
+        """Clients should be spread over all slots, with nonzero keys."""
+        with RateLimiter(self.path, slots=16) as limiter:
+            slots = [limiter._slot('192.0.2.{}'.format(i))
+                     for i in range(200)]
+        self.assertEqual(len(set(offset for (_, offset) in slots)), 16)
+        self.assertTrue(all(key for (key, _) in slots))
+
+    def test_rate_limiter_shared(self):
+        """Buckets should be shared through the state file."""
+        first = RateLimiter(self.path, burst=1, slots=16, clock=self.clock)
+        second = RateLimiter(self.path, burst=1, slots=16, clock=self.clock)
+        with first.admit('192.0.2.1'):
+            pass
+        with self.assertRaises(Limited):
+            with second.admit('192.0.2.1'):
+                pass
+        first.close()
+        second.close()
+
+    def test_rate_limiter_in_flight(self):
+        """At most max_in_flight creations should run at once, in this and
+        other processes."""
+        with RateLimiter(self.path, slots=16, max_in_flight=1,
+                         retry_after=3) as limiter:
+            with limiter.admit('192.0.2.1'):
+                with self.assertRaises(Limited) as refused:
+                    with limiter.admit('192.0.2.2'):
+                        pass
+                self.assertEqual(refused.exception.retry_after, 3)
+
+            (held_read, held_write) = os.pipe()
+            (done_read, done_write) = os.pipe()
+            pid = os.fork()
+            if pid == 0:
+                try:
+                    with RateLimiter(self.path, slots=16,
+                                     max_in_flight=1) as child_limiter:
+                        with child_limiter.admit('192.0.2.3'):
+                            os.write(held_write, 'x')
+                            os.read(done_read, 1)
+                finally:
+                    os._exit(0)
+            try:
+                os.read(held_read, 1)
+                with self.assertRaises(Limited):
+                    with limiter.admit('192.0.2.1'):
+                        pass
+            finally:
+                os.write(done_write, 'x')
+                os.waitpid(pid, 0)
+            with limiter.admit('192.0.2.1'):
+                pass
+
+    def test_admit_unlimited(self):
+        """Without a limiter, everything should be admitted."""
+        for i in range(100):
+            with admit(None, '192.0.2.1'):
+                pass
+
+
+if __name__ == '__main__':
+    unittest.main()
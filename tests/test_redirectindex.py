@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import datetime
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+
+from swlib import dbinteraction
+from swlib.redirectindex import RedirectIndex, append_index, build_index
+
+
+class TestSequence(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'redirect.index')
+        self.dbconn = dbinteraction.ShortDBConn(
+                backend='sqlite',
+                database=os.path.join(self.directory, 'test.sqlite'))
+        self.dbconn.backend.create_tables(
+                'abcdefghijkmnopqrstuvwxyzACDEFGHJKLMNPQRTUVWXYZ234679')
+        self.urls = ['http://example.com/{}'.format(i) for i in range(5)]
+        self.dbconn.backend.add_many(self.urls)
+
+    def tearDown(self):
+        self.dbconn.close()
+        shutil.rmtree(self.directory)
+
+    def test_build_index(self):
+        """All IDs should be found, and nothing else."""
+        self.assertEqual(build_index(self.dbconn, self.path, headroom=2,
+                                     batch_size=2), 5)
+        index = RedirectIndex(self.path)
+        self.assertEqual([index.lookup(i) for i in range(1, 6)], self.urls)
+        for int_id in (0, -1, 6, 2**40):
+            self.assertIsNone(index.lookup(int_id))
+        self.assertEqual(index.base_chars, self.dbconn.base_chars)
+
+    def test_build_index_mode(self):
+        """The index should be readable by all as far as the umask allows,
+        e.g. by a web server user other than the builder."""
+        umask = os.umask(0027)
+        try:
+            build_index(self.dbconn, self.path)
+        finally:
+            os.umask(umask)
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0640)
+
+    def test_build_index_gaps(self):
+        """Missing IDs should not be found."""
+        with self.dbconn.cursor() as cursor:
+            cursor.execute('DELETE FROM translation_table WHERE id IN (1, 3)')
+            cursor.connection.commit()
+        build_index(self.dbconn, self.path)
+        index = RedirectIndex(self.path)
+        self.assertEqual([index.lookup(i) for i in range(1, 6)],
+                         [None, self.urls[1], None] + self.urls[3:])
+
+    def test_append_index(self):
+        """Appended IDs should be found by open readers."""
+        build_index(self.dbconn, self.path, headroom=3)
+        index = RedirectIndex(self.path, check_interval=3600)
+        self.assertIsNone(index.lookup(7))
+
+        ids = self.dbconn.backend.add_many(['http://a.example/',
+                                            'http://b.example/'])
+        self.assertEqual(append_index(self.dbconn, self.path), 7)
+        self.assertEqual(index.lookup(ids[1]), 'http://b.example/')
+        self.assertEqual(index.lookup(ids[0]), 'http://a.example/')
+        self.assertEqual(index.lookup(3), self.urls[2])
+        self.assertIsNone(index.lookup(8))
+        self.assertEqual(append_index(self.dbconn, self.path), 7)
+
+    def test_append_index_rebuild(self):
+        """Running out of slots should rebuild the index, which readers
+        should pick up."""
+        now = [0]
+        build_index(self.dbconn, self.path, headroom=1)
+        index = RedirectIndex(self.path, check_interval=1,
+                              timer=lambda: now[0])
+        int_id = self.dbconn.backend.add_many(['http://a.example/'] * 3)[-1]
+        self.assertEqual(append_index(self.dbconn, self.path), int_id)
+        self.assertIsNone(index.lookup(int_id))
+        now[0] = 2
+        self.assertEqual(index.lookup(int_id), 'http://a.example/')
+
+    def test_append_index_missing(self):
+        """Appending to a missing index should build it."""
+        self.assertEqual(append_index(self.dbconn, self.path), 5)
+        self.assertEqual(RedirectIndex(self.path).lookup(5), self.urls[4])
+
+    def test_append_index_old_format(self):
+        """Appending to an index of an earlier format should rebuild it."""
+        with open(self.path, 'wb') as f:
+            f.write('SWIDX\x00\x00\x01' + '\x00' * 40)
+        self.assertEqual(append_index(self.dbconn, self.path), 5)
+        self.assertEqual(RedirectIndex(self.path).lookup(5), self.urls[4])
+
+    def test_build_index_archived(self):
+        """Archived IDs should be indexed with archive set."""
+        self.dbconn.archive_idle(datetime.datetime(3000, 1, 1), 0, 2)
+        self.dbconn.archive_idle(datetime.datetime(3000, 1, 1), 4, 5)
+        with dbinteraction.ShortDBConn(
+                backend='sqlite', archive=True,
+                database=os.path.join(self.directory, 'test.sqlite')) \
+                as dbconn:
+            self.assertEqual(build_index(dbconn, self.path, headroom=2), 5)
+            index = RedirectIndex(self.path)
+            self.assertEqual([index.lookup(i) for i in range(1, 6)],
+                             self.urls)
+
+            os.remove(self.path)
+            build_index(dbconn, self.path, headroom=2)
+            self.dbconn.backend.add('http://example.com/new')
+            self.dbconn.archive_idle(datetime.datetime(3000, 1, 1), 3, 4)
+            self.assertEqual(append_index(dbconn, self.path), 6)
+            index = RedirectIndex(self.path)
+            self.assertEqual([index.lookup(i) for i in range(1, 7)],
+                             self.urls + ['http://example.com/new'])
+
+    def test_append_index_leased_ids(self):
+        """Appending should be refused with leased IDs, which are committed
+        in any order."""
+        with dbinteraction.ShortDBConn(
+                backend='sqlite', id_block_size=10,
+                database=os.path.join(self.directory, 'test.sqlite')) \
+                as dbconn:
+            self.assertEqual(build_index(dbconn, self.path), 5)
+            with self.assertRaises(ValueError):
+                append_index(dbconn, self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
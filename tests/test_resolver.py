@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import unittest
+
+from swlib import cache
+from swlib import dbinteraction
+from swlib.resolver import Resolver
+
+
+class _FakeShortDBConn(object):
+    base_chars = 'abcdefghijkmnopqrstuvwxyzACDEFGHJKLMNPQRTUVWXYZ234679'
+    leased_ids = False
+
+    def lookup(self, int_id):
+        raise IOError('simulated database failure')
+
+
+class _CountingShortDBConn(object):
+    base_chars = _FakeShortDBConn.base_chars
+
+    def __init__(self, rows, leased_ids=False):
+        self.rows = rows
+        self.leased_ids = leased_ids
+        self.lookups = 0
+        self.max_id_reads = 0
+
+    def lookup(self, int_id):
+        self.lookups += 1
+        if int_id in self.rows:
+            return {'long_url': self.rows[int_id]}
+
+    def max_id(self):
+        self.max_id_reads += 1
+        return max(self.rows)
+
+
+class _FakeRedirectIndex(object):
+    def lookup(self, int_id):
+        return {1337: 'http://example.com/'}.get(int_id)
+
+
+class TestSequence(unittest.TestCase):
+    def setUp(self):
+        self.cache = cache.LRUCache(max_entries=10)
+        self.resolver = Resolver(_FakeShortDBConn(), cache=self.cache)
+
+    def test_resolver_cache_hit(self):
+        """Cached IDs should be resolved without database access."""
+        self.cache.put(1337, 'http://example.com/')
+        self.assertEqual(self.resolver.resolve('An'),
+                         (1337, 'http://example.com/'))
+        self.assertEqual(self.resolver.resolve(' An '),
+                         (1337, 'http://example.com/'))
+        self.assertEqual(self.cache.hits, 2)
+
+    def test_resolver_index(self):
+        """Indexed IDs should be resolved without database access, and
+        others looked up in the database."""
+        index_resolver = Resolver(_FakeShortDBConn(),
+                                  index=_FakeRedirectIndex())
+        self.assertEqual(index_resolver.resolve('An'),
+                         (1337, 'http://example.com/'))
+        with self.assertRaises(IOError):
+            index_resolver.resolve('Ao')
+
+    def test_resolver_invalid(self):
+        """Invalid representations should raise ValueError."""
+        with self.assertRaises(ValueError):
+            self.resolver.resolve('lBIOS1580')
+        with self.assertRaises(ValueError):
+            self.resolver.resolve('')
+
+    def test_resolver_max_id(self):
+        """IDs above the highest ID should not be looked up until it is read
+        again."""
+        now = [0]
+        dbconn = _CountingShortDBConn({1337: 'http://example.com/'})
+        max_id_resolver = Resolver(dbconn, max_id_interval=5,
+                                   timer=lambda: now[0])
+        for i in range(3):
+            with self.assertRaises(IndexError):
+                max_id_resolver.resolve('Ao')
+        self.assertEqual((dbconn.max_id_reads, dbconn.lookups), (1, 0))
+        self.assertEqual(max_id_resolver.resolve('An'),
+                         (1337, 'http://example.com/'))
+
+        dbconn.rows[1338] = 'http://example.com/new'
+        now[0] = 5
+        self.assertEqual(max_id_resolver.resolve('Ao'),
+                         (1338, 'http://example.com/new'))
+        self.assertEqual(dbconn.max_id_reads, 2)
+        max_id_resolver.added(1339)
+        with self.assertRaises(dbinteraction.NotFound) as raised:
+            max_id_resolver.resolve('Ap ')
+        self.assertEqual((raised.exception.base_id, raised.exception.int_id),
+                         ('Ap', 1339))
+        self.assertEqual((dbconn.max_id_reads, dbconn.lookups), (2, 3))
+
+    def test_resolver_negative_cache(self):
+        """Missing IDs should be looked up once until they expire."""
+        dbconn = _CountingShortDBConn({1337: 'http://example.com/'})
+        negative_cache = cache.LRUCache(max_entries=10)
+        negative_resolver = Resolver(dbconn, negative_cache=negative_cache)
+        for i in range(3):
+            with self.assertRaises(IndexError):
+                negative_resolver.resolve('Am')
+        self.assertEqual(dbconn.lookups, 1)
+        dbconn.rows[1336] = 'http://example.com/late'
+        negative_resolver.added(1336)
+        self.assertEqual(negative_resolver.resolve('Am'),
+                         (1336, 'http://example.com/late'))
+
+    def test_resolver_negative_cache_leased_ids(self):
+        """Missing IDs should not be remembered with leased IDs, as other
+        writers may still add them."""
+        dbconn = _CountingShortDBConn({1337: 'http://example.com/'},
+                                      leased_ids=True)
+        negative_resolver = Resolver(
+                dbconn, negative_cache=cache.LRUCache(max_entries=10))
+        self.assertIsNone(negative_resolver.negative_cache)
+        with self.assertRaises(IndexError):
+            negative_resolver.resolve('Am')
+        dbconn.rows[1336] = 'http://example.com/other-node'
+        self.assertEqual(negative_resolver.resolve('Am'),
+                         (1336, 'http://example.com/other-node'))
+
+    def test_resolver_invalidate(self):
+        """Invalidated IDs should be dropped from the cache."""
+        self.cache.put(1337, 'http://example.com/')
+        self.resolver.invalidate(1337)
+        self.assertIsNone(self.cache.get(1337))
+
+
+if __name__ == '__main__':
+    unittest.main()
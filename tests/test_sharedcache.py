@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+
+from swlib.sharedcache import SharedCache
+
+
+class TestSequence(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_shared_cache_init(self):
+        """Invalid dimensions should raise ValueError."""
+        for kwargs in ({'slots': 0}, {'slot_size': 10},
+                       {'slot_size': 10 + 0x10000}):
+            with self.assertRaises(ValueError):
+                SharedCache(self.path, **kwargs)
+
+    def test_shared_cache_get_put(self):
+        """IDs should be cached in their slots, evicting each other."""
+        with SharedCache(self.path, slots=4, slot_size=32) as cache:
+            self.assertIsNone(cache.get(1))
+            cache.put(1, 'http://example.com/1')
+            cache.put(2, 'http://example.com/2')
+            self.assertEqual(cache.get(1), 'http://example.com/1')
+            cache.put(5, 'http://example.com/5')
+            self.assertEqual(cache.get(1, 'miss'), 'miss')
+            self.assertEqual(cache.get(5), 'http://example.com/5')
+            cache.put(3, 'http://example.com/' + 'x' * cache.max_length)
+            self.assertIsNone(cache.get(3))
+            cache.invalidate(1)
+            self.assertEqual(cache.get(5), 'http://example.com/5')
+            cache.invalidate(5)
+            self.assertIsNone(cache.get(5))
+            self.assertEqual((cache.hits, cache.misses), (3, 4))
+
+    def test_shared_cache_processes(self):
+        """Entries should be shared with forked and other processes, and a
+        file of other dimensions should be cleared."""
+        cache = SharedCache(slots=16)
+        pid = os.fork()
+        if pid == 0:
+            try:
+                cache.put(7, 'http://example.com/7')
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+        self.assertEqual(cache.get(7), 'http://example.com/7')
+        cache.close()
+
+        with SharedCache(self.path, slots=16) as first:
+            first.put(7, 'http://example.com/7')
+            with SharedCache(self.path, slots=16) as second:
+                self.assertEqual(second.get(7), 'http://example.com/7')
+        with SharedCache(self.path, slots=8) as other:
+            self.assertIsNone(other.get(7))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+
+from swlib.metrics import RequestMetrics, RequestTimer
+from swlib.sharedmetrics import SharedValues
+
+
+class TestSequence(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'metrics')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_shared_values(self):
+        """Values should be added to per key, as long as there are slots."""
+        with self.assertRaises(ValueError):
+            SharedValues(self.path, slots=0)
+        with SharedValues(self.path, slots=2) as values:
+            values.add_many([(('a', 'x'), 1), (('b', 0), 0.5)])
+            values.add_many([(('a', 'x'), 2), (('c',), 1)])
+            self.assertEqual(values.get(('a', 'x')), 3)
+            self.assertEqual(values.get(('c',)), 0)
+            self.assertEqual(sorted(values.items()),
+                             [(('a', 'x'), 3.0), (('b', 0), 0.5)])
+            with SharedValues(self.path, slots=2) as other:
+                self.assertEqual(other.get(('b', 0)), 0.5)
+        with SharedValues(self.path, slots=4) as other:
+            self.assertEqual(other.items(), [])
+
+    def test_shared_request_metrics(self):
+        """Requests recorded by forked workers should be rendered by all of
+        them."""
+        values = SharedValues()
+        pids = []
+        for outcome in ('redirect', 'not_found'):
+            pid = os.fork()
+            if pid == 0:
+                try:
+                    with RequestTimer() as timer:
+                        timer.outcome = outcome
+                    RequestMetrics(values).record(timer)
+                finally:
+                    os._exit(0)
+            pids.append(pid)
+        for pid in pids:
+            os.waitpid(pid, 0)
+        text = RequestMetrics(values).render()
+        for outcome in ('redirect', 'not_found'):
+            self.assertIn('shortweb_requests_total{{outcome="{}"}} 1\n'
+                          .format(outcome), text)
+        self.assertIn('shortweb_requests_total{outcome="info"} 0\n', text)
+        self.assertIn('shortweb_request_duration_seconds_count'
+                      '{outcome="redirect"} 1\n', text)
+        self.assertIn('shortweb_db_errors_total 0\n', text)
+        values.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,309 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import datetime
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+from swlib.backend import SQLBackend
+from swlib.sqlitebackend import SQLiteBackend
+
+
+class TestSequence(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.base_chars = 'abcdefghijkmnopqrstuvwxyzACDEFGHJKLMNPQRTUVWXYZ234679'
+        self.backend = SQLiteBackend(
+                database=os.path.join(self.directory, 'test.sqlite'))
+        self.backend.create_tables(self.base_chars)
+
+    def tearDown(self):
+        self.backend.close()
+        shutil.rmtree(self.directory)
+
+    def test_sqlite_backend_mysql_options(self):
+        """MySQL connection options should be ignored."""
+        sqlite_backend = SQLiteBackend(
+                database=os.path.join(self.directory, 'test.sqlite'),
+                host='localhost', user='short', passwd='secret', db='short')
+        self.assertEqual(sqlite_backend.base_chars(), self.base_chars)
+        sqlite_backend.close()
+
+    def test_sqlite_backend_base_chars(self):
+        """Base should be stored once."""
+        self.backend.create_tables('abc')
+        self.assertEqual(self.backend.base_chars(), self.base_chars)
+
+    def test_sqlite_backend_add_and_lookup(self):
+        """Added URLs should be found with consecutive IDs."""
+        first = self.backend.add('http://example.com/1')
+        second = self.backend.add('http://example.com/2')
+        self.assertEqual(second, first + 1)
+
+        row = self.backend.lookup(second)
+        self.assertEqual(row['long_url'], 'http://example.com/2')
+        self.assertIsInstance(row['created'], datetime.datetime)
+        self.assertIsNone(row['last_accessed'])
+        self.assertEqual(row['access_counter'], 0)
+        self.assertIsNone(self.backend.lookup(second + 1))
+
+    def test_sqlite_backend_lookup_many(self):
+        """Existing IDs should be read with one query, by ID."""
+        ids = self.backend.add_many(['http://example.com/{}'.format(i)
+                                     for i in range(3)])
+        found = self.backend.lookup_many([ids[2], ids[0], ids[2] + 1])
+        self.assertEqual(sorted(found), [ids[0], ids[2]])
+        self.assertEqual(found[ids[2]]['long_url'], 'http://example.com/2')
+        self.assertEqual(found[ids[0]]['access_counter'], 0)
+        self.assertEqual(self.backend.lookup_many([]), {})
+        self.assertEqual(self.backend.lookup_many(ids, archived=True), {})
+
+    def test_sqlite_backend_add_many(self):
+        """Bulk added URLs should get consecutive IDs in input order."""
+        first = self.backend.add('http://example.com/0')
+        urls = ['http://example.com/{}'.format(i) for i in range(1, 6)]
+        ids = self.backend.add_many(urls)
+        self.assertEqual(ids, range(first + 1, first + 6))
+        for (int_id, url) in zip(ids, urls):
+            self.assertEqual(self.backend.lookup(int_id)['long_url'], url)
+        self.assertEqual(self.backend.add_many([]), [])
+
+    def test_sqlite_backend_add_deduplicated(self):
+        """URLs with known hashes should get their existing IDs."""
+        first = self.backend.add('http://example.com/1', url_hash='1')
+        self.assertEqual(self.backend.add('http://example.com/1',
+                                          url_hash='1'), first)
+        self.assertNotEqual(self.backend.add('http://example.com/1'), first)
+
+        ids = self.backend.add_many(
+                ['http://example.com/2', 'http://example.com/1',
+                 'http://example.com/2', 'http://example.com/3'],
+                url_hashes=['2', '1', '2', '3'])
+        self.assertEqual(ids[1], first)
+        self.assertEqual(ids[0], ids[2])
+        self.assertEqual(len(set(ids)), 3)
+        self.assertEqual(self.backend.lookup(ids[3])['long_url'],
+                         'http://example.com/3')
+
+    def test_sqlite_backend_add_deduplicated_race(self):
+        """Concurrent adds of the same URL should give one row."""
+        ids = []
+
+        def add():
+            for _ in range(20):
+                ids.append(self.backend.add('http://example.com/',
+                                            url_hash='h'))
+
+        threads = [threading.Thread(target=add) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(ids), 80)
+        self.assertEqual(set(ids), set([ids[0]]))
+
+    def test_sqlite_backend_lease_ids(self):
+        """Leases should start above existing IDs and never overlap, and
+        only the last one should be given back."""
+        last = self.backend.add('http://example.com/0')
+        first = self.backend.lease_ids(10)
+        self.assertEqual(first, last + 1)
+        second = self.backend.lease_ids(10)
+        self.assertEqual(second, first + 10)
+        self.assertFalse(self.backend.release_ids(first + 5, first + 10))
+        self.assertTrue(self.backend.release_ids(second + 3, second + 10))
+        self.assertEqual(self.backend.lease_ids(1), second + 3)
+
+    def test_sqlite_backend_add_leased(self):
+        """URLs should be stored under given IDs."""
+        first = self.backend.lease_ids(10)
+        self.assertEqual(self.backend.add('http://example.com/1',
+                                          int_id=first + 1), first + 1)
+        self.assertEqual(self.backend.add_many(
+                ['http://example.com/2', 'http://example.com/3'],
+                int_ids=[first + 3, first + 2]), [first + 3, first + 2])
+        self.assertEqual(self.backend.lookup(first + 2)['long_url'],
+                         'http://example.com/3')
+        self.assertIsNone(self.backend.lookup(first))
+
+        ids = self.backend.add_many(
+                ['http://example.com/4', 'http://example.com/4'],
+                url_hashes=['4', '4'], int_ids=[first + 4, first + 5])
+        self.assertEqual(ids, [first + 4, first + 4])
+        self.assertEqual(self.backend.add('http://example.com/4',
+                                          url_hash='4', int_id=first + 6),
+                         first + 4)
+
+    def test_sqlite_backend_click_rollups(self):
+        """Rollups should be added to, and summed up per ID."""
+        day = datetime.date(2020, 1, 1)
+        first = datetime.datetime(2020, 1, 1, 10)
+        later = datetime.datetime(2020, 1, 2, 8)
+        self.assertEqual(self.backend.click_stats(1), (0, None))
+        self.backend.add_click_rollups([(1, day, 2, first),
+                                        (2, day, 1, first)])
+        self.backend.add_click_rollups([(1, day, 3, first.replace(hour=9)),
+                                        (1, later.date(), 1, later)])
+        self.assertEqual(self.backend.click_stats(1), (6, later))
+        self.backend.add_click_rollups([])
+        self.assertEqual(self.backend.click_stats(2), (1, first))
+        self.assertEqual(self.backend.click_stats_many([1, 2, 3]),
+                         {1: (6, later), 2: (1, first)})
+        self.assertEqual(self.backend.click_stats_many([]), {})
+
+    def test_sqlite_backend_click_rollups_invalid(self):
+        """Rollups violating a constraint should fail rather than be retried
+        forever, with the upsert and with the generic statements."""
+        day = datetime.date(2020, 1, 1)
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.backend.add_click_rollups([(1, day, 1, None)])
+        with self.assertRaises(sqlite3.IntegrityError):
+            SQLBackend.add_click_rollups(self.backend, [(1, day, 1, None)])
+        self.assertEqual(self.backend.click_stats(1), (0, None))
+
+    def test_sqlite_backend_replicas(self):
+        """Reads should go to replicas, missing rows to the primary."""
+        replica_path = os.path.join(self.directory, 'replica.sqlite')
+        replica = SQLiteBackend(database=replica_path)
+        replica.create_tables(self.base_chars)
+        int_id = replica.add('http://replica.example/')
+        replica.close()
+        self.assertEqual(self.backend.add('http://primary.example/'), int_id)
+        new_id = self.backend.add('http://primary.example/new')
+
+        replicated = SQLiteBackend(
+                database=os.path.join(self.directory, 'test.sqlite'),
+                replicas=replica_path)
+        self.assertEqual(replicated.replicas, 1)
+        self.assertEqual(replicated.lookup(int_id)['long_url'],
+                         'http://replica.example/')
+        self.assertEqual(replicated.lookup(new_id)['long_url'],
+                         'http://primary.example/new')
+        replicated.close()
+
+        lagging = SQLiteBackend(
+                database=os.path.join(self.directory, 'test.sqlite'),
+                replicas=[replica_path], read_your_writes=False)
+        self.assertIsNone(lagging.lookup(new_id))
+        lagging.close()
+
+    def test_sqlite_backend_replica_failover(self):
+        """A failing replica should be skipped for the primary."""
+        int_id = self.backend.add('http://example.com/')
+        failing = SQLiteBackend(
+                database=os.path.join(self.directory, 'test.sqlite'),
+                replicas=os.path.join(self.directory, 'missing', 'db'))
+        self.assertEqual(failing.lookup(int_id)['long_url'],
+                         'http://example.com/')
+        self.assertEqual(failing.base_chars(), self.base_chars)
+        failing.close()
+
+    def test_sqlite_backend_archive(self):
+        """Idle rows in the ID range should move to the archive and back."""
+        ids = self.backend.add_many(['http://example.com/{}'.format(i)
+                                     for i in range(4)])
+        old = datetime.datetime(2000, 1, 1)
+        with self.backend.cursor() as cursor:
+            cursor.execute('UPDATE translation_table SET created=?',
+                           (old,))
+            cursor.execute('UPDATE translation_table SET last_accessed=? '
+                           'WHERE id=?', (datetime.datetime.now(), ids[1]))
+            cursor.connection.commit()
+        self.assertEqual(self.backend.archive_idle(
+                datetime.datetime(2001, 1, 1), 0, ids[2]), 2)
+        self.assertIsNone(self.backend.lookup(ids[0]))
+        self.assertIsNotNone(self.backend.lookup(ids[1]))
+        self.assertIsNotNone(self.backend.lookup(ids[3]))
+        row = self.backend.lookup_archived(ids[2])
+        self.assertEqual(row['long_url'], 'http://example.com/2')
+        self.assertEqual(row['created'], old)
+        self.assertEqual([int_id for (int_id, _) in
+                          self.backend.mappings(archived=True)],
+                         [ids[0], ids[2]])
+
+        self.assertTrue(self.backend.promote(ids[2]))
+        self.assertFalse(self.backend.promote(ids[2]))
+        self.assertIsNone(self.backend.lookup_archived(ids[2]))
+        self.assertEqual(self.backend.lookup(ids[2])['long_url'],
+                         'http://example.com/2')
+
+    def test_sqlite_backend_mappings(self):
+        """Mappings should be read in ID order, in batches."""
+        ids = self.backend.add_many(['http://example.com/{}'.format(i)
+                                     for i in range(5)])
+        self.assertEqual(list(self.backend.mappings(batch_size=2)),
+                         [(int_id, 'http://example.com/{}'.format(i))
+                          for (i, int_id) in enumerate(ids)])
+        self.assertEqual([int_id for (int_id, _) in
+                          self.backend.mappings(after_id=ids[2])], ids[3:])
+        # Batch sizes from configuration files are strings.
+        self.assertEqual([int_id for (int_id, _) in
+                          self.backend.mappings(batch_size='2')], ids)
+        self.assertEqual(list(self.backend.mappings(after_id=ids[-1])), [])
+        self.assertEqual(self.backend.max_id(), ids[-1])
+
+    def test_sqlite_backend_rows(self):
+        """Rows should be streamed in ID order, in chunks."""
+        ids = self.backend.add_many(['http://example.com/{}'.format(i)
+                                     for i in range(5)])
+        chunks = list(self.backend.rows(after_id=ids[0], chunk_size=3))
+        self.assertEqual([[row['id'] for row in chunk] for chunk in chunks],
+                         [ids[1:4], ids[4:]])
+        self.assertEqual(chunks[0][0]['long_url'], 'http://example.com/1')
+        self.assertEqual(chunks[0][0]['access_counter'], 0)
+        self.assertIsInstance(chunks[0][0]['created'], datetime.datetime)
+        self.assertEqual(list(self.backend.rows(after_id=ids[-1])), [])
+
+    def test_sqlite_backend_increment(self):
+        """Counters should be incremented singly and in batches."""
+        first = self.backend.add('http://example.com/1')
+        second = self.backend.add('http://example.com/2')
+
+        self.backend.increment(first)
+        self.assertEqual(self.backend.lookup(first)['access_counter'], 1)
+        self.assertIsInstance(self.backend.lookup(first)['last_accessed'],
+                              datetime.datetime)
+
+        last_accessed = datetime.datetime(2013, 4, 22, 12, 0, 0)
+        self.backend.increment_many({first: (2, last_accessed),
+                                     second: (5, last_accessed)})
+        self.assertEqual(self.backend.lookup(first)['access_counter'], 3)
+        self.assertEqual(self.backend.lookup(second)['access_counter'], 5)
+        self.assertEqual(self.backend.lookup(second)['last_accessed'],
+                         last_accessed)
+
+    def test_sqlite_backend_resolve_and_count(self):
+        """Resolving should return the long URL and count the access."""
+        int_id = self.backend.add('http://example.com/1')
+        for resolve_and_count in (
+                self.backend.resolve_and_count,
+                super(SQLiteBackend, self.backend).resolve_and_count):
+            self.assertEqual(resolve_and_count(int_id), 'http://example.com/1')
+            self.assertIsNone(resolve_and_count(int_id + 1))
+        row = self.backend.lookup(int_id)
+        self.assertEqual(row['access_counter'], 2)
+        self.assertIsInstance(row['last_accessed'], datetime.datetime)
+
+    def test_sqlite_backend_threads(self):
+        """Concurrent adds from several threads should all be stored."""
+        ids = []
+
+        def add():
+            for i in range(20):
+                ids.append(self.backend.add('http://example.com/'))
+
+        threads = [threading.Thread(target=add) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(sorted(ids), range(1, 81))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+import StringIO
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import wsgiref.util
+
+from swlib import clicklog
+from swlib import config as swconfig
+from swlib import dbinteraction
+from swlib import redirectindex
+from swlib import sharedcache
+from swlib import sqlitebackend
+from swlib.wsgiapp import ShortWebApp
+
+
+class TestSequence(unittest.TestCase):
+    def test_shortwebapp_metrics(self):
+        """Requests should be counted by outcome and served as metrics."""
+        directory = tempfile.mkdtemp()
+        try:
+            database = os.path.join(directory, 'test.sqlite')
+            sqlite_backend = sqlitebackend.SQLiteBackend(database=database)
+            sqlite_backend.create_tables(
+                    'abcdefghijkmnopqrstuvwxyzACDEFGHJKLMNPQRTUVWXYZ234679')
+            sqlite_backend.add('http://example.com/')
+            sqlite_backend.close()
+            app = ShortWebApp(swconfig.ConfigItems(
+                    config_file_descriptor=StringIO.StringIO(
+                            '[DB]\nbackend = sqlite\ndatabase = {}\n'
+                            '[Web]\n[Counter]\nsynchronous = yes\n'
+                            '[Metrics]\nlog = yes\n'.format(database))))
+
+            def request(path='/', query=''):
+                environ = {'PATH_INFO': path, 'QUERY_STRING': query,
+                           'wsgi.errors': StringIO.StringIO()}
+                wsgiref.util.setup_testing_defaults(environ)
+                status = []
+                body = ''.join(app(environ,
+                                   lambda s, headers: status.append(s)))
+                return (status[0], body, environ['wsgi.errors'].getvalue())
+
+            (status, _, log) = request(query='short=b')
+            self.assertEqual(status, '301 Moved Permanently')
+            self.assertIn('"outcome": "redirect"', log)
+            self.assertEqual(request(query='short=zz')[0], '404 Not Found')
+            self.assertEqual(request(query='short=b+')[0], '200 OK')
+
+            (status, body, _) = request(path='/metrics')
+            self.assertEqual(status, '200 OK')
+            for outcome in ('redirect', 'not_found', 'info'):
+                self.assertIn('shortweb_requests_total{{outcome="{}"}} 1\n'
+                              .format(outcome), body)
+            self.assertIn('shortweb_request_phase_duration_seconds_count'
+                          '{phase="print"} 3\n', body)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_shortwebapp_click_log(self):
+        """Redirects should be logged, and the info page should show the
+        rolled up clicks."""
+        directory = tempfile.mkdtemp()
+        try:
+            database = os.path.join(directory, 'test.sqlite')
+            sqlite_backend = sqlitebackend.SQLiteBackend(database=database)
+            sqlite_backend.create_tables(
+                    'abcdefghijkmnopqrstuvwxyzACDEFGHJKLMNPQRTUVWXYZ234679')
+            sqlite_backend.add('http://example.com/')
+            sqlite_backend.close()
+            app = ShortWebApp(swconfig.ConfigItems(
+                    config_file_descriptor=StringIO.StringIO(
+                            '[DB]\nbackend = sqlite\ndatabase = {0}\n'
+                            '[Web]\n[Clicks]\ndirectory = {1}\n'
+                            'referrer = yes\n'.format(database, directory))))
+
+            def request(query, **headers):
+                environ = {'QUERY_STRING': query}
+                environ.update(headers)
+                wsgiref.util.setup_testing_defaults(environ)
+                return ''.join(app(environ, lambda s, headers: None))
+
+            request('short=b', HTTP_REFERER='http://referrer.example/')
+            request('short=b')
+            self.assertEqual(app.dbconn.lookup(1)['access_counter'], 0)
+            (path,) = clicklog.ended_segments(directory, now=2**40)
+            self.assertEqual([event[2] for event in
+                              clicklog.read_events(path)],
+                             ['http://referrer.example/', None])
+
+            clicklog.rollup(app.dbconn, directory, now=2**40)
+            self.assertIn('<td>2\n', request('short=b+'))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_shortwebapp_not_found(self):
+        """IDs above the highest ID should be not found until added."""
+        directory = tempfile.mkdtemp()
+        try:
+            database = os.path.join(directory, 'test.sqlite')
+            sqlite_backend = sqlitebackend.SQLiteBackend(database=database)
+            sqlite_backend.create_tables(
+                    'abcdefghijkmnopqrstuvwxyzACDEFGHJKLMNPQRTUVWXYZ234679')
+            sqlite_backend.add('http://example.com/')
+            app = ShortWebApp(swconfig.ConfigItems(
+                    config_file_descriptor=StringIO.StringIO(
+                            '[DB]\nbackend = sqlite\ndatabase = {}\n'
+                            '[Web]\n[NotFound]\nmax_id_interval = 3600\n'
+                            .format(database))))
+
+            def request(method='GET', query='', body=''):
+                environ = {'REQUEST_METHOD': method, 'QUERY_STRING': query,
+                           'CONTENT_LENGTH': str(len(body)),
+                           'CONTENT_TYPE':
+                           'application/x-www-form-urlencoded',
+                           'wsgi.input': StringIO.StringIO(body)}
+                wsgiref.util.setup_testing_defaults(environ)
+                status = []
+                app(environ, lambda s, headers: status.append(s))
+                return status[0]
+
+            self.assertEqual(request(query='short=c'), '404 Not Found')
+            # Added elsewhere, so not found until the highest ID is read
+            # again.
+            sqlite_backend.add('http://example.com/elsewhere')
+            self.assertEqual(request(query='short=c'), '404 Not Found')
+            self.assertEqual(request(query='short=l'), '400 Bad Request')
+            self.assertEqual(
+                    request('POST', body='new_url=http://example.com/new'),
+                    '302 Found')
+            self.assertEqual(request(query='short=d'),
+                             '301 Moved Permanently')
+            self.assertEqual(app.resolver.negative_cache.hits, 0)
+            sqlite_backend.close()
+        finally:
+            shutil.rmtree(directory)
+
+    def test_shortwebapp_lookup(self):
+        """Many short IDs should be looked up at once, as JSON."""
+        directory = tempfile.mkdtemp()
+        try:
+            database = os.path.join(directory, 'test.sqlite')
+            sqlite_backend = sqlitebackend.SQLiteBackend(database=database)
+            sqlite_backend.create_tables(
+                    'abcdefghijkmnopqrstuvwxyzACDEFGHJKLMNPQRTUVWXYZ234679')
+            sqlite_backend.add('http://example.com/')
+            sqlite_backend.close()
+            app = ShortWebApp(swconfig.ConfigItems(
+                    config_file_descriptor=StringIO.StringIO(
+                            '[DB]\nbackend = sqlite\ndatabase = {}\n'
+                            '[Web]\nbase_url = http://x/s/\n'
+                            'max_lookups = 3\n'.format(database))))
+
+            def request(body):
+                environ = {'REQUEST_METHOD': 'POST',
+                           'CONTENT_LENGTH': str(len(body)),
+                           'CONTENT_TYPE':
+                           'application/x-www-form-urlencoded',
+                           'wsgi.input': StringIO.StringIO(body)}
+                wsgiref.util.setup_testing_defaults(environ)
+                response = []
+                body = ''.join(app(environ, lambda s, headers:
+                                   response.extend([s, dict(headers)])))
+                return (response[0], response[1]['Content-Type'],
+                        json.loads(body))
+
+            (status, content_type, body) = request(
+                    'lookup=http%3A%2F%2Fx%2Fs%2Fb+zz&lookup=%21')
+            self.assertEqual(status, '200 OK')
+            self.assertEqual(content_type, 'application/json')
+            self.assertEqual([result['status'] for result in body['results']],
+                             ['found', 'not_found', 'invalid'])
+            self.assertEqual(body['results'][0]['long_url'],
+                             'http://example.com/')
+            (status, _, body) = request('lookup=b+c+d+e')
+            self.assertEqual(status, '400 Bad Request')
+            self.assertIn('error', body)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_shortwebapp_url_cache(self):
+        """A given cache should be used instead of the [Cache] one."""
+        directory = tempfile.mkdtemp()
+        try:
+            database = os.path.join(directory, 'test.sqlite')
+            sqlite_backend = sqlitebackend.SQLiteBackend(database=database)
+            sqlite_backend.create_tables(
+                    'abcdefghijkmnopqrstuvwxyzACDEFGHJKLMNPQRTUVWXYZ234679')
+            sqlite_backend.add('http://example.com/')
+            sqlite_backend.close()
+            url_cache = sharedcache.SharedCache(slots=16)
+            app = ShortWebApp(swconfig.ConfigItems(
+                    config_file_descriptor=StringIO.StringIO(
+                            '[DB]\nbackend = sqlite\ndatabase = {}\n'
+                            '[Web]\n[Counter]\nsynchronous = yes\n'
+                            .format(database))), url_cache=url_cache)
+            self.assertIs(app.cache, url_cache)
+            environ = {'QUERY_STRING': 'short=b'}
+            wsgiref.util.setup_testing_defaults(environ)
+            app(environ, lambda s, headers: None)
+            self.assertEqual(url_cache.get(1), 'http://example.com/')
+            app.close()
+            url_cache.close()
+        finally:
+            shutil.rmtree(directory)
+
+    def test_shortwebapp_index_database_down(self):
+        """Indexed links should be redirected by an application started
+        while the database cannot be connected to."""
+        directory = tempfile.mkdtemp()
+        try:
+            index = os.path.join(directory, 'redirect.index')
+            with dbinteraction.ShortDBConn(
+                    backend='sqlite',
+                    database=os.path.join(directory, 'test.sqlite')) \
+                    as dbconn:
+                dbconn.backend.create_tables(
+                        'abcdefghijkmnopqrstuvwxyzACDEFGHJKLMNPQRTUVWXYZ234679')
+                dbconn.backend.add('http://example.com/')
+                redirectindex.build_index(dbconn, index)
+            # SQLite cannot create a database file in a missing directory.
+            app = ShortWebApp(swconfig.ConfigItems(
+                    config_file_descriptor=StringIO.StringIO(
+                            '[DB]\nbackend = sqlite\ndatabase = {0}\n'
+                            '[Web]\n[Counter]\nsynchronous = yes\n'
+                            '[Index]\npath = {1}\n'.format(
+                                os.path.join(directory, 'missing',
+                                             'test.sqlite'),
+                                index))))
+            for _ in range(2):
+                environ = {'QUERY_STRING': 'short=b'}
+                wsgiref.util.setup_testing_defaults(environ)
+                response = []
+                app(environ, lambda s, headers: response.extend([s, headers]))
+                self.assertEqual(response[0], '301 Moved Permanently')
+                self.assertEqual(dict(response[1])['Location'],
+                                 'http://example.com/')
+            app.close()
+        finally:
+            shutil.rmtree(directory)
+
+    def test_shortwebapp_rate_limit(self):
+        """New links beyond the limit should be answered with 429."""
+        directory = tempfile.mkdtemp()
+        try:
+            database = os.path.join(directory, 'test.sqlite')
+            sqlite_backend = sqlitebackend.SQLiteBackend(database=database)
+            sqlite_backend.create_tables(
+                    'abcdefghijkmnopqrstuvwxyzACDEFGHJKLMNPQRTUVWXYZ234679')
+            sqlite_backend.close()
+            app = ShortWebApp(swconfig.ConfigItems(
+                    config_file_descriptor=StringIO.StringIO(
+                            '[DB]\nbackend = sqlite\ndatabase = {0}\n'
+                            '[Web]\n[Limits]\npath = {1}\nrate = 0.1\n'
+                            'burst = 1\nslots = 16\n'.format(
+                                database,
+                                os.path.join(directory, 'limits')))))
+
+            def create(remote_addr):
+                body = 'new_url=http://example.com/'
+                environ = {'REQUEST_METHOD': 'POST',
+                           'REMOTE_ADDR': remote_addr,
+                           'CONTENT_LENGTH': str(len(body)),
+                           'CONTENT_TYPE':
+                           'application/x-www-form-urlencoded',
+                           'wsgi.input': StringIO.StringIO(body)}
+                wsgiref.util.setup_testing_defaults(environ)
+                response = []
+                app(environ, lambda s, headers: response.extend([s, headers]))
+                return (response[0], dict(response[1]))
+
+            self.assertEqual(create('192.0.2.1')[0], '302 Found')
+            (status, headers) = create('192.0.2.1')
+            self.assertEqual(status, '429 Too Many Requests')
+            self.assertEqual(headers['Retry-After'], '10')
+            self.assertEqual(create('192.0.2.2')[0], '302 Found')
+            self.assertEqual(app.dbconn.max_id(), 2)
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()